@@ -1,141 +1,91 @@
 import streamlit as st
-import pandas as pd
-import plotly.express as px
+import startup  # first, so cold-start timing begins here
 import time
-import matplotlib.pyplot as plt
 import sqlite3
-import bcrypt
-import chartmogul
-import os  # Add this import
-
-# Set API Key
-CHARTMOGUL_API_KEY = "YOUR_API_KEY"
-chartmogul.Config.api_key = CHARTMOGUL_API_KEY
+import user_store
+import outbox
+from auth import hash_password, verify_password, issue_token, verify_token
+import auth
+import profiler
 
 st.set_page_config(page_title="Water Potability Classification", layout="wide")
 
-# Force Streamlit to use Render's assigned port
-port = int(os.environ.get("PORT", 8501))
+# Time this rerun's stages (the admin panel can ask for a one-off cProfile capture)
+profiler.start_rerun("🔒 Login", profile=st.session_state.pop("profile_next_rerun", False))
+auth.add_metrics_hook(profiler.auth_hook)
 
 # Database functions
-def create_db():
-    conn = sqlite3.connect("users.db")
-    cursor = conn.cursor()
-    cursor.execute('''CREATE TABLE IF NOT EXISTS users (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        username TEXT UNIQUE,
-                        password TEXT,
-                        full_name TEXT,
-                        email TEXT,
-                        phone TEXT
-                    )''')
-    # Insert admin user if not exists
-    cursor.execute("SELECT * FROM users WHERE username = 'admin'")
-    if not cursor.fetchone():
-        admin_password = bcrypt.hashpw("admin123".encode(), bcrypt.gensalt())
-        cursor.execute("INSERT INTO users (username, password, full_name, email, phone) VALUES (?, ?, ?, ?, ?)",
-                       ("admin", admin_password, "Administrator", "admin@example.com", "1234567890"))
-    conn.commit()
-    conn.close()
-
-def hash_password(password):
-    return bcrypt.hashpw(password.encode(), bcrypt.gensalt())
-
-def check_password(password, hashed):
-    return bcrypt.checkpw(password.encode(), hashed)
-
 def add_user(username, password, full_name, email, phone):
-    conn = sqlite3.connect("users.db")
-    cursor = conn.cursor()
-    cursor.execute("INSERT INTO users (username, password, full_name, email, phone) VALUES (?, ?, ?, ?, ?)", 
-                   (username, hash_password(password), full_name, email, phone))
-    conn.commit()
-    conn.close()
-    
-    # Send data to ChartMogul
-    data = {
-        "data_source_uuid": "YOUR_DATA_SOURCE_UUID",
-        "external_id": username,
-        "name": full_name,
-        "email": email,
-        "country": "Unknown"
-    }
-    try:
-        customer = chartmogul.Customer.create(data)
-        print("User added to ChartMogul:", customer)
-    except Exception as e:
-        print("ChartMogul Error:", str(e))
-
-def get_user(username):
-    conn = sqlite3.connect("users.db")
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM users WHERE username = ?", (username,))
-    user = cursor.fetchone()
-    conn.close()
-    return user
+    # The ChartMogul customer is queued in the same transaction and sent by the outbox dispatcher
+    with user_store.transaction() as cursor:
+        user_store.insert_user(cursor, username, hash_password(password), full_name, email, phone)
+        outbox.enqueue(cursor, outbox.customer_record(username, full_name, email))
+    outbox.notify()
 
-def update_user(username, full_name, email, phone):
-    conn = sqlite3.connect("users.db")
-    cursor = conn.cursor()
-    cursor.execute("UPDATE users SET full_name = ?, email = ?, phone = ? WHERE username = ?", 
-                   (full_name, email, phone, username))
-    conn.commit()
-    conn.close()
+get_user = user_store.get_user
 
-def get_all_users():
-    conn = sqlite3.connect("users.db")
-    cursor = conn.cursor()
-    cursor.execute("SELECT username, full_name, email, phone FROM users")
-    users = cursor.fetchall()
-    conn.close()
-    return users
+# Initialize DB (schema migration runs once per process) and the ChartMogul sync thread
+user_store.migrate()
+outbox.start_dispatcher()
 
-# Initialize DB
-create_db()
-
-# Authentication
-if 'authenticated' not in st.session_state:
-    st.session_state.authenticated = False
+# Authentication (a signed session token is checked on reruns instead of repeating bcrypt)
+token_user = verify_token(st.session_state.get("auth_token"))
+st.session_state.authenticated = token_user is not None and token_user == st.session_state.get("username")
 
 if not st.session_state.authenticated:
-    st.title("🔒 Login / Register")
-    option = st.radio("Select an option", ["Login", "Register"])
-
-    if option == "Register":
-        with st.form(key='register_form'):
-            st.subheader("Create an Account")
-            new_username = st.text_input("Choose a Username")
-            new_password = st.text_input("Choose a Password", type="password")
-            full_name = st.text_input("Full Name")
-            email = st.text_input("Email")
-            phone = st.text_input("Phone Number")
-            submit_button = st.form_submit_button(label='Register')
-            if submit_button:
-                try:
-                    add_user(new_username, new_password, full_name, email, phone)
-                    st.success("Account created successfully! You can now log in.")
-                except sqlite3.IntegrityError:
-                    st.error("Username already exists. Please choose another.")
-
-    if option == "Login":
-        with st.form(key='login_form'):
-            username = st.text_input("Username")
-            password = st.text_input("Password", type="password")
-            submit_button = st.form_submit_button(label='Login')
-            if submit_button:
-                user = get_user(username)
-                if user and check_password(password, user[2]):
-                    st.session_state.authenticated = True
-                    st.session_state.username = username
-                    st.success(f"Welcome, {user[3]}!")
-                    st.session_state.current_page = "📊 Visualization"  # Redirect to third page after login
-                    st.rerun()  # Rerun to apply the page change
-                else:
-                    st.error("Invalid credentials")
-    st.stop()
-
-# Load dataset
-df = pd.read_csv("water_potability.csv")
+    # Login reruns end in st.stop() or st.rerun(); finishing_rerun still records them
+    with profiler.finishing_rerun():
+        st.title("🔒 Login / Register")
+        option = st.radio("Select an option", ["Login", "Register"])
+
+        if option == "Register":
+            with st.form(key='register_form'):
+                st.subheader("Create an Account")
+                new_username = st.text_input("Choose a Username")
+                new_password = st.text_input("Choose a Password", type="password")
+                full_name = st.text_input("Full Name")
+                email = st.text_input("Email")
+                phone = st.text_input("Phone Number")
+                submit_button = st.form_submit_button(label='Register')
+                if submit_button:
+                    try:
+                        add_user(new_username, new_password, full_name, email, phone)
+                        st.success("Account created successfully! You can now log in.")
+                    except sqlite3.IntegrityError:
+                        st.error("Username already exists. Please choose another.")
+
+        if option == "Login":
+            with st.form(key='login_form'):
+                username = st.text_input("Username")
+                password = st.text_input("Password", type="password")
+                submit_button = st.form_submit_button(label='Login')
+                if submit_button:
+                    user = get_user(username)
+                    password_ok, new_hash = verify_password(password, user[2]) if user else (False, None)
+                    if password_ok:
+                        if new_hash:
+                            # Stored hash used an old work factor: upgrade it transparently
+                            user_store.update_password(username, new_hash)
+                        st.session_state.authenticated = True
+                        st.session_state.username = username
+                        st.session_state.auth_token = issue_token(username)
+                        st.success(f"Welcome, {user[3]}!")
+                        st.session_state.current_page = "📊 Visualization"  # Redirect to third page after login
+                        st.rerun()  # Rerun to apply the page change
+                    else:
+                        st.error("Invalid credentials")
+        startup.mark_first_render("🔒 Login")
+        st.stop()
+
+# Logged in: import plotting/sklearn and load the model in the background (see startup.py)
+startup.prewarm_in_background()
+
+# numpy/pandas come in with the dataset module, so only after the login screen
+from dataset import load_dataset, dataset_version, classify_water, drinking_reason, agriculture_reason
+
+# Load dataset (parsed and classified once per process, shared across sessions)
+with profiler.stage("load_dataset"):
+    df = load_dataset()
 
 
 # 🎵 Background Music with Autoplay & Loop
@@ -213,27 +163,6 @@ st.markdown(
     unsafe_allow_html=True
 )
 
-# Load dataset
-df = pd.read_csv("water_potability.csv")
-
-def classify_water(row):
-    if row['Potability'] == 1:
-        return 'Drinking - Safe for human consumption.'
-    elif 6.5 <= row['ph'] <= 8.5 and row['Hardness'] <= 300:
-        return 'Agriculture - Suitable for irrigation.'
-    else:
-        return 'Industrial - Used for cooling, cleaning, etc.'
-
-def drinking_reason(row):
-    return "✅ Yes - Safe for drinking." if row['Potability'] == 1 else "❌ No - Not potable."
-
-def agriculture_reason(row):
-    return "✅ Yes - Good for irrigation." if (6.5 <= row['ph'] <= 8.5 and row['Hardness'] <= 300) else "❌ No - Not suitable."
-
-df['Water_Usage'] = df.apply(classify_water, axis=1)
-df['Used_For_Drinking'] = df.apply(drinking_reason, axis=1)
-df['Used_For_Agriculture'] = df.apply(agriculture_reason, axis=1)
-
 # Detect which page is active
 current_page = st.session_state.get("current_page", "🏠 Home")  # Default to home
 
@@ -280,14 +209,16 @@ st.markdown(sidebar_styles.get(current_page, ""), unsafe_allow_html=True)
 # Navigation without sidebar
 page = st.radio("", ["🏠 Home", "📊 Visualization", "📞 Contact Us"], horizontal=True)
 st.session_state.current_page = page  # Update the current page in session state
+profiler.set_page(page)
 
-with st.spinner(f"⏳ Loading {page}... Please wait."):
+with profiler.stage("page_switch_delay"), st.spinner(f"⏳ Loading {page}... Please wait."):
     time.sleep(2.5)  # Loading delay for page switch
 
 if page == "🏠 Home":
     st.title("🏠 Home - Water Potability Classification")
     st.write("This application classifies water quality based on potability, pH, and hardness levels.")
-    st.dataframe(df.head(100))
+    with profiler.stage("dataframe_head"):
+        st.dataframe(df.head(100))
     
     # Water Classification User Input
     st.write("## 🧪 Check Water Suitability")
@@ -301,40 +232,52 @@ if page == "🏠 Home":
     with col3:
         sulfate_value = st.number_input("Enter Sulfate value (ppm)", min_value=0.0, max_value=500.0, step=0.1)
         conductivity_value = st.number_input("Enter Conductivity value (μS/cm)", min_value=0, max_value=10000, step=1)
+    with col1:
+        organic_carbon_value = st.number_input("Enter Organic Carbon value (ppm)", min_value=0.0, max_value=50.0, step=0.1)
+    with col2:
+        trihalomethanes_value = st.number_input("Enter Trihalomethanes value (μg/L)", min_value=0.0, max_value=150.0, step=0.1)
+    with col3:
+        turbidity_value = st.number_input("Enter Turbidity value (NTU)", min_value=0.0, max_value=10.0, step=0.1)
     
     if st.button("🔍 Classify Water"):
-        test_row = pd.Series({
-            'ph': ph_value, 
-            'Hardness': hardness_value, 
+        # Potability comes from the trained model (micro-batched with other sessions' checks)
+        sample = {
+            'ph': ph_value,
+            'Hardness': hardness_value,
             'Solids': solids_value,
             'Chloramines': chloramines_value,
             'Sulfate': sulfate_value,
             'Conductivity': conductivity_value,
-            'Potability': 1 if 6.5 <= ph_value <= 8.5 else 0
-        })
+            'Organic_carbon': organic_carbon_value,
+            'Trihalomethanes': trihalomethanes_value,
+            'Turbidity': turbidity_value,
+        }
+        try:
+            with profiler.stage("predict_sample"):
+                from inference import predict_sample
+                potability, potable_probability = predict_sample(sample)
+        except Exception as e:
+            st.warning(f"⚠️ Prediction model unavailable ({e}); falling back to the pH rule.")
+            potability, potable_probability = (1 if 6.5 <= ph_value <= 8.5 else 0), None
+        test_row = {'ph': ph_value, 'Hardness': hardness_value, 'Potability': potability}
         st.success(f"**Water Usage:** {classify_water(test_row)}")
         st.info(f"**Used for Drinking:** {drinking_reason(test_row)}")
         st.warning(f"**Used for Agriculture:** {agriculture_reason(test_row)}")
+        if potable_probability is not None:
+            st.caption(f"Model probability of potable water: {potable_probability:.1%}")
 
 elif page == "📊 Visualization":
     st.title("📊 Water Classification Visualization")
-    water_usage_counts = df['Water_Usage'].value_counts().reset_index()
-    water_usage_counts.columns = ['Water Usage Category', 'Count']
-
-    fig_bar = px.bar(water_usage_counts, x='Water Usage Category', y='Count',
-                     labels={'Water Usage Category': 'Usage Type', 'Count': 'Number of Samples'},
-                     color='Water Usage Category', title="Water Classification Breakdown")
-    st.plotly_chart(fig_bar)
+    import charts
+    import stats
+    # Counts are computed once per dataset version and figures once per distinct counts
+    version = dataset_version()
+    with charts.stage("figure_bar"):
+        st.plotly_chart(charts.usage_bar(stats.value_counts(df, version, 'Water_Usage')))
     
     st.write("### 🚰 Potability Distribution")
-    potability_counts = df['Potability'].value_counts().reset_index()
-    potability_counts.columns = ['Potability', 'Count']
-    potability_counts['Potability'] = potability_counts['Potability'].map({1: 'Potable (Safe)', 0: 'Non-Potable (Unsafe)'})
-
-    fig_pie = px.pie(potability_counts, names='Potability', values='Count',
-                     title="Potable vs Non-Potable Water",
-                     color='Potability', color_discrete_map={'Potable (Safe)': 'green', 'Non-Potable (Unsafe)': 'red'})
-    st.plotly_chart(fig_pie)
+    with charts.stage("figure_pie"):
+        st.plotly_chart(charts.potability_pie(stats.value_counts(df, version, 'Potability')))
 
 elif page == "📞 Contact Us":
     st.title("📞 Contact Us")
@@ -344,6 +287,8 @@ elif page == "📞 Contact Us":
 
 st.markdown("</div>", unsafe_allow_html=True)
 
-# Run the app on the correct port
-if __name__ == "__main__":
-    st.run(port=port)
+# Rerun latency panel for admins
+if st.session_state.get("username") == "admin":
+    profiler.render_panel(st)
+startup.mark_first_render(page)
+profiler.end_rerun()
@@ -0,0 +1,105 @@
+import logging
+import os
+import secrets
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import bcrypt
+from itsdangerous import BadSignature, SignatureExpired, URLSafeTimedSerializer
+
+# Password hashing runs on a small dedicated pool so a burst of logins cannot take every core
+# from the Streamlit script threads. Once a login succeeds the session carries a signed token,
+# and reruns check that token (an HMAC) instead of repeating the bcrypt check.
+BCRYPT_ROUNDS = int(os.environ.get("WATER_BCRYPT_ROUNDS", 12))
+HASH_WORKERS = int(os.environ.get("WATER_HASH_WORKERS", max(1, (os.cpu_count() or 1) // 4)))
+SESSION_MAX_AGE = int(os.environ.get("WATER_SESSION_MAX_AGE", 12 * 3600))
+
+logger = logging.getLogger(__name__)
+
+_executor = ThreadPoolExecutor(max_workers=HASH_WORKERS, thread_name_prefix="bcrypt")
+_hooks = []
+_hooks_lock = threading.Lock()
+
+_secret = os.environ.get("WATER_SESSION_SECRET")
+if not _secret:
+    logger.warning("WATER_SESSION_SECRET is not set; session tokens will not survive a restart")
+    _secret = secrets.token_hex(32)
+_serializer = URLSafeTimedSerializer(_secret, salt="water-potability-session")
+
+
+def add_metrics_hook(hook):
+    # hook(operation, wall_seconds, cpu_seconds, queued_seconds) is called after every hash/check
+    # Registering the same hook again (e.g. on every rerun) is a no-op
+    with _hooks_lock:
+        if hook not in _hooks:
+            _hooks.append(hook)
+
+
+def remove_metrics_hook(hook):
+    with _hooks_lock:
+        _hooks.remove(hook)
+
+
+def _timed(operation, func, *args):
+    submitted = time.perf_counter()
+
+    def run():
+        started = time.perf_counter()
+        cpu_started = time.thread_time()
+        result = func(*args)
+        return result, started - submitted, time.thread_time() - cpu_started
+
+    result, queued, cpu = _executor.submit(run).result()
+    wall = time.perf_counter() - submitted
+    for hook in list(_hooks):
+        try:
+            hook(operation, wall, cpu, queued)
+        except Exception:
+            logger.exception("Auth metrics hook failed")
+    return result
+
+
+def _as_bytes(value):
+    return value.encode() if isinstance(value, str) else value
+
+
+def hash_password(password, rounds=None):
+    salt = bcrypt.gensalt(rounds=rounds or BCRYPT_ROUNDS)
+    return _timed("hash", bcrypt.hashpw, password.encode(), salt)
+
+
+def check_password(password, hashed):
+    return _timed("check", bcrypt.checkpw, password.encode(), _as_bytes(hashed))
+
+
+def hash_cost(hashed):
+    # "$2b$12$..." -> 12
+    try:
+        return int(_as_bytes(hashed).split(b"$")[2])
+    except (IndexError, ValueError):
+        return None
+
+
+def verify_password(password, hashed):
+    """Returns ``(ok, new_hash)``; ``new_hash`` is set when the stored hash used a different
+    work factor than WATER_BCRYPT_ROUNDS and should replace it."""
+    if not check_password(password, hashed):
+        return False, None
+    if hash_cost(hashed) != BCRYPT_ROUNDS:
+        return True, hash_password(password)
+    return True, None
+
+
+def issue_token(username):
+    return _serializer.dumps({"u": username})
+
+
+def verify_token(token, max_age=SESSION_MAX_AGE):
+    # Username for a valid, unexpired token; None otherwise
+    if not token:
+        return None
+    try:
+        return _serializer.loads(token, max_age=max_age)["u"]
+    except (BadSignature, SignatureExpired, KeyError, TypeError):
+        return None
@@ -0,0 +1,327 @@
+"""Concurrent-session load test for one app instance.
+
+    python -m benchmarks.load                                # 1, 5, 10 and 25 sessions, 60 s each
+    python -m benchmarks.load --sessions 10,50 --duration 120 -o load.json
+    python -m benchmarks.load --slo-p99-ms 4000              # exit 1 if any level misses the SLO
+
+Every simulated session is a Streamlit ``AppTest`` running the real scripts in this process, so
+all sessions share one instance's caches, thread pools and GIL, as they would behind one server
+(minus websocket framing); they also share one mock streamlit Runtime and one script cache,
+where AppTest would set up its own for every run. A session logs in (bcrypt + SQLite), switches
+between Home, Visualization and Contact Us, presses "Classify Water", and uploads a CSV to the
+Visualization page. Uploads go through jobs.submit, as the page does, since AppTest cannot drive
+st.file_uploader; the page is then rerun with ?job= until the results render. Every upload is
+freshly generated data, so it is really scored; a share of uploads (--repeat-share) re-sends the
+session's previous file and is reported separately as a result-cache hit.
+
+Each session count runs in its own fresh process, so memory grown by earlier levels (imports,
+caches) does not hide the per-session RSS of later ones.
+
+ChartMogul is replaced by the local stub client and the model by a locally trained stand-in,
+so no credentials or production files are needed.
+"""
+import argparse
+import io
+import json
+import os
+import random
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Project modules read their configuration at import time, so point them at scratch files first
+WORKDIR = tempfile.mkdtemp(prefix="water-load-")
+os.environ.setdefault("WATER_DATASET_PATH", os.path.join(WORKDIR, "water_potability.csv"))
+os.environ.setdefault("WATER_MODEL_PATH", os.path.join(WORKDIR, "model.pkl"))
+os.environ.setdefault("WATER_USERS_DB", os.path.join(WORKDIR, "users.db"))
+os.environ.setdefault("WATER_JOBS_DIR", os.path.join(WORKDIR, "jobs"))
+os.environ.setdefault("WATER_RESULT_CACHE_DIR", os.path.join(WORKDIR, "result_cache"))
+os.environ.setdefault("WATER_SESSION_SECRET", "load-test")
+os.environ.setdefault("WATER_CUSTOMER_CLIENT", "local")
+sys.path.insert(0, ROOT)
+
+from benchmarks import synthetic  # noqa: E402
+
+PAGES = ["🏠 Home", "📊 Visualization", "📞 Contact Us"]
+PASSWORD = "load-test-password"
+UPLOAD_ROWS = 5_000
+REPEAT_SHARE = 0.2
+# "Classify Water" inputs, matched by label
+SAMPLE = {"pH": 7.2, "Hardness": 200, "Solids": 20000, "Chloramines": 7.0, "Sulfate": 330.0,
+          "Conductivity": 420, "Organic Carbon": 14.0, "Trihalomethanes": 66.0, "Turbidity": 4.0}
+TIMEOUT = 120
+
+
+def _rss_bytes():
+    # Current resident set size (Linux); falls back to the peak elsewhere
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _quantile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))] if values else None
+
+
+def prepare(users):
+    # Stand-in dataset, model and user accounts
+    import auth
+    import user_store
+
+    synthetic.generate(10_000, seed=1).to_csv(os.environ["WATER_DATASET_PATH"], index=False)
+    synthetic.train_standin_artifact(os.environ["WATER_MODEL_PATH"])
+    user_store.migrate()
+    password_hash = auth.hash_password(PASSWORD)
+    user_store.bulk_import((f"load{i}", password_hash, f"Load User {i}", f"load{i}@example.com", "")
+                           for i in range(users))
+
+
+def upload_bytes(seed):
+    upload = io.BytesIO()
+    synthetic.generate(UPLOAD_ROWS, seed=seed, feature_names={'ph': 'pH'}).to_csv(upload, index=False)
+    return upload.getvalue()
+
+
+def share_app_test_runtime():
+    # AppTest installs a mock Runtime and turns on global.appTest for each script run, and undoes
+    # both when the run ends, pulling them out from under other sessions' scripts still running in
+    # this process ("Runtime hasn't been created!", then a timeout). Every run gets one shared mock
+    # instead, as one server's sessions share its Runtime. The same goes for the script cache:
+    # AppTest compiles the script afresh for every run, and compiling in several threads at once
+    # trips a CPython 3.11 bug ("AST constructor recursion depth mismatch"); a server compiles
+    # each page once.
+    from unittest.mock import MagicMock
+
+    from streamlit import config
+    from streamlit.runtime import Runtime
+    from streamlit.runtime.caching.storage.dummy_cache_storage import MemoryCacheStorageManager
+    from streamlit.runtime.media_file_manager import MediaFileManager
+    from streamlit.runtime.memory_media_file_storage import MemoryMediaFileStorage
+    from streamlit.runtime.scriptrunner.script_cache import ScriptCache
+    from streamlit.testing.v1 import local_script_runner
+
+    runtime = MagicMock(spec=Runtime)
+    runtime.media_file_mgr = MediaFileManager(MemoryMediaFileStorage("/mock/media"))
+    runtime.cache_storage_manager = MemoryCacheStorageManager()
+    Runtime.instance = classmethod(lambda cls: runtime)
+    Runtime.exists = classmethod(lambda cls: True)
+    config.set_option("global.appTest", True)
+    script_cache = ScriptCache()
+    local_script_runner.ScriptCache = lambda: script_cache
+
+
+class Session:
+    """One simulated browser session; every script run is timed as a rerun."""
+
+    def __init__(self, index, repeat_share, latencies, errors):
+        from streamlit.testing.v1 import AppTest
+
+        self.username = f"load{index}"
+        self.repeat_share = repeat_share
+        self.upload = None
+        self.latencies = latencies
+        self.errors = errors
+        self.rng = random.Random(index)
+        self.app = AppTest.from_file(os.path.join(ROOT, "app.py"), default_timeout=TIMEOUT)
+        self.page = None
+
+    def _run(self, name, at):
+        start = time.perf_counter()
+        at.run()
+        self.latencies.setdefault(name, []).append(time.perf_counter() - start)
+        if at.exception:
+            self.errors.append(f"{name}: {at.exception[0].message}")
+
+    def login(self):
+        self._run("login_screen", self.app)
+        self.app.text_input[0].input(self.username)
+        self.app.text_input[1].input(PASSWORD)
+        self.app.button[0].click()
+        self._run("login", self.app)
+        if "auth_token" not in self.app.session_state:
+            # Every later step would silently drive the login screen instead of the app
+            raise RuntimeError(f"login failed: {[e.value for e in self.app.error]}")
+
+    def switch_page(self):
+        page = self.rng.choice(PAGES)
+        self.app.radio[0].set_value(page)
+        self._run(f"page[{page.split()[-1].lower()}]", self.app)
+
+    def classify(self):
+        self.app.radio[0].set_value(PAGES[0])
+        self._run("page[home]", self.app)
+        for number_input in self.app.number_input:
+            for label, value in SAMPLE.items():
+                if label in number_input.label:
+                    number_input.set_value(value)
+        next(b for b in self.app.button if "Classify" in b.label).click()
+        self._run("classify", self.app)
+
+    def upload_csv(self):
+        from streamlit.testing.v1 import AppTest
+
+        import jobs
+
+        # New data unless this is a deliberate re-send, so the upload is scored and not a cache hit
+        repeat = self.upload is not None and self.rng.random() < self.repeat_share
+        if not repeat:
+            self.upload = upload_bytes(self.rng.randrange(2 ** 31))
+        # Opened through app.py like every other session: streamlit caches one page list per process,
+        # built from the first main script it sees, and app.py sessions would otherwise start running
+        # visualization.py once that page had filled the cache
+        page = AppTest.from_file(os.path.join(ROOT, "app.py"), default_timeout=TIMEOUT)
+        page.switch_page("pages/visualization.py")
+        page.session_state["username"] = self.username
+        start = time.perf_counter()
+        job_id = jobs.submit(io.BytesIO(self.upload))
+        page.query_params["job"] = job_id
+        self._run("upload_page", page)
+        while not page.exception and not any("Scored" in s.value or "served" in s.value for s in page.success):
+            if time.perf_counter() - start > TIMEOUT:
+                self.errors.append("upload: job did not finish")
+                return
+            time.sleep(0.2)
+            self._run("upload_poll", page)
+        cached = (jobs.status(job_id) or {}).get("cached")
+        name = "upload_cached_to_results" if cached else "upload_to_results"
+        self.latencies.setdefault(name, []).append(time.perf_counter() - start)
+
+    def step(self):
+        action = self.rng.choices([self.switch_page, self.classify, self.upload_csv], weights=[6, 3, 1])[0]
+        action()
+
+
+def run_level(sessions, duration, repeat_share=REPEAT_SHARE):
+    share_app_test_runtime()
+    latencies, errors = {}, []
+    actions = [0]
+    # The measured window starts when every session has logged in and the barrier releases
+    window = {}
+    barrier = threading.Barrier(sessions + 1, action=lambda: window.update(
+        stop=time.perf_counter() + duration, cpu=time.process_time(), wall=time.perf_counter()))
+    lock = threading.Lock()
+
+    def worker(index):
+        session_latencies = {}
+        try:
+            session = Session(index, repeat_share, session_latencies, errors)
+            session.login()
+            barrier.wait()
+            while time.perf_counter() < window["stop"]:
+                session.step()
+                with lock:
+                    actions[0] += 1
+        except threading.BrokenBarrierError:
+            pass
+        except Exception as e:
+            errors.append(f"session {index}: {type(e).__name__}: {e}")
+            barrier.abort()
+        finally:
+            with lock:
+                for name, values in session_latencies.items():
+                    latencies.setdefault(name, []).extend(values)
+
+    threads = [threading.Thread(target=worker, args=(i,), daemon=True) for i in range(sessions)]
+    rss_before = _rss_bytes()
+    for thread in threads:
+        thread.start()
+    try:
+        barrier.wait()
+    except threading.BrokenBarrierError:
+        window.setdefault("cpu", time.process_time())
+        window.setdefault("wall", time.perf_counter())
+    cpu_start, wall_start = window["cpu"], window["wall"]
+    peak_rss = rss_before
+    while any(thread.is_alive() for thread in threads):
+        time.sleep(0.5)
+        peak_rss = max(peak_rss, _rss_bytes())
+    wall = time.perf_counter() - wall_start
+    cpu = time.process_time() - cpu_start
+
+    reruns = [value for name, values in latencies.items() if not name.endswith("_to_results") for value in values]
+    return {
+        "sessions": sessions,
+        "seconds": wall,
+        "actions": actions[0],
+        "actions_per_second": actions[0] / wall if wall else None,
+        "reruns": len(reruns),
+        "reruns_per_second": len(reruns) / wall if wall else None,
+        "rerun_p50_ms": (_quantile(reruns, 0.5) or 0) * 1000,
+        "rerun_p99_ms": (_quantile(reruns, 0.99) or 0) * 1000,
+        "by_step": {name: {"count": len(values), "p50_ms": _quantile(values, 0.5) * 1000,
+                           "p99_ms": _quantile(values, 0.99) * 1000, "mean_ms": statistics.mean(values) * 1000}
+                    for name, values in sorted(latencies.items())},
+        "cpu_cores": cpu / wall if wall else None,
+        "cpu_seconds_per_session": cpu / sessions,
+        "uploads_scored": len(latencies.get("upload_to_results", [])),
+        "uploads_cached": len(latencies.get("upload_cached_to_results", [])),
+        "rss_mb": peak_rss / 2 ** 20,
+        # Includes the app's own imports and caches, which the first session pays for
+        "rss_mb_baseline": rss_before / 2 ** 20,
+        "rss_mb_per_session": (peak_rss - rss_before) / 2 ** 20 / sessions,
+        "errors": errors[:20],
+        "error_count": len(errors),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", default="1,5,10,25", help="comma-separated concurrent session counts")
+    parser.add_argument("--duration", type=float, default=60.0, help="measured seconds per session count")
+    parser.add_argument("-o", "--output", help="write results JSON here (default: stdout)")
+    parser.add_argument("--slo-p99-ms", type=float, help="fail if any level's p99 rerun latency exceeds this")
+    parser.add_argument("--repeat-share", type=float, default=REPEAT_SHARE,
+                        help="share of uploads that re-send the previous file (result-cache hits)")
+    parser.add_argument("--level", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.level:
+        # Child process for one session count; the parent has prepared the scratch files
+        print(json.dumps(run_level(args.level, args.duration, args.repeat_share)))
+        return
+
+    levels = [int(n) for n in args.sessions.split(",")]
+    prepare(max(levels))
+    results = []
+    for sessions in levels:
+        # The environment (and so WORKDIR) is inherited, so the child uses the prepared files
+        child = subprocess.run([sys.executable, "-m", "benchmarks.load", "--level", str(sessions),
+                                "--duration", str(args.duration), "--repeat-share", str(args.repeat_share)],
+                               cwd=ROOT, capture_output=True, text=True)
+        if child.returncode:
+            sys.exit(f"{sessions} sessions: load test process failed\n{child.stderr}")
+        result = json.loads(child.stdout.strip().splitlines()[-1])
+        results.append(result)
+        print(f"{sessions:4d} sessions  {result['reruns_per_second']:7.1f} reruns/s  "
+              f"p50 {result['rerun_p50_ms']:8.0f} ms  p99 {result['rerun_p99_ms']:8.0f} ms  "
+              f"cpu {result['cpu_cores']:5.2f} cores  rss {result['rss_mb']:7.0f} MB "
+              f"(+{result['rss_mb_per_session']:.1f} MB/session)  uploads {result['uploads_scored']} scored / "
+              f"{result['uploads_cached']} cached  errors {result['error_count']}", file=sys.stderr)
+
+    text = json.dumps({"meta": {"timestamp": time.time(), "cpu_count": os.cpu_count(),
+                                "duration": args.duration}, "levels": results}, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text)
+    else:
+        print(text)
+
+    failed = [r["sessions"] for r in results
+              if r["error_count"] or (args.slo_p99_ms and r["rerun_p99_ms"] > args.slo_p99_ms)]
+    if failed:
+        print(f"Session counts with errors or over the p99 SLO: {failed}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
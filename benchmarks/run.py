@@ -0,0 +1,242 @@
+"""Benchmark suite for classification, preprocessing, scoring and page reruns.
+
+    python -m benchmarks.run                                  # 10k, 1m and 10m rows
+    python -m benchmarks.run --sizes 10k,1m -o current.json
+    python -m benchmarks.run --baseline baseline.json         # exit 1 on regressions
+
+Everything runs against synthetic data and a locally trained stand-in model, so no
+production files are needed.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Project modules read their configuration at import time, so point them at scratch files first
+WORKDIR = tempfile.mkdtemp(prefix="water-bench-")
+os.environ.setdefault("WATER_DATASET_PATH", os.path.join(WORKDIR, "water_potability.csv"))
+os.environ.setdefault("WATER_MODEL_PATH", os.path.join(WORKDIR, "model.pkl"))
+os.environ.setdefault("WATER_USERS_DB", os.path.join(WORKDIR, "users.db"))
+os.environ.setdefault("WATER_JOBS_DIR", os.path.join(WORKDIR, "jobs"))
+os.environ.setdefault("WATER_SESSION_SECRET", "benchmark")
+os.environ.setdefault("WATER_CUSTOMER_CLIENT", "local")
+sys.path.insert(0, ROOT)
+
+from benchmarks import synthetic  # noqa: E402
+import dataset  # noqa: E402
+import fused  # noqa: E402
+import pipeline  # noqa: E402
+import schema  # noqa: E402
+import scoring  # noqa: E402
+from parallel import predict_parallel  # noqa: E402
+
+# Row-wise apply is kept as the reference implementation; above this size it is skipped
+ROWWISE_MAX_ROWS = 1_000_000
+# Largest allowed |fused - sklearn| difference in the probability of potable
+FUSED_TOLERANCE = fused.TOLERANCE
+# Sensor exports spell two columns differently; they are written with these headers to time parsing
+UPLOAD_HEADERS = {'ph': 'pH', 'Organic_carbon': 'Organic_Carbon'}
+
+
+def legacy_classify_usage(row):
+    # Row-wise rule as it used to run in pages/visualization.py (on canonical column names)
+    drinking_safe = (6.5 <= row['ph'] <= 8.5) and row['Potability Prediction'] == 1
+    agriculture_safe = row['ph'] >= 6.0 and row['Sulfate'] <= 400 and row['Conductivity'] <= 3000
+    industry_safe = row['Hardness'] <= 500 and row['Conductivity'] <= 5000
+    return pd.Series([drinking_safe, agriculture_safe, industry_safe],
+                     index=['Drinking Safe', 'Agriculture Safe', 'Industry Safe'])
+
+
+def _chunks(df, rows=scoring.CHUNK_ROWS):
+    for start in range(0, len(df), rows):
+        yield df.iloc[start:start + rows]
+
+
+def timed(func, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return {"min": min(times), "median": statistics.median(times), "repeat": repeat}
+
+
+def dataset_benchmarks(df):
+    small = len(df) <= ROWWISE_MAX_ROWS
+    yield "classify_rowwise", small, lambda: (
+        df.apply(dataset.classify_water, axis=1),
+        df.apply(dataset.drinking_reason, axis=1),
+        df.apply(dataset.agriculture_reason, axis=1),
+    )
+    yield "classify_vectorized", True, lambda: dataset.add_usage_columns(df.copy())
+
+
+def parse_benchmarks(csv_path):
+    yield "read_csv_pandas", True, lambda: pd.read_csv(csv_path)
+    yield "read_csv_schema", True, lambda: schema.read_csv(csv_path, required=schema.MEASUREMENTS)
+
+
+def upload_benchmarks(upload, artifact):
+    scored = upload.assign(**{'Potability Prediction': (upload['Potability'] == 1).astype(np.int64)})
+    small = len(upload) <= ROWWISE_MAX_ROWS
+    yield "classify_usage_rowwise", small, lambda: scored.apply(legacy_classify_usage, axis=1)
+    yield "classify_usage_vectorized", True, lambda: scoring.add_usage_flags(scored.copy())
+    yield "poly_scale_sklearn", True, lambda: [
+        artifact["preprocessor"].transform(pipeline.feature_matrix(c)) for c in _chunks(upload)]
+    yield "poly_scale_transform", True, lambda: [pipeline.transform(artifact, c) for c in _chunks(upload)]
+    yield "batch_predict", True, lambda: [predict_parallel(artifact, c) for c in _chunks(upload)]
+
+
+def fused_equivalence(artifact, upload):
+    # The fused float32 kernel against the sklearn float64 chain, on the first chunk
+    sample = next(_chunks(upload))
+    params = fused.params_for(artifact["preprocessor"])
+    if params is None:
+        return {"skipped": "preprocessor is not a poly + robust-scaler pipeline"}
+    reference = artifact["preprocessor"].transform(pipeline.feature_matrix(sample))
+    features = fused.transform(pipeline.feature_matrix(sample, dtype=np.float32), params)
+    ref_labels, ref_probabilities = pipeline.predict_matrix(artifact["model"], reference)
+    labels, probabilities = pipeline.predict_matrix(artifact["model"], features)
+    scale = np.maximum(np.abs(reference), 1.0)
+    result = {
+        "rows": len(sample),
+        "max_feature_error": float(np.nanmax(np.abs(features - reference) / scale)),
+        "max_probability_error": float(np.max(np.abs(probabilities[:, 1] - ref_probabilities[:, 1]))),
+        "label_agreement": float(np.mean(labels == ref_labels)),
+    }
+    result["ok"] = result["max_probability_error"] <= FUSED_TOLERANCE
+    return result
+
+
+def rerun_benchmarks(repeat):
+    # Full page reruns through Streamlit's AppTest, logged in as admin
+    from streamlit.testing.v1 import AppTest
+
+    import auth
+
+    results = {}
+    at = AppTest.from_file(os.path.join(ROOT, "app.py"), default_timeout=120)
+    at.session_state["username"] = "admin"
+    at.session_state["auth_token"] = auth.issue_token("admin")
+    at.run()
+    if at.exception:
+        raise RuntimeError(f"app.py raised during the benchmark: {at.exception}")
+    for page in ["🏠 Home", "📊 Visualization", "📞 Contact Us"]:
+        at.radio[0].set_value(page).run()
+        results[f"rerun[{page.split()[-1].lower()}]"] = timed(at.run, repeat)
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=ROOT, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(sizes, repeat, reruns):
+    synthetic.generate(10_000, seed=1).to_csv(os.environ["WATER_DATASET_PATH"], index=False)
+    synthetic.train_standin_artifact(os.environ["WATER_MODEL_PATH"])
+    artifact = pipeline.load_artifact(os.environ["WATER_MODEL_PATH"])
+
+    results, checks = {}, {}
+    for size in sizes:
+        rows = synthetic.parse_size(size)
+        df = synthetic.generate(rows, seed=2)
+        upload = df
+        csv_path = os.path.join(WORKDIR, f"upload-{size}.csv")
+        df.rename(columns=UPLOAD_HEADERS).to_csv(csv_path, index=False)
+        runs = 1 if rows >= 1_000_000 else repeat
+        benchmarks = [*dataset_benchmarks(df), *parse_benchmarks(csv_path), *upload_benchmarks(upload, artifact)]
+        for name, enabled, func in benchmarks:
+            key = f"{name}@{size}"
+            if not enabled:
+                results[key] = {"skipped": f"row-wise apply is not run above {ROWWISE_MAX_ROWS:,} rows"}
+                continue
+            result = timed(func, runs)
+            result["rows"] = rows
+            result["rows_per_second"] = rows / result["min"] if result["min"] else None
+            results[key] = result
+            print(f"{key:40s} {result['min'] * 1000:12.1f} ms  {result['rows_per_second']:>14,.0f} rows/s",
+                  file=sys.stderr)
+        checks[f"fused_equivalence@{size}"] = fused_equivalence(artifact, upload)
+        os.remove(csv_path)
+        del df, upload
+
+    if reruns:
+        for key, result in rerun_benchmarks(repeat).items():
+            results[key] = result
+            print(f"{key:40s} {result['min'] * 1000:12.1f} ms", file=sys.stderr)
+
+    return {
+        "meta": {
+            "timestamp": time.time(),
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+        },
+        "results": results,
+        "checks": checks,
+    }
+
+
+def compare(current, baseline, tolerance):
+    # Regressions are benchmarks whose best time grew by more than ``tolerance`` (0.2 = 20%)
+    regressions = []
+    for key, result in sorted(current["results"].items()):
+        base = baseline["results"].get(key)
+        if not base or "min" not in base or "min" not in result:
+            continue
+        ratio = result["min"] / base["min"] if base["min"] else float("inf")
+        flag = "REGRESSION" if ratio > 1 + tolerance else ""
+        print(f"{key:40s} {base['min'] * 1000:10.1f} -> {result['min'] * 1000:10.1f} ms  x{ratio:5.2f} {flag}",
+              file=sys.stderr)
+        if flag:
+            regressions.append(key)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="10k,1m,10m", help="comma-separated row counts (10k, 1m, 10m or ints)")
+    parser.add_argument("--repeat", type=int, default=5, help="runs per benchmark below 1m rows")
+    parser.add_argument("--no-reruns", action="store_true", help="skip the Streamlit AppTest page reruns")
+    parser.add_argument("-o", "--output", help="write results JSON here (default: stdout)")
+    parser.add_argument("--baseline", help="results JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed slowdown before failing")
+    args = parser.parse_args(argv)
+
+    results = run(args.sizes.split(","), args.repeat, not args.no_reruns)
+    text = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text)
+    else:
+        print(text)
+
+    failed = [name for name, check in results["checks"].items() if check.get("ok") is False]
+    if failed:
+        print(f"Equivalence checks failed: {', '.join(failed)}", file=sys.stderr)
+        sys.exit(1)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        if regressions:
+            print(f"{len(regressions)} benchmark(s) regressed: {', '.join(regressions)}", file=sys.stderr)
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
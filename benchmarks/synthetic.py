@@ -0,0 +1,67 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+# Synthetic water-quality data with the columns and NaN rates of water_potability.csv.
+# Column statistics are read from the real CSV when it is available, otherwise these
+# published values for the public dataset are used: (mean, std, NaN rate).
+COLUMN_STATS = {
+    'ph': (7.081, 1.594, 0.150),
+    'Hardness': (196.37, 32.88, 0.0),
+    'Solids': (22014.09, 8768.57, 0.0),
+    'Chloramines': (7.122, 1.583, 0.0),
+    'Sulfate': (333.78, 41.42, 0.238),
+    'Conductivity': (426.21, 80.82, 0.0),
+    'Organic_carbon': (14.28, 3.31, 0.0),
+    'Trihalomethanes': (66.40, 16.18, 0.049),
+    'Turbidity': (3.967, 0.780, 0.0),
+}
+POTABLE_RATE = 0.39
+
+SIZES = {"10k": 10_000, "100k": 100_000, "1m": 1_000_000, "10m": 10_000_000}
+
+
+def column_stats(path="water_potability.csv"):
+    if not os.path.exists(path):
+        return dict(COLUMN_STATS), POTABLE_RATE
+    df = pd.read_csv(path)
+    stats = {c: (float(df[c].mean()), float(df[c].std()), float(df[c].isna().mean())) for c in COLUMN_STATS}
+    return stats, float(df['Potability'].mean())
+
+
+def generate(rows, seed=0, stats=None, potable_rate=None, feature_names=None):
+    """Synthetic frame with ``rows`` samples. ``feature_names`` optionally renames the columns
+    (e.g. {'ph': 'pH'} for upload-style headers)."""
+    if stats is None:
+        stats, default_rate = column_stats()
+        potable_rate = default_rate if potable_rate is None else potable_rate
+    rng = np.random.default_rng(seed)
+    data = {}
+    for column, (mean, std, nan_rate) in stats.items():
+        values = rng.normal(mean, std, rows)
+        np.maximum(values, 0.0, out=values)
+        if nan_rate:
+            values[rng.random(rows) < nan_rate] = np.nan
+        data[column] = values
+    data['Potability'] = (rng.random(rows) < (POTABLE_RATE if potable_rate is None else potable_rate)).astype(np.int64)
+    df = pd.DataFrame(data)
+    return df.rename(columns=feature_names) if feature_names else df
+
+
+def parse_size(size):
+    return SIZES[size.lower()] if size.lower() in SIZES else int(size)
+
+
+def train_standin_artifact(path, rows=10_000, seed=0):
+    # Small locally trained model with the production feature pipeline, for benchmarks and load tests
+    from sklearn.ensemble import HistGradientBoostingClassifier
+
+    from pipeline import build_artifact, feature_matrix, fit_preprocessor, save_artifact
+
+    train_df = generate(rows, seed=seed)
+    preprocessor = fit_preprocessor(train_df)
+    model = HistGradientBoostingClassifier(max_iter=100, random_state=seed)
+    model.fit(preprocessor.transform(feature_matrix(train_df)), train_df['Potability'])
+    save_artifact(build_artifact(model, preprocessor, version="standin"), path)
+    return path
@@ -0,0 +1,141 @@
+import hashlib
+import io
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+import profiler
+
+# Figures are built from small aggregates (category counts, histogram bins; see stats.py for the
+# per-dataset-version ones) and cached keyed by a hash of that aggregate: plotly figures as the
+# finished go.Figure, matplotlib figures as PNG bytes. A go.Figure is handed to st.plotly_chart
+# as-is, which only serializes it; a dict would be rebuilt and re-validated on every rerun. The
+# cached figures are shared by every session and must not be modified. Least recently used
+# figures are dropped once more than FIGURE_CACHE are held.
+FIGURE_CACHE = int(os.environ.get("WATER_FIGURE_CACHE", 64))
+
+# What st.pyplot renders with, so the cached PNG looks the same
+PNG_OPTIONS = {"format": "png", "bbox_inches": "tight", "dpi": 200}
+
+_lock = threading.Lock()
+_figures = OrderedDict()
+_counts = {"hits": 0, "misses": 0}
+_local = threading.local()
+
+
+def _key(kind, inputs):
+    return hashlib.sha256(json.dumps([kind, inputs], sort_keys=True, default=str).encode()).hexdigest()
+
+
+def cached(kind, build, **inputs):
+    """Serialized figure ``build(**inputs)``, built once per distinct ``inputs``. Builders must
+    depend on nothing but their inputs, since the inputs are the whole cache key."""
+    key = _key(kind, inputs)
+    with _lock:
+        figure = _figures.get(key)
+        if figure is not None:
+            _figures.move_to_end(key)
+            _counts["hits"] += 1
+            return figure
+        _counts["misses"] += 1
+    _local.built = True
+    # Built outside the lock; two sessions missing at once both build and the last one is kept
+    figure = build(**inputs)
+    with _lock:
+        _figures[key] = figure
+        _figures.move_to_end(key)
+        while len(_figures) > FIGURE_CACHE:
+            _figures.popitem(last=False)
+    return figure
+
+
+@contextmanager
+def stage(name):
+    # profiler.stage for a chart, recorded as "<name> (hit)" or "<name> (build)", so the cost of
+    # drawing an unchanged chart is visible on its own
+    _local.built = False
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        profiler.record(f"{name} ({'build' if _local.built else 'hit'})", time.perf_counter() - start)
+
+
+def info():
+    with _lock:
+        return {"figures": len(_figures), "hits": _counts["hits"], "misses": _counts["misses"],
+                "bytes": sum(len(f) for f in _figures.values() if isinstance(f, bytes))}
+
+
+def clear():
+    with _lock:
+        _figures.clear()
+
+
+def _usage_bar(counts):
+    import plotly.express as px
+
+    data = {'Water Usage Category': list(counts), 'Count': list(counts.values())}
+    return px.bar(data, x='Water Usage Category', y='Count',
+                  labels={'Water Usage Category': 'Usage Type', 'Count': 'Number of Samples'},
+                  color='Water Usage Category', title="Water Classification Breakdown")
+
+
+def usage_bar(counts):
+    # counts: {usage category: samples}
+    return cached("usage_bar", _usage_bar, counts={str(k): int(v) for k, v in counts.items()})
+
+
+def _potability_pie(counts):
+    import plotly.express as px
+
+    names = {1: 'Potable (Safe)', 0: 'Non-Potable (Unsafe)'}
+    data = {'Potability': [names.get(int(k), k) for k in counts], 'Count': list(counts.values())}
+    return px.pie(data, names='Potability', values='Count', title="Potable vs Non-Potable Water",
+                  color='Potability', color_discrete_map={'Potable (Safe)': 'green', 'Non-Potable (Unsafe)': 'red'})
+
+
+def potability_pie(counts):
+    # counts: {0 or 1: samples}
+    return cached("potability_pie", _potability_pie, counts={int(k): int(v) for k, v in counts.items()})
+
+
+def _histogram(column_stats, title, color, x_title):
+    import stats
+
+    return stats.histogram_figure(column_stats, title, color, x_title)
+
+
+def histogram(column_stats, title, color, x_title=None):
+    # Keyed by the bins only; the summary numbers do not change the figure
+    bins = {"counts": column_stats["counts"], "edges": column_stats["edges"]}
+    return cached("histogram", _histogram, column_stats=bins, title=title, color=color, x_title=x_title)
+
+
+def _quality_pie(labels, sizes, colors):
+    # matplotlib's object API rather than pyplot: no global figure state, safe across sessions.
+    # A new figure looks at sys.modules["IPython"], which plotly imports lazily (plotly.tools, on
+    # the first chart it builds); while another session is still in that import the module is
+    # half-initialized and the check raises. Importing IPython first waits for it to finish.
+    try:
+        import IPython  # noqa: F401
+    except ImportError:
+        pass
+    from matplotlib.figure import Figure
+
+    fig = Figure()
+    ax = fig.subplots()
+    ax.pie(sizes, labels=labels, autopct='%1.1f%%', colors=colors, startangle=90, wedgeprops={"edgecolor": "black"})
+    ax.axis('equal')  # Equal aspect ratio ensures that pie is drawn as a circle
+    buffer = io.BytesIO()
+    fig.savefig(buffer, **PNG_OPTIONS)
+    return buffer.getvalue()
+
+
+def quality_pie(sizes):
+    # PNG bytes of the Drinking / Agriculture / Industry Safe pie on the upload page
+    return cached("quality_pie", _quality_pie, labels=['Drinking Safe', 'Agriculture Safe', 'Industry Safe'],
+                  sizes=[int(s) for s in sizes], colors=['#66b3ff', '#99ff99', '#ffcc99'])
@@ -0,0 +1,134 @@
+import argparse
+import json
+import os
+import sys
+
+# Headless entry point sharing the app's scoring pipeline:
+#   python cli.py score nightly.csv -o scored.parquet
+#   cat nightly.csv | python cli.py score - > scored.csv
+#   python cli.py export jobs/<id>/result.parquet --format arrow --compression zstd -o scored.arrow
+#   python cli.py serve --port 8000
+
+
+def _detect_format(path, explicit):
+    if explicit:
+        return explicit
+    return "parquet" if path.lower().endswith((".parquet", ".pq")) else "csv"
+
+
+def score(args):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    import model_registry
+    import parallel
+    import scoring
+
+    if args.model:
+        model_registry.register(model_registry.DEFAULT_MODEL, args.model)
+    if args.workers:
+        parallel.SCORING_WORKERS = args.workers
+    parallel.limit_native_threads()
+    artifact = model_registry.get_artifact()
+
+    source = sys.stdin.buffer if args.input == "-" else args.input
+    input_format = _detect_format("" if args.input == "-" else args.input, args.input_format)
+    to_stdout = args.output in (None, "-")
+    output_format = "csv" if to_stdout else _detect_format(args.output, args.output_format)
+    if to_stdout and args.output_format == "parquet":
+        sys.exit("Parquet output needs a file path (-o)")
+
+    summary = scoring.empty_summary()
+    chunks = scoring.iter_scored(scoring.read_chunks(source, args.chunk_rows, input_format), artifact, summary,
+                                 args.profile, keep_names=True)
+    try:
+        if output_format == "parquet":
+            writer = None
+            for scored in chunks:
+                table = pa.Table.from_pandas(scored, preserve_index=False)
+                if writer is None:
+                    writer = pq.ParquetWriter(args.output, table.schema)
+                writer.write_table(table)
+            if writer is None:
+                pq.write_table(pa.Table.from_pandas(scoring.empty_result_frame(), preserve_index=False), args.output)
+            else:
+                writer.close()
+        else:
+            out = sys.stdout if to_stdout else open(args.output, "w", newline="")
+            try:
+                header = True
+                for scored in chunks:
+                    scored.to_csv(out, index=False, header=header)
+                    header = False
+                if header:
+                    scoring.empty_result_frame().to_csv(out, index=False)
+            finally:
+                if not to_stdout:
+                    out.close()
+    except scoring.MissingColumnsError as e:
+        sys.exit(f"Input is missing these columns: {sorted(e.missing)}")
+    except scoring.InvalidInputError as e:
+        sys.exit(str(e))
+
+    summary["model_version"] = artifact["version"]
+    print(json.dumps(summary), file=sys.stderr)
+
+
+def export_results(args):
+    import export
+
+    out = sys.stdout.buffer if args.output in (None, "-") else open(args.output, "wb")
+    try:
+        for data in export.iter_export(args.input, args.format, args.columns, args.compression):
+            out.write(data)
+    except ValueError as e:
+        sys.exit(str(e))
+    finally:
+        if out is not sys.stdout.buffer:
+            out.close()
+
+
+def serve(args):
+    import model_registry
+    import parallel
+    from service import create_app
+
+    parallel.limit_native_threads()
+    model_registry.warm_up()
+    create_app().run(host=args.host, port=args.port, threaded=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="water-potability", description="Water potability batch scoring")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    score_parser = commands.add_parser("score", help="score a CSV or Parquet file")
+    score_parser.add_argument("input", help="input path, or - for stdin")
+    score_parser.add_argument("-o", "--output", help="output path (default: CSV on stdout)")
+    score_parser.add_argument("--input-format", choices=["csv", "parquet"], help="default: from the file extension")
+    score_parser.add_argument("--output-format", choices=["csv", "parquet"], help="default: from the file extension")
+    score_parser.add_argument("--chunk-rows", type=int, default=int(os.environ.get("WATER_SCORING_CHUNK_ROWS", 100_000)))
+    score_parser.add_argument("--model", help="artifact path (default: WATER_MODEL_PATH)")
+    score_parser.add_argument("--workers", type=int, help="scoring threads (default: WATER_SCORING_WORKERS)")
+    score_parser.add_argument("--profile", help="rules profile from rules.json (default: WATER_RULES_PROFILE)")
+    score_parser.set_defaults(func=score)
+
+    export_parser = commands.add_parser("export", help="re-encode a scored Parquet file")
+    export_parser.add_argument("input", help="scored Parquet file (e.g. jobs/<id>/result.parquet)")
+    export_parser.add_argument("-o", "--output", help="output path (default: stdout)")
+    export_parser.add_argument("--format", choices=["csv", "parquet", "arrow"], default="csv")
+    export_parser.add_argument("--columns", type=lambda value: value.split(","), help="comma-separated columns to keep")
+    export_parser.add_argument("--compression", help="csv: gzip; parquet: snappy, zstd, gzip; arrow: lz4, zstd")
+    export_parser.set_defaults(func=export_results)
+
+    serve_parser = commands.add_parser("serve", help="run the HTTP scoring service")
+    serve_parser.add_argument("--host", default="127.0.0.1")
+    serve_parser.add_argument("--port", type=int, default=int(os.environ.get("WATER_SERVICE_PORT", 8000)))
+    serve_parser.set_defaults(func=serve)
+
+    args = parser.parse_args(argv)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+import hashlib
+import os
+import threading
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process publish lock
+    fcntl = None
+
+import numpy as np
+import pandas as pd
+
+import rules
+import schema
+
+# Shared dataset layer: the CSV is parsed and classified once per host and published next to it
+# as an uncompressed Arrow (Feather v2) file. Every server process memory-maps that file and
+# builds its DataFrame on top of the mapping without copying, so all processes share one copy
+# in the page cache. A refreshed CSV (by its mtime/size) or an edited rules.json (the usage columns
+# are derived from it) is picked up; one process (holding a file lock) re-publishes and the others
+# remap. The frame is read-only: callers must not modify it.
+DATASET_PATH = os.environ.get("WATER_DATASET_PATH", "water_potability.csv")
+# Bumped when the published file's layout changes, so older caches are rebuilt
+CACHE_LAYOUT = "mapped-1"
+
+DRINKING_USAGE = 'Drinking - Safe for human consumption.'
+AGRICULTURE_USAGE = 'Agriculture - Suitable for irrigation.'
+INDUSTRIAL_USAGE = 'Industrial - Used for cooling, cleaning, etc.'
+
+DRINKING_YES = "✅ Yes - Safe for drinking."
+DRINKING_NO = "❌ No - Not potable."
+AGRICULTURE_YES = "✅ Yes - Good for irrigation."
+AGRICULTURE_NO = "❌ No - Not suitable."
+
+_lock = threading.Lock()
+_cache = {}
+
+
+# Single-sample helpers (row is a dict or Series); thresholds live in rules.json
+def classify_water(row, profile=None):
+    masks = rules.evaluate(row, ["drinking", "agriculture"], profile)
+    if masks["drinking"]:
+        return DRINKING_USAGE
+    elif masks["agriculture"]:
+        return AGRICULTURE_USAGE
+    else:
+        return INDUSTRIAL_USAGE
+
+def drinking_reason(row, profile=None):
+    return DRINKING_YES if rules.evaluate(row, ["drinking"], profile)["drinking"] else DRINKING_NO
+
+def agriculture_reason(row, profile=None):
+    return AGRICULTURE_YES if rules.evaluate(row, ["agriculture"], profile)["agriculture"] else AGRICULTURE_NO
+
+
+def add_usage_columns(df, profile=None):
+    # Vectorized equivalent of classify_water / drinking_reason / agriculture_reason
+    masks = rules.evaluate(df, ["drinking", "agriculture"], profile)
+    drinking, agriculture = masks["drinking"], masks["agriculture"]
+
+    # Categoricals: one small code per row instead of a Python string object
+    df['Water_Usage'] = pd.Categorical.from_codes(
+        np.select([drinking, agriculture], [0, 1], default=2).astype(np.int8),
+        [DRINKING_USAGE, AGRICULTURE_USAGE, INDUSTRIAL_USAGE])
+    df['Used_For_Drinking'] = pd.Categorical.from_codes(
+        np.where(drinking, 0, 1).astype(np.int8), [DRINKING_YES, DRINKING_NO])
+    df['Used_For_Agriculture'] = pd.Categorical.from_codes(
+        np.where(agriculture, 0, 1).astype(np.int8), [AGRICULTURE_YES, AGRICULTURE_NO])
+    return df
+
+
+def cache_path(path):
+    return os.path.splitext(path)[0] + ".feather"
+
+
+def _file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _read_cache(path, stat, rules_version):
+    import pyarrow.feather as feather
+
+    cached = cache_path(path)
+    if not os.path.exists(cached):
+        return None, None
+    try:
+        table = feather.read_table(cached, memory_map=True)
+    except Exception:
+        return None, None
+
+    meta = table.schema.metadata or {}
+    source_mtime = meta.get(b"source_mtime_ns", b"").decode()
+    source_size = meta.get(b"source_size", b"").decode()
+    source_sha256 = meta.get(b"source_sha256", b"").decode()
+    if (meta.get(b"schema_version", b"").decode() != str(schema.VERSION)
+            or meta.get(b"layout", b"").decode() != CACHE_LAYOUT
+            or meta.get(b"rules_version", b"").decode() != rules_version):
+        return None, None
+
+    # mtime/size match is the fast path; a touched but unchanged file is caught by the hash
+    if source_mtime == str(stat.st_mtime_ns) and source_size == str(stat.st_size):
+        return _mapped_frame(table), source_sha256
+    digest = _file_digest(path)
+    if digest == source_sha256:
+        return _mapped_frame(table), digest
+    return None, digest
+
+
+def _mapped_frame(table):
+    # split_blocks keeps one pandas block per column, so null-free single-chunk numeric
+    # columns are views of the memory map rather than copies
+    return table.to_pandas(split_blocks=True)
+
+
+def _to_table(df):
+    import pyarrow as pa
+
+    # NaN stays a float value (no validity bitmap), which keeps the mapped columns zero-copy
+    arrays, names = [], []
+    for column in df.columns:
+        values = df[column]
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            arrays.append(pa.DictionaryArray.from_arrays(values.cat.codes.to_numpy(), list(values.cat.categories)))
+        else:
+            arrays.append(pa.array(values.to_numpy()))
+        names.append(column)
+    return pa.Table.from_arrays(arrays, names=names)
+
+
+def _write_cache(path, df, stat, digest, rules_version):
+    import pyarrow.feather as feather
+
+    table = _to_table(df)
+    table = table.replace_schema_metadata({
+        **(table.schema.metadata or {}),
+        b"source_mtime_ns": str(stat.st_mtime_ns).encode(),
+        b"source_size": str(stat.st_size).encode(),
+        b"source_sha256": digest.encode(),
+        b"schema_version": str(schema.VERSION).encode(),
+        b"layout": CACHE_LAYOUT.encode(),
+        b"rules_version": rules_version.encode(),
+    })
+    tmp_path = cache_path(path) + ".tmp"
+    try:
+        # Uncompressed and a single record batch, so readers can map it without decoding
+        feather.write_feather(table, tmp_path, compression="uncompressed", chunksize=max(1, table.num_rows))
+        os.replace(tmp_path, cache_path(path))
+        return True
+    except OSError:
+        # A read-only deployment still works, it just re-parses once per process
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        return False
+
+
+class _PublishLock:
+    # Exclusive lock between processes publishing the same dataset (a no-op without fcntl)
+    def __init__(self, path):
+        self.path = cache_path(path) + ".lock"
+        self.file = None
+
+    def __enter__(self):
+        if fcntl is not None:
+            try:
+                self.file = open(self.path, "a")
+                fcntl.flock(self.file, fcntl.LOCK_EX)
+            except OSError:
+                self.file = None
+        return self
+
+    def __exit__(self, *exc):
+        if self.file is not None:
+            fcntl.flock(self.file, fcntl.LOCK_UN)
+            self.file.close()
+
+
+def load_dataset(path=DATASET_PATH):
+    # The returned frame is shared by every session: callers must not modify it in place
+    stat = os.stat(path)
+    rules_version = rules.version()
+    signature = (stat.st_mtime_ns, stat.st_size, rules_version)
+
+    cached = _cache.get(path)
+    if cached is not None and cached[0] == signature:
+        return cached[1]
+
+    with _lock:
+        cached = _cache.get(path)
+        if cached is not None and cached[0] == signature:
+            return cached[1]
+
+        df, digest = _read_cache(path, stat, rules_version)
+        if df is None:
+            with _PublishLock(path):
+                # Another process may have published while this one waited for the lock
+                df, digest = _read_cache(path, stat, rules_version)
+                if df is None:
+                    df = add_usage_columns(schema.read_csv(path, required=list(schema.DTYPES)))
+                    if _write_cache(path, df, stat, digest or _file_digest(path), rules_version):
+                        # Drop the parsed copy and share the published mapping like everyone else
+                        mapped, _ = _read_cache(path, stat, rules_version)
+                        df = mapped if mapped is not None else df
+
+        _cache[path] = (signature, df)
+        return df
+
+
+def dataset_version(path=DATASET_PATH):
+    # Identifies the currently loaded dataset; changes whenever load_dataset() picks up a new file
+    # or new usage rules
+    load_dataset(path)
+    mtime_ns, size, rules_version = _cache[path][0]
+    return f"{mtime_ns}-{size}-{rules_version}"
@@ -0,0 +1,160 @@
+import os
+import zlib
+
+# Streaming export of scored results. The job's Parquet output is read one record batch at a
+# time and re-encoded as CSV, Parquet or Arrow IPC; every batch's bytes are yielded as soon as
+# they are written, so an export never holds more than a batch of rows (plus the encoder's own
+# buffers) in memory.
+BATCH_ROWS = int(os.environ.get("WATER_EXPORT_BATCH_ROWS", 65536))
+# Public base URL of `cli.py serve`; when set, the Visualization page links to its streaming
+# /jobs/<id>/export endpoint instead of handing the file to Streamlit
+SERVICE_URL = os.environ.get("WATER_EXPORT_SERVICE_URL", "").rstrip("/")
+# Largest export the page hands to Streamlit without SERVICE_URL; Streamlit holds a download's
+# bytes in memory, so bigger exports are refused and left to the CLI or the service
+UI_MAX_BYTES = int(os.environ.get("WATER_EXPORT_UI_MAX_BYTES", 100 * 1024 ** 2))
+
+FORMATS = {
+    # format: (file extension, mime type, supported compression, default compression)
+    "csv": (".csv", "text/csv", ("none", "gzip"), "none"),
+    "parquet": (".parquet", "application/vnd.apache.parquet", ("snappy", "zstd", "gzip", "none"), "snappy"),
+    "arrow": (".arrow", "application/vnd.apache.arrow.file", ("none", "lz4", "zstd"), "none"),
+}
+
+
+class _Sink:
+    # Write-only file object that hands its bytes back to the generator after each batch
+    closed = False
+
+    def __init__(self):
+        self.parts = []
+        self.position = 0
+
+    def write(self, data):
+        self.parts.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self):
+        data = b"".join(self.parts)
+        self.parts = []
+        return data
+
+
+def check_options(fmt, compression=None):
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown export format {fmt!r}; use one of {sorted(FORMATS)}")
+    compression = compression or FORMATS[fmt][3]
+    if compression not in FORMATS[fmt][2]:
+        raise ValueError(f"{fmt} exports support {', '.join(FORMATS[fmt][2])} compression, not {compression!r}")
+    return compression
+
+
+def file_name(stem, fmt, compression=None):
+    compression = check_options(fmt, compression)
+    name = stem + FORMATS[fmt][0]
+    return name + ".gz" if fmt == "csv" and compression == "gzip" else name
+
+
+def mime_type(fmt, compression=None):
+    if fmt == "csv" and check_options(fmt, compression) == "gzip":
+        return "application/gzip"
+    return FORMATS[fmt][1]
+
+
+def service_url(job_id, fmt, columns=None, compression=None):
+    from urllib.parse import quote, urlencode
+
+    query = {"format": fmt, "compression": check_options(fmt, compression)}
+    if columns:
+        query["columns"] = ",".join(columns)
+    return f"{SERVICE_URL}/jobs/{quote(job_id)}/export?{urlencode(query)}"
+
+
+def _csv_batches(batches, schema, compression):
+    import pyarrow.csv as pa_csv
+
+    sink = _Sink()
+    gzip = zlib.compressobj(6, zlib.DEFLATED, 31) if compression == "gzip" else None
+    with pa_csv.CSVWriter(sink, schema) as writer:
+        for batch in batches:
+            writer.write_batch(batch)
+            data = sink.drain()
+            yield gzip.compress(data) if gzip else data
+    data = sink.drain()
+    yield gzip.compress(data) + gzip.flush() if gzip else data
+
+
+def _parquet_batches(batches, schema, compression):
+    import pyarrow.parquet as pq
+
+    # ParquetWriter buffers a whole row group; writing each batch as its own row group keeps that bounded
+    sink = _Sink()
+    writer = pq.ParquetWriter(sink, schema, compression=compression)
+    try:
+        for batch in batches:
+            writer.write_batch(batch, row_group_size=len(batch))
+            yield sink.drain()
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+def _arrow_batches(batches, schema, compression):
+    import pyarrow as pa
+
+    sink = _Sink()
+    options = pa.ipc.IpcWriteOptions(compression=None if compression == "none" else compression)
+    with pa.ipc.new_file(sink, schema, options=options) as writer:
+        for batch in batches:
+            writer.write_batch(batch)
+            yield sink.drain()
+    yield sink.drain()
+
+
+_ENCODERS = {"csv": _csv_batches, "parquet": _parquet_batches, "arrow": _arrow_batches}
+
+
+def iter_export(result_path, fmt="csv", columns=None, compression=None, batch_rows=BATCH_ROWS):
+    """Yield ``result_path`` (a scored Parquet file) re-encoded as ``fmt``, in byte chunks.
+
+    ``columns`` selects and orders the exported columns (all by default).
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    compression = check_options(fmt, compression)
+    parquet_file = pq.ParquetFile(result_path)
+    schema = parquet_file.schema_arrow
+    columns = list(columns or schema.names)
+    unknown = [c for c in columns if c not in schema.names]
+    if unknown:
+        raise ValueError(f"Unknown export columns: {unknown}")
+    schema = pa.schema([schema.field(c) for c in columns])
+    batches = (pa.RecordBatch.from_arrays([batch.column(c) for c in columns], schema=schema)
+               for batch in parquet_file.iter_batches(batch_size=batch_rows, columns=columns))
+    for data in _ENCODERS[fmt](batches, schema, compression):
+        if data:
+            yield data
+
+
+def export_to(result_path, path, fmt="csv", columns=None, compression=None):
+    # Streams the export into ``path`` (atomically replaced) and returns it
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            for data in iter_export(result_path, fmt, columns, compression):
+                f.write(data)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return path
@@ -0,0 +1,191 @@
+import os
+import weakref
+
+import numpy as np
+
+# Fused imputation + polynomial-expansion + robust-scaling kernel. The fitted SimpleImputer/
+# PolynomialFeatures/RobustScaler chain is compiled into fill values, index arrays and
+# center/scale vectors, and transform() writes the expanded, scaled features straight into one
+# float32 buffer, a cache-sized block of rows at a time. The sklearn path materializes the float64 expansion and then a scaled float64 copy of it.
+# The results are not bit-identical: products and scaling are rounded to float32, and while
+# xgboost and sklearn's forests cast their input to float32 anyway, HistGradientBoosting and
+# linear models work in float64, so a value near a split threshold can land on the other side.
+# Every artifact is therefore checked against the sklearn chain when it is loaded (verify), and
+# the kernel is turned off for that preprocessor if any prediction differs.
+ENABLED = os.environ.get("WATER_FUSED_TRANSFORM", "1") != "0"
+BLOCK_ROWS = int(os.environ.get("WATER_FUSED_BLOCK_ROWS", 4096))
+VERIFY_ROWS = int(os.environ.get("WATER_FUSED_VERIFY_ROWS", 4096))
+# Largest allowed |fused - sklearn| difference in any predicted probability
+TOLERANCE = 1e-4
+# Share of the verification sample's values that are missing
+MISSING_SHARE = 0.05
+
+_compiled = weakref.WeakKeyDictionary()
+
+
+def _columns(columns):
+    # Contiguous output columns become a slice, so results can be written in place
+    columns = np.asarray(columns, dtype=np.intp)
+    if len(columns) and np.array_equal(columns, np.arange(columns[0], columns[0] + len(columns))):
+        return slice(int(columns[0]), int(columns[0]) + len(columns))
+    return columns
+
+
+def compile_preprocessor(preprocessor):
+    """Kernel parameters for a fitted [imputer ->] poly -> robust-scaler Pipeline, or None when the
+    preprocessor has any other shape (callers then fall back to ``preprocessor.transform``)."""
+    from sklearn.impute import SimpleImputer
+    from sklearn.pipeline import Pipeline
+    from sklearn.preprocessing import PolynomialFeatures, RobustScaler
+
+    if not isinstance(preprocessor, Pipeline) or len(preprocessor.steps) not in (2, 3):
+        return None
+    steps = [step for _, step in preprocessor.steps]
+    imputer = steps.pop(0) if len(steps) == 3 else None
+    poly, scaler = steps
+    if not isinstance(poly, PolynomialFeatures) or not isinstance(scaler, RobustScaler):
+        return None
+    if not hasattr(poly, "powers_") or not hasattr(scaler, "scale_"):
+        return None
+    fill = None
+    if imputer is not None:
+        # Only NaN imputation without indicator columns maps onto a per-column fill value
+        if (not isinstance(imputer, SimpleImputer) or imputer.add_indicator or not hasattr(imputer, "statistics_")
+                or not (isinstance(imputer.missing_values, float) and np.isnan(imputer.missing_values))
+                or len(imputer.statistics_) != poly.n_features_in_):
+            return None
+        fill = np.asarray(imputer.statistics_, dtype=np.float32)
+
+    powers = np.asarray(poly.powers_)
+    if powers.sum(axis=1).max(initial=0) > 2:
+        return None
+    constant, linear, left, right = [], ([], []), ([], []), []
+    for column, row in enumerate(powers):
+        terms = np.repeat(np.arange(len(row)), row)
+        if len(terms) == 0:
+            constant.append(column)
+        elif len(terms) == 1:
+            linear[0].append(column)
+            linear[1].append(terms[0])
+        else:
+            left[0].append(column)
+            left[1].append(terms[0])
+            right.append(terms[1])
+
+    center = getattr(scaler, "center_", None) if scaler.with_centering else None
+    scale = getattr(scaler, "scale_", None) if scaler.with_scaling else None
+    return {
+        "n_features": powers.shape[1],
+        "fill": fill,
+        "n_output": powers.shape[0],
+        "constant": _columns(constant),
+        "linear": (_columns(linear[0]), np.asarray(linear[1], dtype=np.intp)),
+        "products": (_columns(left[0]), np.asarray(left[1], dtype=np.intp), np.asarray(right, dtype=np.intp)),
+        "center": None if center is None else np.asarray(center, dtype=np.float32),
+        "scale": None if scale is None else np.asarray(scale, dtype=np.float32),
+    }
+
+
+def params_for(preprocessor):
+    # Compiled once per fitted preprocessor object; None when the kernel does not apply
+    if not ENABLED:
+        return None
+    try:
+        return _compiled[preprocessor]
+    except KeyError:
+        params = _compiled[preprocessor] = compile_preprocessor(preprocessor)
+        return params
+    except TypeError:
+        return compile_preprocessor(preprocessor)
+
+
+def _sample(params, rows, seed=0):
+    # Inputs spread around the scaler's center by its scale, i.e. where real measurements lie
+    linear_columns, linear_index = params["linear"]
+    columns = np.arange(params["n_output"])[linear_columns]
+    center = np.zeros(params["n_features"])
+    scale = np.ones(params["n_features"])
+    if params["center"] is not None:
+        center[linear_index] = params["center"][columns]
+    if params["scale"] is not None:
+        scale[linear_index] = params["scale"][columns]
+    rng = np.random.default_rng(seed)
+    X = center + scale * rng.standard_normal((rows, params["n_features"]))
+    if params["fill"] is not None:
+        # Some missing values, so the imputation is compared as well
+        X[rng.random(X.shape) < MISSING_SHARE] = np.nan
+    return X.astype(np.float32)
+
+
+def verify(preprocessor, model, rows=VERIFY_ROWS):
+    """Compare ``model``'s predictions on fused and sklearn features for a synthetic sample.
+
+    On any label flip or a probability difference above TOLERANCE the kernel is turned off for
+    this preprocessor. Returns the comparison, or None when the kernel does not apply.
+    """
+    params = params_for(preprocessor)
+    if params is None:
+        return None
+    X = _sample(params, rows)
+    # The sklearn side gets the same float32 values the fused kernel is given
+    reference = model.predict_proba(preprocessor.transform(X.astype(np.float64)))
+    probabilities = model.predict_proba(transform(X, params))
+    result = {
+        "rows": rows,
+        "max_probability_error": float(np.max(np.abs(probabilities - reference))),
+        "label_agreement": float(np.mean(np.argmax(probabilities, axis=1) == np.argmax(reference, axis=1))),
+    }
+    result["ok"] = result["max_probability_error"] <= TOLERANCE and result["label_agreement"] == 1.0
+    if not result["ok"]:
+        try:
+            _compiled[preprocessor] = None
+        except TypeError:
+            pass
+    return result
+
+
+def _write(block_out, columns, values):
+    if isinstance(columns, slice) or len(columns):
+        block_out[:, columns] = values
+
+
+def transform(X, params, out=None, block_rows=BLOCK_ROWS):
+    """Expanded and scaled features of ``X`` (n x n_features) as float32.
+
+    ``out`` is an optional preallocated float32 (n x n_output) buffer, e.g. a row
+    slice of a larger one, so chunks of a big matrix can be transformed into place.
+    """
+    X = np.asarray(X)
+    if X.ndim != 2 or X.shape[1] != params["n_features"]:
+        raise ValueError(f"Expected {params['n_features']} feature columns, got shape {X.shape}")
+    shape = (len(X), params["n_output"])
+    if out is None:
+        out = np.empty(shape, dtype=np.float32)
+    elif out.shape != shape or out.dtype != np.float32:
+        raise ValueError(f"out must be a float32 array of shape {shape}")
+
+    linear_columns, linear_index = params["linear"]
+    product_columns, left, right = params["products"]
+    block = np.empty((min(block_rows, len(X)), params["n_features"]), dtype=np.float32)
+    for start in range(0, len(X), block_rows):
+        stop = min(start + block_rows, len(X))
+        x = block[:stop - start]
+        x[...] = X[start:stop]
+        missing = np.isnan(x)
+        if missing.any():
+            if params["fill"] is None:
+                # As the sklearn chain without an imputer does
+                raise ValueError("Input X contains NaN")
+            np.copyto(x, params["fill"], where=missing)
+        block_out = out[start:stop]
+        _write(block_out, params["constant"], 1.0)
+        _write(block_out, linear_columns, x[:, linear_index])
+        if isinstance(product_columns, slice):
+            np.multiply(x[:, left], x[:, right], out=block_out[:, product_columns])
+        elif len(product_columns):
+            block_out[:, product_columns] = x[:, left] * x[:, right]
+        if params["center"] is not None:
+            np.subtract(block_out, params["center"], out=block_out)
+        if params["scale"] is not None:
+            np.divide(block_out, params["scale"], out=block_out)
+    return out
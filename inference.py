@@ -0,0 +1,103 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+
+import model_registry
+from schema import canonical
+from pipeline import FEATURES, predict_matrix, transform_matrix
+
+# Single-sample inference for interactive checks. Samples are plain dicts turned straight into a
+# float64 row (no DataFrame). Concurrent requests from many sessions are micro-batched: a request
+# that finds the queue empty is scored at once; when others are already queued the batch takes them
+# and waits at most MAX_WAIT for more to join, then is scored in one vectorized call.
+MAX_WAIT = float(os.environ.get("WATER_MICROBATCH_MAX_WAIT_MS", 1.0)) / 1000
+MAX_BATCH = int(os.environ.get("WATER_MICROBATCH_MAX_BATCH", 256))
+TIMEOUT = float(os.environ.get("WATER_MICROBATCH_TIMEOUT", 5.0))
+
+
+def sample_row(sample, features=FEATURES):
+    # Missing measurements become NaN, which the preprocessor fills with the training median
+    sample = {canonical(name): value for name, value in sample.items()}
+    return np.array([sample.get(f, np.nan) for f in features], dtype=np.float64)
+
+
+def _score_rows(artifact, rows):
+    labels, probabilities = predict_matrix(artifact["model"], transform_matrix(artifact["preprocessor"], rows))
+    return labels, probabilities[:, 1]
+
+
+class MicroBatcher:
+    def __init__(self, model_name=model_registry.DEFAULT_MODEL, max_wait=MAX_WAIT, max_batch=MAX_BATCH):
+        self.model_name = model_name
+        self.max_wait = max_wait
+        self.max_batch = max_batch
+        self._queue = queue.SimpleQueue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def _ensure_started(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="micro-batcher", daemon=True)
+                    self._thread.start()
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch:
+            try:
+                batch.append(self._queue.get_nowait())
+                continue
+            except queue.Empty:
+                pass
+            # A lone request is not held back; a batch waits for more only while others arrive
+            remaining = deadline - time.perf_counter()
+            if len(batch) == 1 or remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            futures = [future for _, future in batch]
+            try:
+                artifact = model_registry.get_artifact(self.model_name)
+                labels, probabilities = _score_rows(artifact, np.vstack([row for row, _ in batch]))
+            except Exception as e:
+                for future in futures:
+                    future.set_exception(e)
+                continue
+            for future, label, probability in zip(futures, labels, probabilities):
+                future.set_result((int(label), float(probability)))
+
+    def submit(self, sample):
+        self._ensure_started()
+        future = Future()
+        self._queue.put((sample_row(sample), future))
+        return future
+
+    def predict(self, sample, timeout=TIMEOUT):
+        # Returns (label, probability of potable)
+        return self.submit(sample).result(timeout)
+
+
+_batchers = {}
+_batchers_lock = threading.Lock()
+
+
+def predict_sample(sample, model_name=model_registry.DEFAULT_MODEL):
+    # One batcher (and batching thread) per model
+    batcher = _batchers.get(model_name)
+    if batcher is None:
+        with _batchers_lock:
+            batcher = _batchers.setdefault(model_name, MicroBatcher(model_name))
+    return batcher.predict(sample)
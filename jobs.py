@@ -0,0 +1,190 @@
+import json
+import logging
+import multiprocessing
+import os
+import shutil
+import sys
+import threading
+import types
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+
+import model_registry
+import parallel
+import result_cache
+import scoring
+
+# Local job subsystem: an upload is copied to jobs/<id>/ and scored by a bounded pool of
+# worker processes. State lives in jobs/<id>/status.json, so a job (and its results)
+# outlives the browser session that submitted it.
+JOBS_DIR = os.environ.get("WATER_JOBS_DIR", "jobs")
+JOB_WORKERS = int(os.environ.get("WATER_JOB_WORKERS", max(1, (os.cpu_count() or 1) // 4)))
+JOBS_MAX_AGE = float(os.environ.get("WATER_JOBS_MAX_AGE", scoring.RESULTS_MAX_AGE))
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+FINISHED = (DONE, FAILED)
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_executor = None
+
+
+def _job_dir(job_id):
+    return os.path.join(JOBS_DIR, job_id)
+
+
+def _write_status(job_dir, **status):
+    status["updated_at"] = time.time()
+    tmp_path = os.path.join(job_dir, "status.json.tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(status, f)
+    os.replace(tmp_path, os.path.join(job_dir, "status.json"))
+
+
+def status(job_id):
+    # None for unknown, malformed or cleaned-up job ids
+    if not job_id or not job_id.isalnum():
+        return None
+    try:
+        with open(os.path.join(_job_dir(job_id), "status.json")) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+class _SpawnProcess(multiprocessing.context.SpawnProcess):
+    # Streamlit installs the running page script as __main__, and spawn re-runs __main__ in the
+    # child, so every worker would execute app.py (login screen, outbox dispatcher, prewarm
+    # imports racing threadpoolctl into a deadlock). Workers only need this module, so they are
+    # started with an empty __main__.
+    _main_lock = threading.Lock()
+
+    def start(self):
+        with self._main_lock:
+            main = sys.modules["__main__"]
+            placeholder = sys.modules["__main__"] = types.ModuleType("__main__")
+            try:
+                super().start()
+            finally:
+                # A script run may have installed its own __main__ meanwhile; keep that one
+                if sys.modules["__main__"] is placeholder:
+                    sys.modules["__main__"] = main
+
+
+class _SpawnContext(multiprocessing.context.SpawnContext):
+    Process = _SpawnProcess
+
+
+def _init_worker(scoring_workers):
+    # Share the cores between job workers instead of every worker using all of them
+    parallel.SCORING_WORKERS = scoring_workers
+    parallel.limit_native_threads()
+
+
+def _run_job(job_id, job_dir, model_path, profile=None, cache_key=None):
+    # Runs in a worker process; the registry caches the artifact per worker
+    base = {"job_id": job_id, "model_path": model_path, "profile": profile, "cache_key": cache_key,
+            "owner_pid": os.getpid()}
+    try:
+        model_registry.register(model_registry.DEFAULT_MODEL, model_path)
+        artifact = model_registry.get_artifact()
+        _write_status(job_dir, state=RUNNING, summary=scoring.empty_summary(), fraction=0.0, **base)
+
+        def report_progress(summary, fraction):
+            _write_status(job_dir, state=RUNNING, summary=summary, fraction=fraction, **base)
+
+        predict = result_cache.RowPredictor(model_path, job_dir) if cache_key and result_cache.ROW_HASHING else None
+        result_path, summary = scoring.score_stream(os.path.join(job_dir, "input.csv"), artifact,
+                                                    out_path=os.path.join(job_dir, "result.parquet"),
+                                                    progress=report_progress, profile=profile,
+                                                    predict=predict or parallel.predict_parallel)
+        if cache_key:
+            result_cache.put(cache_key, result_path, summary, model_path, artifact["version"],
+                             rows=predict.rows() if predict else None)
+        _write_status(job_dir, state=DONE, summary=summary, fraction=1.0, result_path=result_path,
+                      model_version=artifact["version"], **base)
+    except scoring.MissingColumnsError as e:
+        _write_status(job_dir, state=FAILED, error="missing_columns", missing=sorted(e.missing), **base)
+    except scoring.InvalidInputError as e:
+        _write_status(job_dir, state=FAILED, error=str(e), **base)
+    except Exception as e:
+        logger.exception("Scoring job %s failed", job_id)
+        _write_status(job_dir, state=FAILED, error=str(e) or type(e).__name__, **base)
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _recover(executor):
+    # Requeue jobs whose owning process died (server restart) before they finished
+    if not os.path.isdir(JOBS_DIR):
+        return
+    for job_id in os.listdir(JOBS_DIR):
+        job = status(job_id)
+        if job is None or job["state"] in FINISHED or _pid_alive(job.get("owner_pid", 0)):
+            continue
+        logger.info("Requeueing interrupted job %s", job_id)
+        job_dir = _job_dir(job_id)
+        _write_status(job_dir, state=QUEUED, job_id=job_id, model_path=job["model_path"],
+                      profile=job.get("profile"), cache_key=job.get("cache_key"), owner_pid=os.getpid())
+        executor.submit(_run_job, job_id, job_dir, job["model_path"], job.get("profile"), job.get("cache_key"))
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        with _lock:
+            if _executor is None:
+                # spawn: forking a threaded Streamlit server is not safe
+                scoring_workers = max(1, parallel.SCORING_WORKERS // JOB_WORKERS)
+                executor = ProcessPoolExecutor(max_workers=JOB_WORKERS,
+                                               mp_context=_SpawnContext(),
+                                               initializer=_init_worker, initargs=(scoring_workers,))
+                _recover(executor)
+                _executor = executor
+    return _executor
+
+
+def cleanup_jobs(max_age=JOBS_MAX_AGE):
+    if not os.path.isdir(JOBS_DIR):
+        return
+    cutoff = time.time() - max_age
+    for job_id in os.listdir(JOBS_DIR):
+        job = status(job_id)
+        if job is not None and job["state"] in FINISHED and job["updated_at"] < cutoff:
+            shutil.rmtree(_job_dir(job_id), ignore_errors=True)
+
+
+def submit(source, model_name=model_registry.DEFAULT_MODEL, profile=None):
+    # source is a path or a readable binary file object (e.g. a Streamlit UploadedFile)
+    job_id = uuid.uuid4().hex
+    job_dir = _job_dir(job_id)
+    os.makedirs(job_dir)
+    digest = result_cache.copy_hashing(source, os.path.join(job_dir, "input.csv"))
+    model_path = os.path.abspath(model_registry.model_path(model_name))
+    base = {"job_id": job_id, "model_path": model_path, "profile": profile, "owner_pid": os.getpid()}
+
+    # A repeat upload (same bytes, model file and rules) is answered from the result cache
+    try:
+        cache_key = result_cache.key(digest, model_path, profile)
+    except OSError:
+        cache_key = None  # missing model file; the job reports the error
+    result_path = os.path.join(job_dir, "result.parquet")
+    cached = result_cache.get(cache_key, result_path) if cache_key else None
+    if cached is not None:
+        _write_status(job_dir, state=DONE, summary=cached["summary"], fraction=1.0, result_path=result_path,
+                      model_version=cached["model_version"], cache_key=cache_key, cached=True, **base)
+        return job_id
+
+    _write_status(job_dir, state=QUEUED, cache_key=cache_key, **base)
+    _get_executor().submit(_run_job, job_id, job_dir, model_path, profile, cache_key)
+    return job_id
@@ -0,0 +1,109 @@
+import json
+import logging
+import os
+import threading
+
+import fused
+from pipeline import load_artifact
+
+# Process-wide model registry: each artifact is deserialized once per server process
+# and shared by every session. Locations come from the environment:
+#   WATER_MODEL_PATH      path of the default artifact
+#   WATER_MODEL_REGISTRY  optional JSON object mapping model names to paths
+#   WATER_MODEL_MMAP      joblib mmap_mode for loading ("r" by default, "" to disable)
+# With mmap_mode="r" numpy arrays that the model keeps as they are unpickled are read-only maps of
+# the uncompressed artifact file, shared by every server and job process through the page cache.
+# That covers HistGradientBoosting's node tables and the fitted preprocessor. It does not cover an
+# XGBoost booster (pickled as a raw byte buffer and rebuilt in native memory) or sklearn's
+# DecisionTree/RandomForest (node arrays copied into the Cython tree): every process then holds
+# its own copy of the model.
+DEFAULT_MODEL = "default"
+DEFAULT_MODEL_PATH = os.environ.get("WATER_MODEL_PATH", "water_quality_model.pkl")
+MMAP_MODE = os.environ.get("WATER_MODEL_MMAP", "r") or None
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_paths = {DEFAULT_MODEL: DEFAULT_MODEL_PATH}
+_paths.update(json.loads(os.environ.get("WATER_MODEL_REGISTRY", "{}")))
+_loaded = {}
+_warm_thread = None
+
+
+def model_path(name=DEFAULT_MODEL):
+    try:
+        return _paths[name]
+    except KeyError:
+        raise KeyError(f"No model registered as {name!r}") from None
+
+
+def register(name, path):
+    with _lock:
+        _paths[name] = path
+
+
+def _load(path):
+    artifact = load_artifact(path, mmap_mode=MMAP_MODE)
+    # Falls back to the sklearn transform for models whose predictions the fused kernel changes
+    check = fused.verify(artifact["preprocessor"], artifact["model"])
+    if check is not None and not check["ok"]:
+        logger.warning("Fused transform disabled for %s: max probability error %.2g, label agreement %.4f",
+                       path, check["max_probability_error"], check["label_agreement"])
+    return artifact
+
+
+def _signature(path):
+    stat = os.stat(path)
+    return (path, stat.st_mtime_ns, stat.st_size)
+
+
+def get_artifact(name=DEFAULT_MODEL):
+    # A stat() per call lets a replaced file on disk be picked up without a restart
+    path = model_path(name)
+    signature = _signature(path)
+    loaded = _loaded.get(name)
+    if loaded is not None and loaded[0] == signature:
+        return loaded[1]
+
+    with _lock:
+        loaded = _loaded.get(name)
+        if loaded is not None and loaded[0] == signature:
+            return loaded[1]
+        artifact = _load(path)
+        _loaded[name] = (signature, artifact)
+        logger.info("Loaded model %r version %s from %s", name, artifact["version"], path)
+        return artifact
+
+
+def swap(path, name=DEFAULT_MODEL):
+    # Load the new version first so sessions keep scoring with the old one until it is ready
+    signature = _signature(path)
+    artifact = _load(path)
+    with _lock:
+        _paths[name] = path
+        _loaded[name] = (signature, artifact)
+    logger.info("Swapped model %r to version %s from %s", name, artifact["version"], path)
+    return artifact
+
+
+def loaded_versions():
+    return {name: loaded[1]["version"] for name, loaded in _loaded.items()}
+
+
+def warm_up(names=None, background=False):
+    def load_all():
+        for name in names or list(_paths):
+            try:
+                get_artifact(name)
+            except Exception:
+                logger.exception("Warm-up failed for model %r", name)
+
+    global _warm_thread
+    if background:
+        # Safe to call on every rerun: only the first call per process starts a thread
+        with _lock:
+            if _warm_thread is None:
+                _warm_thread = threading.Thread(target=load_all, name="model-warm-up", daemon=True)
+                _warm_thread.start()
+        return _warm_thread
+    load_all()
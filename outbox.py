@@ -0,0 +1,220 @@
+import json
+import logging
+import os
+import random
+import threading
+import time
+
+import user_store
+
+# Durable outbox for ChartMogul customer sync. Registration writes the customer record into the
+# customer_outbox table in the same transaction as the user; a background dispatcher sends due
+# records in batches with exponential backoff and parks them as 'dead' after MAX_ATTEMPTS.
+# external_id is unique in the table and ChartMogul's duplicate-external_id answer counts as
+# delivered, so a record is never created twice. Statuses: pending -> in_flight -> sent |
+# pending (retry) | dead. Without an API key nothing is sent and records stay pending; the
+# in-memory local client is only used when WATER_CUSTOMER_CLIENT=local is set explicitly.
+CHARTMOGUL_API_KEY = os.environ.get("CHARTMOGUL_API_KEY", "")
+CHARTMOGUL_DATA_SOURCE_UUID = os.environ.get("CHARTMOGUL_DATA_SOURCE_UUID", "YOUR_DATA_SOURCE_UUID")
+CLIENT = os.environ.get("WATER_CUSTOMER_CLIENT", "chartmogul")
+
+# ChartMogul's 422 message when a customer with this external_id was already created
+DUPLICATE_EXTERNAL_ID = "the external id for this customer already exists"
+
+BATCH_SIZE = int(os.environ.get("WATER_OUTBOX_BATCH_SIZE", 50))
+POLL_INTERVAL = float(os.environ.get("WATER_OUTBOX_POLL_INTERVAL", 5.0))
+MAX_ATTEMPTS = int(os.environ.get("WATER_OUTBOX_MAX_ATTEMPTS", 8))
+BACKOFF_BASE = float(os.environ.get("WATER_OUTBOX_BACKOFF_BASE", 2.0))
+BACKOFF_MAX = float(os.environ.get("WATER_OUTBOX_BACKOFF_MAX", 3600.0))
+LEASE_SECONDS = 60.0
+
+PENDING, IN_FLIGHT, SENT, DEAD = "pending", "in_flight", "sent", "dead"
+
+ENQUEUE = '''INSERT INTO customer_outbox (external_id, payload, status, attempts, next_attempt_at, created_at)
+             VALUES (?, ?, 'pending', 0, ?, ?) ON CONFLICT (external_id) DO NOTHING'''
+SELECT_DUE = '''SELECT id, external_id, payload, attempts FROM customer_outbox
+                WHERE status IN ('pending', 'in_flight') AND next_attempt_at <= ? ORDER BY id LIMIT ?'''
+MARK_SENT = "UPDATE customer_outbox SET status = 'sent', sent_at = ?, last_error = NULL WHERE id = ?"
+MARK_RETRY = "UPDATE customer_outbox SET status = ?, attempts = ?, next_attempt_at = ?, last_error = ? WHERE id = ?"
+COUNT_BY_STATUS = "SELECT status, COUNT(*) FROM customer_outbox GROUP BY status"
+
+logger = logging.getLogger(__name__)
+
+
+class ChartMogulClient:
+    def __init__(self, api_key=CHARTMOGUL_API_KEY):
+        import chartmogul
+
+        self._chartmogul = chartmogul
+        self._config = chartmogul.Config(api_key)
+
+    def send(self, records):
+        # {external_id: None on success, error message on failure}
+        results = {}
+        for record in records:
+            try:
+                self._chartmogul.Customer.create(self._config, data=record).get()
+                results[record["external_id"]] = None
+            except Exception as e:
+                message = str(e) or type(e).__name__
+                # A retry after a lost response finds the customer already created
+                results[record["external_id"]] = None if _is_duplicate(e) else message
+        return results
+
+
+def _is_duplicate(error):
+    response = getattr(error, "response", None)
+    status = getattr(response, "status_code", None)
+    text = str(error) + str(getattr(response, "text", ""))
+    return status in (None, 422) and DUPLICATE_EXTERNAL_ID in text.lower()
+
+
+class LocalCustomerClient:
+    """Stand-in for ChartMogul: keeps customers in memory and can inject failures."""
+
+    def __init__(self, fail_rate=0.0, seed=None):
+        self.customers = {}
+        self.calls = 0
+        self.fail_rate = fail_rate
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def send(self, records):
+        results = {}
+        with self._lock:
+            self.calls += 1
+            for record in records:
+                if self._random.random() < self.fail_rate:
+                    results[record["external_id"]] = "injected failure"
+                else:
+                    self.customers.setdefault(record["external_id"], dict(record))
+                    results[record["external_id"]] = None
+        return results
+
+
+def make_client(kind=CLIENT):
+    # None when ChartMogul is selected without a key: records then wait in the outbox
+    if kind == "local":
+        return LocalCustomerClient()
+    if kind != "chartmogul":
+        raise ValueError(f"Unknown customer client {kind!r}; use 'chartmogul' or 'local'")
+    if not CHARTMOGUL_API_KEY:
+        logger.warning("CHARTMOGUL_API_KEY is not set: customer records stay pending in the outbox "
+                       "and are sent once the dispatcher starts with a key")
+        return None
+    return ChartMogulClient()
+
+
+def customer_record(username, full_name, email):
+    return {
+        "data_source_uuid": CHARTMOGUL_DATA_SOURCE_UUID,
+        "external_id": username,
+        "name": full_name,
+        "email": email,
+        "country": "Unknown",
+    }
+
+
+def enqueue(cursor, record):
+    # Call inside the transaction that creates the user so both commit (or roll back) together,
+    # then notify() once it has committed
+    now = time.time()
+    cursor.execute(ENQUEUE, (record["external_id"], json.dumps(record), now, now))
+
+
+def notify():
+    # Wakes the dispatcher; before the commit it would find nothing and sleep a full poll
+    _wake.set()
+
+
+def backoff(attempts):
+    delay = min(BACKOFF_BASE * 2 ** (attempts - 1), BACKOFF_MAX)
+    return delay * random.uniform(0.5, 1.0)
+
+
+def _claim(limit):
+    # Leasing rows as in_flight keeps other dispatchers (other server processes) off them;
+    # a crashed dispatcher's lease simply expires and the rows become due again.
+    now = time.time()
+    with user_store.transaction() as cursor:
+        cursor.execute("BEGIN IMMEDIATE")
+        rows = cursor.execute(SELECT_DUE, (now, limit)).fetchall()
+        cursor.executemany("UPDATE customer_outbox SET status = 'in_flight', next_attempt_at = ? WHERE id = ?",
+                           [(now + LEASE_SECONDS, row[0]) for row in rows])
+    return rows
+
+
+def dispatch_once(client, limit=BATCH_SIZE):
+    # Sends one batch; returns how many records were claimed
+    rows = _claim(limit)
+    if not rows:
+        return 0
+
+    records = [json.loads(payload) for _, _, payload, _ in rows]
+    try:
+        results = client.send(records)
+    except Exception as e:
+        results = {record["external_id"]: str(e) or type(e).__name__ for record in records}
+
+    now = time.time()
+    sent, retries = [], []
+    for row_id, external_id, _, attempts in rows:
+        error = results.get(external_id, "no result from client")
+        if error is None:
+            sent.append((now, row_id))
+            continue
+        attempts += 1
+        status = DEAD if attempts >= MAX_ATTEMPTS else PENDING
+        retries.append((status, attempts, now + backoff(attempts), error, row_id))
+        if status == DEAD:
+            logger.error("Customer %s moved to dead letter after %d attempts: %s", external_id, attempts, error)
+
+    with user_store.transaction() as cursor:
+        cursor.executemany(MARK_SENT, sent)
+        cursor.executemany(MARK_RETRY, retries)
+    return len(rows)
+
+
+def counts():
+    with user_store.transaction() as cursor:
+        return dict(cursor.execute(COUNT_BY_STATUS).fetchall())
+
+
+def requeue_dead():
+    # Operator action after fixing the cause of the failures
+    with user_store.transaction() as cursor:
+        cursor.execute("UPDATE customer_outbox SET status = 'pending', attempts = 0, next_attempt_at = ? "
+                       "WHERE status = 'dead'", (time.time(),))
+        return cursor.rowcount
+
+
+_wake = threading.Event()
+_dispatcher = None
+_dispatcher_lock = threading.Lock()
+
+
+def _run(client):
+    # The client (and its chartmogul import) is built here, off the first rerun's thread
+    client = client or make_client()
+    if client is None:
+        return
+    while True:
+        _wake.clear()
+        try:
+            # Keep draining while full batches come back
+            while dispatch_once(client) == BATCH_SIZE:
+                pass
+        except Exception:
+            logger.exception("Outbox dispatch failed")
+        _wake.wait(POLL_INTERVAL)
+
+
+def start_dispatcher(client=None):
+    # Safe to call on every rerun: one dispatcher thread per process
+    global _dispatcher
+    with _dispatcher_lock:
+        if _dispatcher is None:
+            _dispatcher = threading.Thread(target=_run, args=(client,),
+                                           name="outbox-dispatcher", daemon=True)
+            _dispatcher.start()
+    return _dispatcher
@@ -1,8 +1,11 @@
 import streamlit as st
-import pandas as pd
-import plotly.express as px
+from dataset import load_dataset, dataset_version
+import stats
+import charts
+import profiler
 
 st.set_page_config(page_title="Understanding Water Quality", layout="wide")
+profiler.start_rerun("attributes", profile=st.session_state.pop("profile_next_rerun", False))
 
 # Custom sidebar style with smooth transitions
 st.markdown(
@@ -65,7 +68,8 @@ st.title("📖 Understanding Water Quality")
 st.write("🔹 Water quality is determined by multiple factors. Below, you'll find explanations of key attributes, their significance, and how they affect water usability.")
 
 # Load dataset
-df = pd.read_csv("water_potability.csv")
+with profiler.stage("load_dataset"):
+    df = load_dataset()
 
 # Dictionary of attributes with detailed explanations
 attributes = {
@@ -116,6 +120,10 @@ attributes = {
     }
 }
 
+# Summary statistics and histogram bins, computed once per dataset version
+with profiler.stage("attribute_stats"):
+    attribute_stats = stats.attribute_stats(df, dataset_version(), list(attributes))
+
 st.write("### 🔬 Key Water Quality Attributes")
 
 # Create a tab for each attribute to make it interactive
@@ -131,8 +139,8 @@ for idx, (attr, details) in enumerate(attributes.items()):
             st.markdown(f"**⚡ Impact on Water Usage:**\n{details['impact']}")
             
             # Animated progress bar to show attribute levels
-            avg_value = df[attr].mean()
-            min_value, max_value = df[attr].min(), df[attr].max()
+            avg_value = attribute_stats[attr]["mean"]
+            min_value, max_value = attribute_stats[attr]["min"], attribute_stats[attr]["max"]
             percentage = int(((avg_value - min_value) / (max_value - min_value)) * 100)
             st.progress(percentage)
             
@@ -140,11 +148,16 @@ for idx, (attr, details) in enumerate(attributes.items()):
             st.markdown(f"<div class='fade-in' style='background-color:{details['color']}; padding:5px; color:white; text-align:center; font-weight:bold;'> {attr.upper()} LEVEL </div>", unsafe_allow_html=True)
 
         with col2:
-            fig = px.histogram(df, x=attr, title=f"{attr} Distribution",
-                               color_discrete_sequence=[details['color']])
-            st.plotly_chart(fig, use_container_width=True)
+            with charts.stage("histogram"):
+                fig = charts.histogram(attribute_stats[attr], title=f"{attr} Distribution",
+                                       color=details['color'], x_title=attr)
+                st.plotly_chart(fig, use_container_width=True)
 
 st.write("🔹 **Understanding these attributes ensures better water quality management.**")
 
 # Close fade-in div
 st.markdown("</div>", unsafe_allow_html=True)
+
+if st.session_state.get("username") == "admin":
+    profiler.render_panel(st)
+profiler.end_rerun()
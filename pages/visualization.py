@@ -1,12 +1,15 @@
 import streamlit as st
 import pandas as pd
-import joblib
-import numpy as np
-import matplotlib.pyplot as plt
-from sklearn.preprocessing import PolynomialFeatures, RobustScaler
+import os
+import charts
+import export
+import jobs
+import profiler
+import result_view
+import rules
+import scoring
 
-# Load the trained model
-model = joblib.load(r"C:\Users\Ajmal\OneDrive\Documents\AJMAL_VR\VS.Code\project - water quality\water_quality_model.pkl")
+profiler.start_rerun("visualization", profile=st.session_state.pop("profile_next_rerun", False))
 
 
 # Custom sidebar style
@@ -38,93 +41,159 @@ st.markdown(
     unsafe_allow_html=True
 )
 
-# Define expected features
-expected_features = ['pH', 'Hardness', 'Solids', 'Chloramines', 'Sulfate',
-                     'Conductivity', 'Organic_Carbon', 'Trihalomethanes', 'Turbidity']
-
 st.title("💧 Water Quality Classification & Visualization")
 
 # **File Uploader**
 uploaded_file = st.file_uploader("📂 Upload a CSV file for prediction", type=["csv"], label_visibility="hidden")
 
-# **Processing Uploaded File**
-if uploaded_file is not None:
-    with st.spinner("⏳ Processing the uploaded file... Please wait."):
-        df = pd.read_csv(uploaded_file)
-
-        # **Check for missing columns**
-        missing_features = set(expected_features) - set(df.columns)
-        if missing_features:
-            st.error(f"❌ Uploaded file is missing these columns: {missing_features}")
+# **Regional thresholds** for the Drinking / Agriculture / Industry flags (see rules.json)
+rule_profiles = rules.profiles()
+rule_profile = st.selectbox("🌍 Regional usage thresholds", list(rule_profiles),
+                            index=list(rule_profiles).index(rules.default_profile()),
+                            format_func=lambda name: f"{name} - {rule_profiles[name]}" if rule_profiles[name] else name)
+
+# **Results table** (filtered, sorted and paged on the server; only one page reaches the browser)
+@st.fragment
+def show_table(result_path, summary):
+    filter_col, prob_col, sort_col, order_col = st.columns(4)
+    preset = filter_col.selectbox("Show", list(result_view.FILTERS), key="results_filter")
+    min_probability = prob_col.slider("Probability of Potable above", 0.0, 1.0, 0.0, 0.05, key="results_min_probability")
+    sort_by = sort_col.selectbox("Sort by", ["File order"] + scoring.PREDICTION_COLUMNS + scoring.FEATURES + scoring.USAGE_COLUMNS,
+                                 key="results_sort")
+    descending = order_col.toggle("Descending", key="results_descending")
+
+    conditions = list(result_view.FILTERS[preset])
+    if min_probability > 0:
+        conditions.append(("Probability of Potable", ">", min_probability))
+    query = dict(conditions=conditions, sort_by=None if sort_by == "File order" else sort_by, descending=descending)
+
+    with profiler.stage("results_query"):
+        total = result_view.count(result_path, **query)
+    pages = max(1, -(-total // result_view.PAGE_SIZE))
+    if st.session_state.get("results_page", 1) > pages:
+        st.session_state.results_page = pages
+    number = st.number_input(f"Page (of {pages:,})", min_value=1, max_value=pages, key="results_page")
+
+    with profiler.stage("results_page"):
+        rows, total = result_view.page(result_path, number - 1, **query)
+    if total:
+        start = (number - 1) * result_view.PAGE_SIZE
+        st.caption(f"Rows {start + 1:,}-{start + len(rows):,} of {total:,} matching ({summary['rows']:,} scored).")
+    else:
+        st.caption(f"No rows match ({summary['rows']:,} scored).")
+    st.dataframe(rows)
+
+
+# **Export** (a link to the service's streaming endpoint, or a file next to the results offered once)
+@st.fragment
+def show_export(job_id, result_path):
+    with st.expander("⬇️ Export results"):
+        all_columns = scoring.FEATURES + scoring.PREDICTION_COLUMNS + scoring.USAGE_COLUMNS
+        columns = st.multiselect("Columns", all_columns, default=all_columns, key="export_columns")
+        format_col, compression_col = st.columns(2)
+        fmt = format_col.selectbox("Format", list(export.FORMATS), format_func=str.upper, key="export_format")
+        compression = compression_col.selectbox("Compression", export.FORMATS[fmt][2], key=f"export_compression_{fmt}")
+        if export.SERVICE_URL:
+            st.link_button("Download", export.service_url(job_id, fmt, columns, compression), disabled=not columns)
+        elif st.button("Prepare download", disabled=not columns):
+            name = export.file_name("water_predictions", fmt, compression)
+            with st.spinner("Writing export..."), profiler.stage("export"):
+                path = export.export_to(result_path, os.path.join(os.path.dirname(result_path), name),
+                                        fmt, columns, compression)
+            size = os.path.getsize(path)
+            if size > export.UI_MAX_BYTES:
+                os.remove(path)
+                st.warning(f"This export is {size / 1024 ** 2:,.0f} MB, more than the "
+                           f"{export.UI_MAX_BYTES / 1024 ** 2:,.0f} MB the page can offer for download. "
+                           f"Select fewer columns or a compressed format, export it with "
+                           f"`python cli.py export {result_path} --format {fmt}`, or set "
+                           f"WATER_EXPORT_SERVICE_URL to download it from the streaming service.")
+                return
+            # Streamlit holds a download button's bytes in memory, so the button exists only in the
+            # run right after "Prepare download"; the next rerun drops it (and the bytes) again
+            with open(path, "rb") as f:
+                st.download_button(f"Download {name}", f, file_name=name, mime=export.mime_type(fmt, compression))
+
+
+# **Results of a finished scoring job**
+def show_results(job_id, result_path, summary):
+    # **Show Prediction Results**
+    st.write("### 📊 Prediction Results")
+    show_table(result_path, summary)
+    show_export(job_id, result_path)
+
+    # **Summarize the Results**
+    potable_count = summary["potable"]
+    non_potable_count = summary["non_potable"]
+    drinking_safe_count = summary["drinking_safe"]
+    agriculture_safe_count = summary["agriculture_safe"]
+    industry_safe_count = summary["industry_safe"]
+
+    st.write(f"✅ **Potable Water Count:** {potable_count}")
+    st.write(f"❌ **Non-Potable Water Count:** {non_potable_count}")
+    st.write(f"🚰 **Safe for Drinking:** {drinking_safe_count}")
+    st.write(f"🌱 **Safe for Agriculture:** {agriculture_safe_count}")
+    st.write(f"🏭 **Safe for Industry:** {industry_safe_count}")
+    if summary.get("rows_per_second"):
+        st.caption(f"⚡ Model throughput: {summary['rows_per_second']:,.0f} rows/s")
+
+    # **Visualization - Bar Chart**
+    st.write("### 📊 Classification Summary")
+    st.bar_chart(pd.DataFrame({
+        "Count": [drinking_safe_count, agriculture_safe_count, industry_safe_count]
+    }, index=["Drinking Safe", "Agriculture Safe", "Industry Safe"]))
+
+    # **Visualization - Pie Chart**
+    st.write("### 🥧 Water Quality Distribution")
+    with charts.stage("figure_pie"):
+        st.image(charts.quality_pie([drinking_safe_count, agriculture_safe_count, industry_safe_count]),
+                 use_container_width=True)
+
+
+# **Job progress** (polled without blocking the rest of the page)
+@st.fragment(run_every=1.0)
+def show_progress(job_id):
+    job = jobs.status(job_id)
+    if job is None or job["state"] in jobs.FINISHED:
+        st.rerun()
+    summary = job.get("summary") or scoring.empty_summary()
+    if job["state"] == jobs.QUEUED:
+        st.progress(0.0, text="⏳ Waiting for a free scoring worker...")
+    else:
+        st.progress(job.get("fraction") or 0.0,
+                    text=f"⏳ Scored {summary['rows']:,} rows in {summary['chunks']} chunks...")
+
+
+# **Processing Uploaded File** (scored by a background job; the job id is kept in the URL)
+if uploaded_file is not None and st.session_state.get("job_upload") != (uploaded_file.file_id, rule_profile):
+    jobs.cleanup_jobs()
+    uploaded_file.seek(0)
+    with profiler.stage("submit_job"):
+        st.query_params["job"] = jobs.submit(uploaded_file, profile=rule_profile)
+    st.session_state.job_upload = (uploaded_file.file_id, rule_profile)
+
+job_id = st.query_params.get("job")
+if job_id:
+    job = jobs.status(job_id)
+    if job is None:
+        st.warning("⚠️ These prediction results are no longer available. Please upload the file again.")
+    elif job["state"] not in jobs.FINISHED:
+        show_progress(job_id)
+    elif job["state"] == jobs.FAILED:
+        if job["error"] == "missing_columns":
+            st.error(f"❌ Uploaded file is missing these columns: {set(job['missing'])}")
         else:
-            # **Keep only expected columns**
-            df = df[expected_features]
-
-            # **Apply the same feature engineering as in training**
-            poly = PolynomialFeatures(degree=2, interaction_only=True, include_bias=False)
-            poly.fit(df)  
-            X_poly = poly.transform(df)  
-            feature_names = poly.get_feature_names_out()  
-            df_poly = pd.DataFrame(X_poly, columns=feature_names)
-
-            # **Apply Scaling**
-            scaler = RobustScaler()
-            df_scaled = scaler.fit_transform(df_poly)
-            df_final = pd.DataFrame(df_scaled, columns=df_poly.columns)
-
-            # **Make Predictions**
-            predictions = model.predict(df_final)
-            prediction_probabilities = model.predict_proba(df_final)  # Get probability scores
-
-            # **Add predictions to DataFrame**
-            df['Potability Prediction'] = predictions
-            df['Probability of Potable'] = prediction_probabilities[:, 1]  # Probability of potable water
-
-            # **Classification for Usage**
-            def classify_usage(row):
-                # Drinking water criteria
-                drinking_safe = (6.5 <= row['pH'] <= 8.5) and row['Potability Prediction'] == 1
-
-                # Agriculture water criteria
-                agriculture_safe = row['pH'] >= 6.0 and row['Sulfate'] <= 400 and row['Conductivity'] <= 3000
-
-                # Industrial water criteria
-                industry_safe = row['Hardness'] <= 500 and row['Conductivity'] <= 5000
-
-                return pd.Series([drinking_safe, agriculture_safe, industry_safe], 
-                                 index=['Drinking Safe', 'Agriculture Safe', 'Industry Safe'])
-
-            df[['Drinking Safe', 'Agriculture Safe', 'Industry Safe']] = df.apply(classify_usage, axis=1)
-
-            # **Show Full Dataset with Predictions**
-            st.write("### 📊 Full Prediction Results")
-            st.dataframe(df)
-
-            # **Summarize the Results**
-            potable_count = np.sum(df['Potability Prediction'] == 1)
-            non_potable_count = np.sum(df['Potability Prediction'] == 0)
-            drinking_safe_count = df['Drinking Safe'].sum()
-            agriculture_safe_count = df['Agriculture Safe'].sum()
-            industry_safe_count = df['Industry Safe'].sum()
-
-            st.write(f"✅ **Potable Water Count:** {potable_count}")
-            st.write(f"❌ **Non-Potable Water Count:** {non_potable_count}")
-            st.write(f"🚰 **Safe for Drinking:** {drinking_safe_count}")
-            st.write(f"🌱 **Safe for Agriculture:** {agriculture_safe_count}")
-            st.write(f"🏭 **Safe for Industry:** {industry_safe_count}")
-
-            # **Visualization - Bar Chart**
-            st.write("### 📊 Classification Summary")
-            st.bar_chart(pd.DataFrame({
-                "Count": [drinking_safe_count, agriculture_safe_count, industry_safe_count]
-            }, index=["Drinking Safe", "Agriculture Safe", "Industry Safe"]))
-
-            # **Visualization - Pie Chart**
-            st.write("### 🥧 Water Quality Distribution")
-            fig, ax = plt.subplots()
-            labels = ['Drinking Safe', 'Agriculture Safe', 'Industry Safe']
-            sizes = [drinking_safe_count, agriculture_safe_count, industry_safe_count]
-            colors = ['#66b3ff', '#99ff99', '#ffcc99']
-            ax.pie(sizes, labels=labels, autopct='%1.1f%%', colors=colors, startangle=90, wedgeprops={"edgecolor": "black"})
-            ax.axis('equal')  # Equal aspect ratio ensures that pie is drawn as a circle
-            st.pyplot(fig)
+            st.error(f"❌ Could not score the uploaded file: {job['error']}")
+    else:
+        if job.get("cached"):
+            st.success(f"✅ {job['summary']['rows']:,} rows, served from the result cache (this file was scored before).")
+        elif job["summary"].get("reused_rows"):
+            st.success(f"✅ Scored {job['summary']['rows']:,} rows; {job['summary']['reused_rows']:,} unchanged rows "
+                       "reused from an earlier upload.")
+        else:
+            st.success(f"✅ Scored {job['summary']['rows']:,} rows.")
+        show_results(job_id, job["result_path"], job["summary"])
+
+if st.session_state.get("username") == "admin":
+    profiler.render_panel(st)
+profiler.end_rerun()
@@ -0,0 +1,95 @@
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from threadpoolctl import threadpool_limits
+
+import fused
+from pipeline import feature_matrix, input_dtype, predict_matrix, transform_matrix
+
+# Parallel scoring engine: the feature matrix is split into row blocks that are transformed and
+# predicted on a thread pool (numpy, sklearn and xgboost release the GIL in their kernels).
+# BLAS/OpenMP are pinned to one thread per worker so N workers use N cores, not N * cores: BLAS
+# limits are process-wide, so they are set once per process (limit_native_threads) and never
+# toggled around a call; OpenMP limits are per thread and set once in each pool thread.
+SCORING_WORKERS = int(os.environ.get("WATER_SCORING_WORKERS", os.cpu_count() or 1))
+MIN_BLOCK_ROWS = int(os.environ.get("WATER_SCORING_MIN_BLOCK_ROWS", 5_000))
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_executors = {}
+_native_limited = False
+
+
+def limit_native_threads():
+    # One BLAS thread for the whole process; called at process start by the job workers, the CLI
+    # and the service, and before the first scoring pool is created anywhere else
+    global _native_limited
+    with _lock:
+        if not _native_limited:
+            threadpool_limits(limits=1, user_api="blas")
+            _native_limited = True
+
+
+def _init_scoring_thread():
+    # OpenMP thread counts are per calling thread, so each pool thread pins its own once
+    threadpool_limits(limits=1, user_api="openmp")
+
+
+def _get_executor(workers):
+    executor = _executors.get(workers)
+    if executor is None:
+        limit_native_threads()
+        with _lock:
+            executor = _executors.get(workers)
+            if executor is None:
+                executor = _executors[workers] = ThreadPoolExecutor(
+                    max_workers=workers, thread_name_prefix="scoring", initializer=_init_scoring_thread)
+    return executor
+
+
+def _score_block(artifact, X, out=None):
+    return predict_matrix(artifact["model"], transform_matrix(artifact["preprocessor"], X, out))
+
+
+def predict_parallel(artifact, df, workers=None):
+    """Labels and probabilities for ``df`` in a single pass.
+
+    ``workers`` defaults to SCORING_WORKERS as set when called (job workers and the CLI lower it).
+    Returns ``(labels, probabilities, stats)`` where ``stats`` reports rows, workers, seconds
+    and rows_per_second for the run.
+    """
+    workers = workers or SCORING_WORKERS
+    start = time.perf_counter()
+    preprocessor = artifact["preprocessor"]
+    X = feature_matrix(df, artifact["features"], input_dtype(preprocessor))
+    n_blocks = max(1, min(workers, len(X) // MIN_BLOCK_ROWS))
+
+    # With the fused kernel every block writes its features into its rows of one float32 buffer
+    params = fused.params_for(preprocessor)
+    out = np.empty((len(X), params["n_output"]), dtype=np.float32) if params is not None else None
+
+    # Even a single block runs on a pool thread, so the caller's thread limits are never touched
+    executor = _get_executor(workers)
+    if n_blocks == 1:
+        labels, probabilities = executor.submit(_score_block, artifact, X, out).result()
+    else:
+        edges = np.linspace(0, len(X), n_blocks + 1).astype(int)
+        blocks = [(X[a:b], None if out is None else out[a:b]) for a, b in zip(edges[:-1], edges[1:])]
+        results = list(executor.map(lambda block: _score_block(artifact, *block), blocks))
+        labels = np.concatenate([r[0] for r in results])
+        probabilities = np.concatenate([r[1] for r in results])
+
+    seconds = time.perf_counter() - start
+    stats = {
+        "rows": len(X),
+        "workers": n_blocks,
+        "seconds": seconds,
+        "rows_per_second": len(X) / seconds if seconds > 0 else float("inf"),
+    }
+    logger.debug("Scored %(rows)d rows on %(workers)d workers at %(rows_per_second).0f rows/s", stats)
+    return labels, probabilities, stats
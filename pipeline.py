@@ -0,0 +1,134 @@
+import datetime
+import os
+import sys
+import warnings
+
+import numpy as np
+
+import fused
+import schema
+
+# A scoring artifact bundles the training-time fitted preprocessing chain with the model,
+# so inference is transform-only and every batch is scaled the same way.
+ARTIFACT_FORMAT = "water-potability-artifact"
+ARTIFACT_SCHEMA = 1
+
+# Features the model was trained on, in training order (canonical names, see schema.py)
+FEATURES = list(schema.MEASUREMENTS)
+
+
+def build_preprocessor():
+    # sklearn and joblib are imported on first use; scoring-only processes load them with the model
+    from sklearn.impute import SimpleImputer
+    from sklearn.pipeline import Pipeline
+    from sklearn.preprocessing import PolynomialFeatures, RobustScaler
+
+    # Missing measurements (ph, Sulfate and Trihalomethanes in the training data, any column in
+    # uploads) take the training median; PolynomialFeatures rejects NaN. Empty columns are kept,
+    # filled with 0, so the feature count never depends on the data.
+    return Pipeline([
+        ("impute", SimpleImputer(strategy="median", keep_empty_features=True)),
+        ("poly", PolynomialFeatures(degree=2, interaction_only=True, include_bias=False)),
+        ("scaler", RobustScaler()),
+    ])
+
+
+def feature_matrix(df, features=FEATURES, dtype=np.float64):
+    # Older artifacts list features as "pH"/"Organic_Carbon"; frames use the canonical names
+    return df[[schema.canonical(f) for f in features]].to_numpy(dtype=dtype)
+
+
+def fit_preprocessor(train_df, features=FEATURES):
+    # Fitted on a bare array so transform() on arrays does not warn about feature names
+    preprocessor = build_preprocessor()
+    preprocessor.fit(feature_matrix(train_df, features))
+    return preprocessor
+
+
+def build_artifact(model, preprocessor, version, features=FEATURES, metrics=None):
+    return {
+        "format": ARTIFACT_FORMAT,
+        "schema": ARTIFACT_SCHEMA,
+        "version": str(version),
+        "created_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "features": list(features),
+        "preprocessor": preprocessor,
+        "model": model,
+        "metrics": dict(metrics or {}),
+    }
+
+
+def is_artifact(obj):
+    return isinstance(obj, dict) and obj.get("format") == ARTIFACT_FORMAT
+
+
+def save_artifact(artifact, path):
+    if not is_artifact(artifact):
+        raise ValueError("Not a water potability scoring artifact")
+    import joblib
+
+    joblib.dump(artifact, path)
+
+
+def artifact_from_legacy_model(model, reference_csv, version="legacy"):
+    # Older .pkl files hold only the classifier; fit the transformers once on the training data
+    train_df = schema.read_csv(reference_csv)
+    return build_artifact(model, fit_preprocessor(train_df), version)
+
+
+def load_artifact(path, reference_csv="water_potability.csv", mmap_mode=None):
+    # mmap_mode="r" maps the numpy arrays of uncompressed pickles instead of copying them
+    import joblib
+
+    obj = joblib.load(path, mmap_mode=mmap_mode)
+    if is_artifact(obj):
+        if obj.get("schema", 0) > ARTIFACT_SCHEMA:
+            raise ValueError(f"Artifact schema {obj['schema']} is newer than this app supports")
+        return obj
+
+    warnings.warn(f"{path} holds a bare model; fitting preprocessing on {reference_csv}. "
+                  "Run `python pipeline.py convert` to persist a full artifact.")
+    return artifact_from_legacy_model(obj, reference_csv)
+
+
+def input_dtype(preprocessor):
+    # The fused kernel works in float32, so its input is read as float32 straight away
+    return np.float32 if fused.params_for(preprocessor) is not None else np.float64
+
+
+def transform_matrix(preprocessor, X, out=None):
+    # Fused float32 kernel for the poly + robust-scaler chain, sklearn for anything else
+    params = fused.params_for(preprocessor)
+    if params is not None:
+        return fused.transform(X, params, out=out)
+    if out is None:
+        return preprocessor.transform(X)
+    out[...] = preprocessor.transform(X)
+    return out
+
+
+def transform(artifact, df):
+    preprocessor = artifact["preprocessor"]
+    return transform_matrix(preprocessor, feature_matrix(df, artifact["features"], input_dtype(preprocessor)))
+
+
+def predict_matrix(model, X):
+    # One predict_proba pass; labels are its argmax, which is what predict() computes anyway
+    probabilities = model.predict_proba(X)
+    return model.classes_[np.argmax(probabilities, axis=1)], probabilities
+
+
+def predict(artifact, df):
+    return predict_matrix(artifact["model"], transform(artifact, df))
+
+
+if __name__ == "__main__":
+    # python pipeline.py convert <legacy_model.pkl> <training.csv> <artifact.pkl> [version]
+    if len(sys.argv) < 5 or sys.argv[1] != "convert":
+        sys.exit("usage: python pipeline.py convert <legacy_model.pkl> <training.csv> <artifact.pkl> [version]")
+    legacy_path, reference_csv, out_path = sys.argv[2:5]
+    version = sys.argv[5] if len(sys.argv) > 5 else os.path.splitext(os.path.basename(out_path))[0]
+    import joblib
+
+    save_artifact(artifact_from_legacy_model(joblib.load(legacy_path), reference_csv, version), out_path)
+    print(f"Wrote {out_path} (version {version})")
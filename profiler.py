@@ -0,0 +1,203 @@
+import cProfile
+import io
+import json
+import os
+import pstats
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+
+# Per-rerun stage profiler. Streamlit runs each session's script on its own thread, so the rerun
+# being timed lives in a thread-local; durations are kept in rolling windows per page and stage.
+WINDOW = int(os.environ.get("WATER_PROFILER_WINDOW", 500))
+QUANTILES = (0.5, 0.95, 0.99)
+
+_lock = threading.Lock()
+_reruns = defaultdict(lambda: deque(maxlen=WINDOW))
+_stages = defaultdict(lambda: deque(maxlen=WINDOW))
+_last_profile = {}
+_local = threading.local()
+
+
+def start_rerun(page, profile=False):
+    # Call at the top of a page script; a previous rerun that never finished (an exception) is dropped
+    current = {"page": page, "start": time.perf_counter(), "profiler": None}
+    if profile:
+        current["profiler"] = cProfile.Profile()
+        current["profiler"].enable()
+    _local.current = current
+
+
+@contextmanager
+def finishing_rerun():
+    # For script paths that end in st.stop() or st.rerun(): both raise, so the end_rerun() at the
+    # bottom of the script never runs. The rerun is recorded (and a capture stopped) on the way out.
+    try:
+        yield
+    finally:
+        end_rerun()
+
+
+def set_page(page):
+    current = getattr(_local, "current", None)
+    if current is not None:
+        current["page"] = page
+
+
+def end_rerun():
+    current = getattr(_local, "current", None)
+    if current is None:
+        return
+    _local.current = None
+    elapsed = time.perf_counter() - current["start"]
+    with _lock:
+        _reruns[current["page"]].append(elapsed)
+    if current["profiler"] is not None:
+        current["profiler"].disable()
+        out = io.StringIO()
+        pstats.Stats(current["profiler"], stream=out).sort_stats("cumulative").print_stats(40)
+        _last_profile[current["page"]] = {"captured_at": time.time(), "seconds": elapsed, "report": out.getvalue()}
+
+
+def record(name, seconds, page=None):
+    if page is None:
+        current = getattr(_local, "current", None)
+        page = current["page"] if current is not None else "background"
+    with _lock:
+        _stages[(page, name)].append(seconds)
+
+
+@contextmanager
+def stage(name):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, time.perf_counter() - start)
+
+
+def auth_hook(operation, wall, cpu, queued):
+    # For auth.add_metrics_hook: bcrypt timings show up as stages of the rerun that waited on them
+    record(f"bcrypt_{operation}", wall)
+    record(f"bcrypt_{operation}_cpu", cpu)
+
+
+def _summary(values):
+    values = sorted(values)
+    if not values:
+        return {"count": 0}
+    summary = {"count": len(values), "mean": sum(values) / len(values)}
+    for q in QUANTILES:
+        summary[f"p{int(q * 100)}"] = values[min(len(values) - 1, int(q * len(values)))]
+    return summary
+
+
+def snapshot():
+    with _lock:
+        reruns = {page: list(values) for page, values in _reruns.items()}
+        stages = {key: list(values) for key, values in _stages.items()}
+    pages = {}
+    for page, values in reruns.items():
+        pages.setdefault(page, {"stages": {}})["rerun"] = _summary(values)
+    for (page, name), values in stages.items():
+        pages.setdefault(page, {"stages": {}})["stages"][name] = _summary(values)
+    return pages
+
+
+def export_json():
+    import charts
+    import startup
+
+    return json.dumps({"generated_at": time.time(), "window": WINDOW, "pages": snapshot(),
+                       "startup": startup.snapshot(), "figures": charts.info()}, indent=2)
+
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", " ")
+
+
+def export_prometheus():
+    lines = [
+        "# HELP water_rerun_seconds Streamlit rerun wall time over the rolling window.",
+        "# TYPE water_rerun_seconds summary",
+    ]
+    pages = snapshot()
+    for page, data in pages.items():
+        rerun = data.get("rerun")
+        if rerun and rerun["count"]:
+            for q in QUANTILES:
+                lines.append(f'water_rerun_seconds{{page="{_label(page)}",quantile="{q}"}} {rerun[f"p{int(q * 100)}"]:.6f}')
+            lines.append(f'water_rerun_seconds_count{{page="{_label(page)}"}} {rerun["count"]}')
+    lines += [
+        "# HELP water_stage_seconds Named stage wall time over the rolling window.",
+        "# TYPE water_stage_seconds summary",
+    ]
+    for page, data in pages.items():
+        for name, summary in data["stages"].items():
+            labels = f'page="{_label(page)}",stage="{_label(name)}"'
+            for q in QUANTILES:
+                lines.append(f'water_stage_seconds{{{labels},quantile="{q}"}} {summary[f"p{int(q * 100)}"]:.6f}')
+            lines.append(f"water_stage_seconds_count{{{labels}}} {summary['count']}")
+    return "\n".join(lines) + "\n"
+
+
+def last_profile(page):
+    return _last_profile.get(page)
+
+
+def _render_startup(st):
+    import startup
+
+    state = startup.snapshot()
+    if state["first_render"]:
+        st.caption(f"Cold start: first render ({state['first_render']['page']}) "
+                   f"{state['first_render']['seconds'] * 1000:.0f} ms after the script was first imported")
+    if state["prewarm"]:
+        st.caption("Prewarm: " + ", ".join(f"{name} {step['seconds'] * 1000:.0f} ms" if "seconds" in step
+                                           else f"{name} failed" for name, step in state["prewarm"].items()))
+    if st.button("Measure import times (-X importtime)"):
+        with st.spinner("Importing the app's modules in a fresh interpreter..."):
+            report = startup.import_report()
+        st.caption(f"Fresh interpreter start + imports: {report['interpreter_seconds'] * 1000:.0f} ms")
+        st.dataframe(report["modules"], hide_index=True)
+        if not report["ok"]:
+            st.warning(report["error"])
+
+
+def _render_figures(st):
+    import charts
+
+    info = charts.info()
+    st.caption(f"Figure cache: {info['figures']} figures, {info['hits']} hits / {info['misses']} builds")
+
+
+def render_panel(st):
+    # Admin-only latency panel; the caller decides who is an admin
+    with st.sidebar.expander("⏱️ Rerun latency (admin)"):
+        rows = []
+        for page, data in sorted(snapshot().items()):
+            entries = [("rerun", data.get("rerun"))] + sorted(data["stages"].items())
+            for name, summary in entries:
+                if summary and summary["count"]:
+                    rows.append({"page": page, "stage": name, "count": summary["count"],
+                                 "p50 ms": summary["p50"] * 1000, "p95 ms": summary["p95"] * 1000,
+                                 "p99 ms": summary["p99"] * 1000})
+        if rows:
+            st.dataframe(rows, hide_index=True)
+        else:
+            st.caption("No reruns recorded yet.")
+
+        st.download_button("Export JSON", export_json(), file_name="rerun_latency.json", mime="application/json")
+        st.download_button("Export Prometheus", export_prometheus(), file_name="rerun_latency.prom", mime="text/plain")
+        if st.button("Profile next rerun (cProfile)"):
+            st.session_state.profile_next_rerun = True
+
+        _render_startup(st)
+        _render_figures(st)
+
+        current = getattr(_local, "current", None)
+        profile = last_profile(current["page"]) if current is not None else None
+        if profile:
+            st.caption(f"Last cProfile capture: {profile['seconds'] * 1000:.0f} ms rerun")
+            st.code(profile["report"])
@@ -0,0 +1,238 @@
+import hashlib
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+import pandas as pd
+
+import rules
+import schema
+from parallel import predict_parallel
+from pipeline import FEATURES
+
+# Content-addressed cache of scored uploads on local disk. An entry is keyed by the upload's
+# SHA-256, the model file and the rules version, so re-uploading the same file is served
+# without scoring. With row hashing on, every entry also keeps per-row hashes and predictions
+# (sorted .npy arrays, memory-mapped when searched); an edited re-upload then only runs the model
+# on rows not seen before under the same model.
+# Entries are evicted least recently used first once the cache grows past CACHE_MAX_BYTES.
+CACHE_DIR = os.environ.get("WATER_RESULT_CACHE_DIR", "result_cache")
+CACHE_MAX_BYTES = int(os.environ.get("WATER_RESULT_CACHE_MAX_BYTES", 2 * 1024 ** 3))
+ROW_HASHING = os.environ.get("WATER_RESULT_CACHE_ROWS", "1") != "0"
+ROW_SOURCES = int(os.environ.get("WATER_RESULT_CACHE_ROW_SOURCES", 4))
+# Uploads with more rows are not indexed for row reuse (sorting the index needs them in memory)
+ROW_LIMIT = int(os.environ.get("WATER_RESULT_CACHE_ROW_LIMIT", 20_000_000))
+
+ROW_DTYPES = {"hashes": np.uint64, "labels": np.int64, "probabilities": np.float64}
+ROW_ARRAYS = tuple(ROW_DTYPES)
+# Every file of an entry; .rows.npz is the previous row format, still removed on eviction
+SUFFIXES = (".json", ".parquet") + tuple(f".rows.{name}.npy" for name in ROW_ARRAYS) + (".rows.npz",)
+
+
+def _path(key, suffix):
+    return os.path.join(CACHE_DIR, key + suffix)
+
+
+def _rows_path(key, name):
+    return _path(key, f".rows.{name}.npy")
+
+
+def copy_hashing(source, dst_path):
+    # Copies a path or binary file object to ``dst_path`` and returns the SHA-256 of its bytes
+    digest = hashlib.sha256()
+    src = open(source, "rb") if isinstance(source, (str, os.PathLike)) else source
+    try:
+        with open(dst_path, "wb") as dst:
+            while True:
+                block = src.read(1 << 20)
+                if not block:
+                    break
+                digest.update(block)
+                dst.write(block)
+    finally:
+        if src is not source:
+            src.close()
+    return digest.hexdigest()
+
+
+def model_key(model_path):
+    stat = os.stat(model_path)
+    return f"{stat.st_size}-{stat.st_mtime_ns}"
+
+
+def key(digest, model_path, profile=None):
+    return hashlib.sha256(f"{digest}|{model_key(model_path)}|{rules.version(profile)}|{schema.VERSION}".encode()).hexdigest()
+
+
+def _link(src, dst):
+    # Hard links keep a job's result alive after its cache entry is evicted (and vice versa)
+    tmp_path = f"{dst}.{os.getpid()}.tmp"
+    try:
+        os.link(src, tmp_path)
+    except OSError:
+        shutil.copyfile(src, tmp_path)
+    os.replace(tmp_path, dst)
+
+
+def get(key, result_path):
+    """Link a cached result to ``result_path``; returns the entry's metadata, or None on a miss."""
+    try:
+        with open(_path(key, ".json")) as f:
+            meta = json.load(f)
+        _link(_path(key, ".parquet"), result_path)
+    except (OSError, ValueError):
+        return None
+    now = time.time()
+    os.utime(_path(key, ".json"), (now, now))
+    return meta
+
+
+def put(key, result_path, summary, model_path, model_version, rows=None):
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    _link(result_path, _path(key, ".parquet"))
+    if rows is not None:
+        for name in ROW_ARRAYS:
+            tmp_path = _path(key, f".rows.{name}.{os.getpid()}.tmp.npy")
+            np.save(tmp_path, np.asarray(rows[name], dtype=ROW_DTYPES[name]))
+            os.replace(tmp_path, _rows_path(key, name))
+    meta = {"summary": summary, "model_key": model_key(model_path), "model_version": model_version,
+            "created_at": time.time()}
+    tmp_path = _path(key, f".{os.getpid()}.tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(meta, f)
+    os.replace(tmp_path, _path(key, ".json"))
+    evict()
+
+
+def _entries():
+    # (last used, key, bytes) per entry; an entry's .json mtime is its last use
+    entries = []
+    for name in os.listdir(CACHE_DIR) if os.path.isdir(CACHE_DIR) else []:
+        if not name.endswith(".json"):
+            continue
+        entry = name[:-len(".json")]
+        try:
+            used = os.path.getmtime(_path(entry, ".json"))
+            size = sum(os.path.getsize(_path(entry, suffix)) for suffix in SUFFIXES
+                       if os.path.exists(_path(entry, suffix)))
+        except OSError:
+            continue
+        entries.append((used, entry, size))
+    return sorted(entries)
+
+
+def evict(max_bytes=CACHE_MAX_BYTES):
+    entries = _entries()
+    total = sum(size for _, _, size in entries)
+    for _, entry, size in entries:
+        if total <= max_bytes:
+            break
+        # The .json goes first so a half-deleted entry is never served
+        for suffix in SUFFIXES:
+            try:
+                os.remove(_path(entry, suffix))
+            except OSError:
+                pass
+        total -= size
+
+
+def row_hashes(df):
+    return pd.util.hash_pandas_object(df[FEATURES], index=False).to_numpy()
+
+
+class RowPredictor:
+    """Drop-in for ``predict_parallel`` that reuses predictions for rows seen in recent cache
+    entries of the same model and records every row it scores for the new entry.
+
+    Earlier entries' rows are sorted hash arrays memory-mapped from disk and searched chunk by
+    chunk; this upload's rows are spooled to files in ``spool_dir`` (e.g. the job directory),
+    so memory stays bounded by the chunk size. Uploads over ``limit`` rows are scored and reuse
+    rows as usual but are not recorded for later ones.
+    """
+
+    def __init__(self, model_path, spool_dir, sources=ROW_SOURCES, limit=ROW_LIMIT):
+        self.sources = []
+        current = model_key(model_path)
+        for _, entry, _ in reversed(_entries()):
+            if len(self.sources) >= sources:
+                break
+            try:
+                with open(_path(entry, ".json")) as f:
+                    if json.load(f)["model_key"] != current:
+                        continue
+                arrays = tuple(np.load(_rows_path(entry, name), mmap_mode="r") for name in ROW_ARRAYS)
+            except (OSError, ValueError, KeyError):
+                continue
+            if len(arrays[0]):
+                self.sources.append(arrays)
+        self.spool = {name: os.path.join(spool_dir, f"rows.{name}.bin") for name in ROW_ARRAYS}
+        for path in self.spool.values():
+            open(path, "wb").close()
+        self.limit = limit
+        self.recorded = 0
+
+    def _lookup(self, hashes):
+        # Per row: position in the first source that has it; labels/probabilities filled in place
+        found = np.zeros(len(hashes), dtype=bool)
+        labels = np.zeros(len(hashes), dtype=np.int64)
+        probabilities = np.zeros(len(hashes))
+        for source_hashes, source_labels, source_probabilities in self.sources:
+            todo = np.flatnonzero(~found)
+            if not len(todo):
+                break
+            wanted = hashes[todo]
+            positions = np.minimum(np.searchsorted(source_hashes, wanted), len(source_hashes) - 1)
+            hit = source_hashes[positions] == wanted
+            rows, positions = todo[hit], positions[hit]
+            labels[rows] = source_labels[positions]
+            probabilities[rows] = source_probabilities[positions]
+            found[rows] = True
+        return found, labels, probabilities
+
+    def _record(self, hashes, labels, probabilities):
+        if self.recorded is None:
+            return
+        if self.recorded + len(hashes) > self.limit:
+            # Too big to index for reuse: stop recording and drop what was spooled
+            self.recorded = None
+            for path in self.spool.values():
+                os.remove(path)
+            return
+        for name, values in zip(ROW_ARRAYS, (hashes, labels, probabilities)):
+            with open(self.spool[name], "ab") as f:
+                f.write(np.ascontiguousarray(values, dtype=ROW_DTYPES[name]).tobytes())
+        self.recorded += len(hashes)
+
+    def __call__(self, artifact, df):
+        start = time.perf_counter()
+        hashes = row_hashes(df)
+        found, labels, probabilities = self._lookup(hashes)
+        new = ~found
+
+        stats = {"rows": 0, "workers": 0, "seconds": 0.0}
+        if new.all():
+            labels, probabilities, stats = predict_parallel(artifact, df)
+            probabilities = probabilities[:, 1]
+        elif new.any():
+            new_labels, new_probabilities, stats = predict_parallel(artifact, df[new])
+            labels = labels.astype(np.result_type(labels, new_labels))
+            labels[new] = new_labels
+            probabilities[new] = new_probabilities[:, 1]
+
+        self._record(hashes, labels, probabilities)
+        stats = dict(stats, reused_rows=int(found.sum()), rows=len(df))
+        stats["seconds"] = time.perf_counter() - start
+        stats["rows_per_second"] = len(df) / stats["seconds"] if stats["seconds"] > 0 else float("inf")
+        return labels, np.column_stack([1.0 - probabilities, probabilities]), stats
+
+    def rows(self):
+        # Sorted, de-duplicated arrays for ``put(rows=...)``, or None if the upload was over the limit
+        if self.recorded is None:
+            return None
+        arrays = {name: np.fromfile(self.spool[name], dtype=ROW_DTYPES[name]) for name in ROW_ARRAYS}
+        for path in self.spool.values():
+            os.remove(path)
+        hashes, first = np.unique(arrays["hashes"], return_index=True)
+        return {"hashes": hashes, "labels": arrays["labels"][first], "probabilities": arrays["probabilities"][first]}
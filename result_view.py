@@ -0,0 +1,141 @@
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+# Server-side paging over scored results. The job's Parquet output is converted once into an
+# uncompressed Arrow IPC file next to it and memory-mapped, so a page is a zero-copy ``take`` of
+# a few rows. Filters and sorting run here on NumPy columns and only the row order is cached;
+# the browser only ever receives one page.
+PAGE_SIZE = int(os.environ.get("WATER_RESULTS_PAGE_SIZE", 100))
+VIEW_CACHE = int(os.environ.get("WATER_RESULTS_VIEW_CACHE", 16))
+
+# Preset filters offered on the Visualization page, as [column, op, value] conditions
+FILTERS = {
+    "All rows": [],
+    "Potable only": [("Potability Prediction", "==", 1)],
+    "Non-potable only": [("Potability Prediction", "==", 0)],
+    "Drinking Safe only": [("Drinking Safe", "==", 1)],
+    "Agriculture Safe only": [("Agriculture Safe", "==", 1)],
+    "Industry Safe only": [("Industry Safe", "==", 1)],
+}
+
+_OPS = {
+    "<": np.less,
+    "<=": np.less_equal,
+    ">": np.greater,
+    ">=": np.greater_equal,
+    "==": np.equal,
+    "!=": np.not_equal,
+}
+
+_lock = threading.Lock()
+_tables = OrderedDict()
+_views = OrderedDict()
+
+
+def arrow_path(result_path):
+    return os.path.splitext(result_path)[0] + ".arrow"
+
+
+def _convert(result_path, path):
+    # Streams row groups across, so converting never holds the whole result in memory
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    parquet_file = pq.ParquetFile(result_path)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with pa.OSFile(tmp_path, "wb") as sink, pa.ipc.new_file(sink, parquet_file.schema_arrow) as writer:
+            for batch in parquet_file.iter_batches(batch_size=65536):
+                writer.write_batch(batch)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def open_table(result_path):
+    import pyarrow as pa
+
+    signature = (result_path, os.stat(result_path).st_mtime_ns)
+    table = _tables.get(result_path)
+    if table is not None and table[0] == signature:
+        return table[1]
+    with _lock:
+        table = _tables.get(result_path)
+        if table is None or table[0] != signature:
+            path = arrow_path(result_path)
+            if not os.path.exists(path) or os.stat(path).st_mtime_ns < signature[1]:
+                _convert(result_path, path)
+            table = (signature, pa.ipc.open_file(pa.memory_map(path)).read_all())
+            _tables[result_path] = table
+            while len(_tables) > VIEW_CACHE:
+                _tables.popitem(last=False)
+            for key in [key for key in _views if key[0] == result_path and key[1] != signature[1]]:
+                del _views[key]
+        return table[1]
+
+
+def _column(table, name):
+    import pyarrow as pa
+
+    # Nulls become NaN, which never passes a filter and sorts last
+    return table.column(name).cast(pa.float64()).to_numpy(zero_copy_only=False)
+
+
+def _order(table, conditions, sort_by, descending):
+    rows = None
+    if conditions:
+        mask = np.ones(table.num_rows, dtype=bool)
+        with np.errstate(invalid="ignore"):
+            for column, op, value in conditions:
+                mask &= _OPS[op](_column(table, column), value)
+        rows = np.flatnonzero(mask)
+    if sort_by:
+        values = _column(table, sort_by)
+        if rows is not None:
+            values = values[rows]
+        order = np.argsort(-values if descending else values, kind="stable")
+        rows = order if rows is None else rows[order]
+    if rows is not None and table.num_rows < 2 ** 31:
+        rows = rows.astype(np.int32)
+    return rows
+
+
+def view(result_path, conditions=(), sort_by=None, descending=False):
+    """(table, rows): the memory-mapped result and its row order after filtering and sorting,
+    as an index array or None for the file's own order. Row orders are cached per query."""
+    table = open_table(result_path)
+    key = (result_path, os.stat(result_path).st_mtime_ns, tuple(map(tuple, conditions)), sort_by, descending)
+    with _lock:
+        if key in _views:
+            _views.move_to_end(key)
+            return table, _views[key]
+    rows = _order(table, conditions, sort_by, descending)
+    with _lock:
+        _views[key] = rows
+        while len(_views) > VIEW_CACHE:
+            _views.popitem(last=False)
+    return table, rows
+
+
+def count(result_path, conditions=(), sort_by=None, descending=False):
+    table, rows = view(result_path, conditions, sort_by, descending)
+    return table.num_rows if rows is None else len(rows)
+
+
+def page(result_path, number, page_size=PAGE_SIZE, conditions=(), sort_by=None, descending=False):
+    """One page (``number`` counts from 0) as a DataFrame, plus the number of matching rows."""
+    table, rows = view(result_path, conditions, sort_by, descending)
+    total = table.num_rows if rows is None else len(rows)
+    start = min(number * page_size, total)
+    stop = min(start + page_size, total)
+    if rows is None:
+        chunk = table.slice(start, stop - start)
+    else:
+        chunk = table.take(rows[start:stop])
+    df = chunk.to_pandas()
+    df.index = np.arange(start, stop) if rows is None else rows[start:stop]
+    return df, total
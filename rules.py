@@ -0,0 +1,147 @@
+import hashlib
+import json
+import os
+import threading
+
+import numpy as np
+
+# Declarative usage rules. Every rule in rules.json is a list of [column, op, value] conditions
+# that must all hold; rules are grouped into per-region profiles (a profile may extend another).
+# Rules are compiled once into NumPy mask functions, so evaluating a million rows is a handful
+# of vectorized comparisons instead of a row-wise df.apply. Missing values never satisfy a rule.
+RULES_PATH = os.environ.get("WATER_RULES_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "rules.json"))
+DEFAULT_PROFILE = os.environ.get("WATER_RULES_PROFILE")
+
+_OPS = {
+    "<": np.less,
+    "<=": np.less_equal,
+    ">": np.greater,
+    ">=": np.greater_equal,
+    "==": np.equal,
+    "!=": np.not_equal,
+}
+
+_lock = threading.Lock()
+_loaded = None
+
+
+class RuleError(ValueError):
+    pass
+
+
+def _compile_condition(column, op, value):
+    if op == "between":
+        low, high = value
+
+        def condition(get):
+            values = get(column)
+            return np.greater_equal(values, low) & np.less_equal(values, high)
+    elif op == "in":
+        allowed = np.asarray(value, dtype=np.float64)
+
+        def condition(get):
+            return np.isin(get(column), allowed)
+    elif op in _OPS:
+        ufunc = _OPS[op]
+
+        def condition(get):
+            return ufunc(get(column), value)
+    else:
+        raise RuleError(f"Unknown operator {op!r} in rule on {column!r}")
+    return condition
+
+
+def _compile_rule(name, conditions):
+    if not conditions:
+        raise RuleError(f"Rule {name!r} has no conditions")
+    compiled = [_compile_condition(*condition) for condition in conditions]
+    columns = sorted({condition[0] for condition in conditions})
+
+    def rule(get):
+        mask = compiled[0](get)
+        for condition in compiled[1:]:
+            mask = mask & condition(get)
+        return mask
+
+    return rule, columns
+
+
+def _resolve(profiles, name, seen=()):
+    if name not in profiles:
+        raise RuleError(f"Unknown rules profile {name!r}")
+    if name in seen:
+        raise RuleError(f"Rules profile {name!r} extends itself")
+    profile = profiles[name]
+    rules = dict(_resolve(profiles, profile["extends"], seen + (name,))) if profile.get("extends") else {}
+    rules.update(profile.get("rules", {}))
+    return rules
+
+
+def _load(path):
+    with open(path, "rb") as f:
+        raw = f.read()
+    config = json.loads(raw)
+    profiles = {}
+    for name in config["profiles"]:
+        profiles[name] = {rule: _compile_rule(rule, conditions)
+                          for rule, conditions in _resolve(config["profiles"], name).items()}
+    return {
+        "signature": (path, os.stat(path).st_mtime_ns),
+        "version": hashlib.sha256(raw).hexdigest()[:16],
+        "default_profile": config.get("default_profile", "default"),
+        "descriptions": {name: p.get("description", "") for name, p in config["profiles"].items()},
+        "profiles": profiles,
+    }
+
+
+def _config(path=RULES_PATH):
+    # Recompiled only when the rules file changes on disk
+    global _loaded
+    loaded = _loaded
+    if loaded is not None and loaded["signature"] == (path, os.stat(path).st_mtime_ns):
+        return loaded
+    with _lock:
+        if _loaded is None or _loaded["signature"] != (path, os.stat(path).st_mtime_ns):
+            _loaded = _load(path)
+        return _loaded
+
+
+def profiles():
+    # {profile name: description}
+    return dict(_config()["descriptions"])
+
+
+def default_profile():
+    return DEFAULT_PROFILE or _config()["default_profile"]
+
+
+def version(profile=None):
+    # Changes whenever the rules file does; identifies rule output in caches
+    return f"{_config()['version']}:{profile or default_profile()}"
+
+
+def evaluate(data, names, profile=None, columns=None):
+    """Evaluate rules ``names`` on ``data`` (a DataFrame, or a dict of scalars for one sample).
+
+    ``columns`` maps rule column names to the names used in ``data`` (e.g. {"Potability": "Potability Prediction"}).
+    Returns {name: boolean mask}; for a dict of scalars the masks are 0-d arrays.
+    """
+    compiled = _config()["profiles"]
+    profile = profile or default_profile()
+    if profile not in compiled:
+        raise RuleError(f"Unknown rules profile {profile!r}")
+    columns = columns or {}
+    arrays = {}
+
+    def get(column):
+        # Each column is converted once per evaluation, however many rules use it
+        if column not in arrays:
+            arrays[column] = np.asarray(data[columns.get(column, column)], dtype=np.float64)
+        return arrays[column]
+
+    unknown = set(names) - set(compiled[profile])
+    if unknown:
+        raise RuleError(f"Profile {profile!r} has no rules named {sorted(unknown)}")
+
+    with np.errstate(invalid="ignore"):
+        return {name: compiled[profile][name][0](get) for name in names}
@@ -0,0 +1,187 @@
+import csv
+import os
+
+import numpy as np
+
+# One schema for every file the app reads: the reference dataset, uploads, CLI and service input.
+# Column names are matched case-, space- and punctuation-insensitively against the canonical
+# (water_potability.csv) spelling, so "pH", "PH" and "ph" or "Organic_Carbon" and "Organic carbon"
+# are the same column. Measurements are parsed as float64, so results echo the caller's values
+# exactly (only the matrix handed to the model is cast, see pipeline.feature_matrix), and
+# Potability as int8 by pyarrow's CSV reader, reading only the schema's columns; the header is
+# checked before any row is parsed.
+# Part of the result-cache and dataset-cache keys: bumped when parsed values change
+VERSION = 2
+
+MEASUREMENTS = ['ph', 'Hardness', 'Solids', 'Chloramines', 'Sulfate',
+                'Conductivity', 'Organic_carbon', 'Trihalomethanes', 'Turbidity']
+TARGET = 'Potability'
+DTYPES = {**{c: np.float64 for c in MEASUREMENTS}, TARGET: np.int8}
+
+# Bytes per pyarrow CSV block; batches are re-cut to the caller's chunk size
+BLOCK_BYTES = int(os.environ.get("WATER_CSV_BLOCK_BYTES", 4 << 20))
+
+
+def _key(name):
+    return "".join(ch for ch in str(name).lower() if ch.isalnum())
+
+
+ALIASES = {_key(c): c for c in DTYPES}
+ALIASES.update({
+    "totaldissolvedsolids": "Solids",
+    "tds": "Solids",
+    "totalorganiccarbon": "Organic_carbon",
+    "toc": "Organic_carbon",
+    "thms": "Trihalomethanes",
+})
+
+
+class MissingColumnsError(ValueError):
+    def __init__(self, missing):
+        self.missing = set(missing)
+        super().__init__(f"Missing columns: {sorted(self.missing)}")
+
+
+class InvalidInputError(ValueError):
+    # A file that has the columns but cannot be read as the schema (bad values, ambiguous names)
+    pass
+
+
+def canonical(name):
+    # Canonical spelling of a known column; other names are returned unchanged
+    return ALIASES.get(_key(name), name)
+
+
+def check_columns(columns, required=MEASUREMENTS):
+    missing = set(required) - {canonical(c) for c in columns}
+    if missing:
+        raise MissingColumnsError(missing)
+
+
+def _check_unique(names):
+    # Two spellings of one column (e.g. "tds" and "Solids") are rejected rather than guessed
+    seen = {}
+    for name in names:
+        column = canonical(name)
+        if column in DTYPES and column in seen:
+            raise InvalidInputError(f"Columns {seen[column]!r} and {name!r} are both {column!r}")
+        seen[column] = name
+
+
+def source_names(names):
+    # {canonical name: the caller's spelling} for known columns spelled differently
+    return {canonical(name): name for name in names if canonical(name) != name and canonical(name) in DTYPES}
+
+
+def normalize(df):
+    # Renames known columns to their canonical spelling (no copy of the data)
+    _check_unique(df.columns)
+    names = {c: canonical(c) for c in df.columns if canonical(c) != c}
+    return df.rename(columns=names) if names else df
+
+
+def _selected(names, columns):
+    # Source names to read, one per canonical column
+    _check_unique(names)
+    return [name for name in names if canonical(name) in columns]
+
+
+def _arrow_types(selected):
+    import pyarrow as pa
+
+    return {name: pa.from_numpy_dtype(DTYPES[canonical(name)]) for name in selected}
+
+
+def read_header(f):
+    # Consumes and parses the header line of a binary CSV stream
+    line = f.readline().decode("utf-8-sig").rstrip("\r\n")
+    return next(csv.reader([line]), [])
+
+
+def _open_csv(f, columns, required):
+    import pyarrow.csv as pa_csv
+
+    names = read_header(f)
+    check_columns(names, required)
+    selected = _selected(names, columns)
+    # The header is already consumed, so pyarrow is handed the names and parses rows only
+    read_options = pa_csv.ReadOptions(column_names=names, block_size=BLOCK_BYTES)
+    convert_options = pa_csv.ConvertOptions(include_columns=selected, column_types=_arrow_types(selected))
+    return read_options, convert_options
+
+
+def _to_pandas(table):
+    # attrs["source_names"] lets output be written back under the caller's headers
+    df = table.rename_columns([canonical(c) for c in table.column_names]).to_pandas()
+    df.attrs["source_names"] = source_names(table.column_names)
+    return df
+
+
+def _parse_error(e):
+    return InvalidInputError(f"Could not parse the file: {e}")
+
+
+def read_csv(source, columns=tuple(DTYPES), required=MEASUREMENTS):
+    """Whole CSV (a path or binary file object) as a DataFrame with canonical names and dtypes."""
+    import pyarrow.csv as pa_csv
+
+    import pyarrow as pa
+
+    f = open(source, "rb") if isinstance(source, (str, os.PathLike)) else source
+    try:
+        read_options, convert_options = _open_csv(f, columns, required)
+        return _to_pandas(pa_csv.read_csv(f, read_options=read_options, convert_options=convert_options))
+    except pa.ArrowInvalid as e:
+        raise _parse_error(e) from e
+    finally:
+        if f is not source:
+            f.close()
+
+
+def iter_csv(source, chunk_rows, columns=tuple(DTYPES), required=MEASUREMENTS):
+    """Stream a CSV (a path or binary file object) as DataFrames of ``chunk_rows`` rows."""
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+
+    f = open(source, "rb") if isinstance(source, (str, os.PathLike)) else source
+    try:
+        read_options, convert_options = _open_csv(f, columns, required)
+        reader = pa_csv.open_csv(f, read_options=read_options, convert_options=convert_options)
+        pending = None
+        for batch in reader:
+            pending = pa.Table.from_batches([batch]) if pending is None else pa.concat_tables(
+                [pending, pa.Table.from_batches([batch])])
+            while pending.num_rows >= chunk_rows:
+                yield _to_pandas(pending.slice(0, chunk_rows))
+                pending = pending.slice(chunk_rows)
+        if pending is not None and pending.num_rows:
+            yield _to_pandas(pending)
+    except pa.ArrowInvalid as e:
+        raise _parse_error(e) from e
+    finally:
+        if f is not source:
+            f.close()
+
+
+def iter_parquet(source, chunk_rows, columns=tuple(DTYPES), required=MEASUREMENTS):
+    """Stream a Parquet file one record batch at a time, with canonical names and dtypes."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    if not isinstance(source, (str, os.PathLike)) and not source.seekable():
+        source = pa.BufferReader(source.read())
+    try:
+        parquet_file = pq.ParquetFile(source)
+    except pa.ArrowInvalid as e:
+        raise _parse_error(e) from e
+    names = parquet_file.schema_arrow.names
+    check_columns(names, required)
+    selected = _selected(names, columns)
+    types = _arrow_types(selected)
+    try:
+        for batch in parquet_file.iter_batches(batch_size=chunk_rows, columns=selected):
+            table = pa.Table.from_batches([batch])
+            table = table.cast(pa.schema([(name, types[name]) for name in table.column_names]))
+            yield _to_pandas(table)
+    except (pa.ArrowInvalid, pa.ArrowNotImplementedError) as e:
+        raise _parse_error(e) from e
@@ -0,0 +1,189 @@
+import os
+import time
+import uuid
+
+import numpy as np
+import pandas as pd
+
+import rules
+import schema
+from parallel import predict_parallel
+from pipeline import FEATURES
+from schema import InvalidInputError, MissingColumnsError  # noqa: F401 (raised by read_chunks/score_frame)
+
+# Streaming scorer: uploads are read in fixed-size chunks and every scored chunk is appended
+# to a Parquet result file, so peak memory is bounded by the chunk size, not the upload size.
+CHUNK_ROWS = int(os.environ.get("WATER_SCORING_CHUNK_ROWS", 100_000))
+RESULTS_DIR = os.environ.get("WATER_RESULTS_DIR", "results")
+RESULTS_MAX_AGE = float(os.environ.get("WATER_RESULTS_MAX_AGE", 24 * 3600))
+
+PREDICTION_COLUMNS = ['Potability Prediction', 'Probability of Potable']
+USAGE_COLUMNS = ['Drinking Safe', 'Agriculture Safe', 'Industry Safe']
+
+
+# Rule names in rules.json, and how rule columns map onto a scored upload
+USAGE_RULES = {'Drinking Safe': 'drinking_safe', 'Agriculture Safe': 'agriculture_safe',
+               'Industry Safe': 'industry_safe'}
+RULE_COLUMNS = {'Potability': 'Potability Prediction'}
+
+
+def add_usage_flags(df, profile=None):
+    masks = rules.evaluate(df, list(USAGE_RULES.values()), profile, columns=RULE_COLUMNS)
+    for column, rule in USAGE_RULES.items():
+        df[column] = masks[rule]
+    return df
+
+
+def check_columns(columns):
+    # Any spelling schema.canonical() recognizes is accepted
+    schema.check_columns(columns, FEATURES)
+
+
+def score_frame(artifact, df, stats=None, profile=None, predict=predict_parallel, keep_names=False):
+    # ``predict`` has predict_parallel's signature (see result_cache.RowPredictor). With
+    # ``keep_names`` the measurements keep the caller's spelling (e.g. "pH") in the output.
+    names = df.attrs.get("source_names")
+    if names is None:
+        names = schema.source_names(df.columns)
+    df = schema.normalize(df)
+    check_columns(df.columns)
+
+    # Schema dtypes (float64) so every chunk writes the same Parquet schema and the output keeps
+    # the caller's values; predict() casts its own copy for the model
+    try:
+        df = df[FEATURES].astype({c: schema.DTYPES[c] for c in FEATURES}).reset_index(drop=True)
+    except (TypeError, ValueError) as e:
+        raise InvalidInputError(f"Non-numeric measurement values: {e}") from e
+    predictions, probabilities, run_stats = predict(artifact, df)
+    df['Potability Prediction'] = predictions
+    df['Probability of Potable'] = probabilities[:, 1]
+    if stats is not None:
+        stats.update(run_stats)
+    df = add_usage_flags(df, profile)
+    return df.rename(columns=names) if keep_names and names else df
+
+
+def empty_summary():
+    return {"rows": 0, "chunks": 0, "potable": 0, "non_potable": 0,
+            "drinking_safe": 0, "agriculture_safe": 0, "industry_safe": 0,
+            "predict_seconds": 0.0, "rows_per_second": 0.0, "reused_rows": 0}
+
+
+def update_summary(summary, scored, stats=None):
+    potable = int(np.sum(scored['Potability Prediction'] == 1))
+    if stats:
+        summary["predict_seconds"] += stats["seconds"]
+        rows = summary["rows"] + len(scored)
+        summary["rows_per_second"] = rows / summary["predict_seconds"] if summary["predict_seconds"] else 0.0
+        summary["reused_rows"] = summary.get("reused_rows", 0) + stats.get("reused_rows", 0)
+    summary["rows"] += len(scored)
+    summary["chunks"] += 1
+    summary["potable"] += potable
+    summary["non_potable"] += len(scored) - potable
+    summary["drinking_safe"] += int(scored['Drinking Safe'].sum())
+    summary["agriculture_safe"] += int(scored['Agriculture Safe'].sum())
+    summary["industry_safe"] += int(scored['Industry Safe'].sum())
+    return summary
+
+
+def _read_fraction(source, size):
+    # Parser position in the upload, used as a progress estimate
+    try:
+        return min(source.tell() / size, 1.0) if size else None
+    except (AttributeError, OSError, ValueError):
+        return None
+
+
+def new_result_path(results_dir=RESULTS_DIR):
+    os.makedirs(results_dir, exist_ok=True)
+    return os.path.join(results_dir, f"{uuid.uuid4().hex}.parquet")
+
+
+def cleanup_results(results_dir=RESULTS_DIR, max_age=RESULTS_MAX_AGE):
+    if not os.path.isdir(results_dir):
+        return
+    cutoff = time.time() - max_age
+    for name in os.listdir(results_dir):
+        path = os.path.join(results_dir, name)
+        try:
+            if os.path.isfile(path) and os.path.getmtime(path) < cutoff:
+                os.remove(path)
+        except OSError:
+            pass
+
+
+def empty_result_frame():
+    columns = {c: pd.Series(dtype=schema.DTYPES[c]) for c in FEATURES}
+    columns.update({c: pd.Series(dtype="float64") for c in PREDICTION_COLUMNS})
+    columns.update({c: pd.Series(dtype="bool") for c in USAGE_COLUMNS})
+    return pd.DataFrame(columns)
+
+
+def read_chunks(source, chunk_rows=CHUNK_ROWS, input_format="csv"):
+    # Only the feature columns are parsed; a file without them fails on its header
+    if input_format == "parquet":
+        yield from schema.iter_parquet(source, chunk_rows, FEATURES, FEATURES)
+    else:
+        yield from schema.iter_csv(source, chunk_rows, FEATURES, FEATURES)
+
+
+def iter_scored(chunks, artifact, summary=None, profile=None, predict=predict_parallel, keep_names=False):
+    # Scores chunk by chunk, accumulating counts into ``summary`` as it goes
+    for chunk in chunks:
+        stats = {}
+        scored = score_frame(artifact, chunk, stats, profile, predict, keep_names)
+        if summary is not None:
+            update_summary(summary, scored, stats)
+        yield scored
+
+
+def score_stream(source, artifact, out_path=None, chunk_rows=CHUNK_ROWS, progress=None, size=None,
+                 input_format="csv", profile=None, predict=predict_parallel):
+    """Score a CSV or Parquet path or file object chunk by chunk into a Parquet file.
+
+    ``progress(summary, fraction)`` is called after every chunk; ``fraction`` is the share of
+    the input consumed so far, or None when it cannot be estimated.
+    Returns ``(out_path, summary)``.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    out_path = out_path or new_result_path()
+    if size is None and isinstance(source, (str, os.PathLike)):
+        size = os.path.getsize(source)
+
+    summary = empty_summary()
+    tmp_path = out_path + ".tmp"
+    writer = None
+    try:
+        chunks = read_chunks(source, chunk_rows, input_format)
+        for scored in iter_scored(chunks, artifact, summary, profile, predict):
+            table = pa.Table.from_pandas(scored, preserve_index=False)
+            if writer is None:
+                writer = pq.ParquetWriter(tmp_path, table.schema)
+            writer.write_table(table)
+            if progress is not None:
+                progress(summary, _read_fraction(source, size))
+    except BaseException:
+        if writer is not None:
+            writer.close()
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    if writer is None:
+        # Header-only upload: still produce an (empty) result file
+        pq.write_table(pa.Table.from_pandas(empty_result_frame(), preserve_index=False), tmp_path)
+    else:
+        writer.close()
+    os.replace(tmp_path, out_path)
+    return out_path, summary
+
+
+def read_preview(path, rows=1000):
+    import pyarrow.parquet as pq
+
+    parquet_file = pq.ParquetFile(path)
+    for batch in parquet_file.iter_batches(batch_size=rows):
+        return batch.to_pandas()
+    return parquet_file.schema_arrow.empty_table().to_pandas()
@@ -0,0 +1,107 @@
+import itertools
+
+import pandas as pd
+from flask import Flask, Response, jsonify, request, stream_with_context
+
+import export
+import jobs
+import model_registry
+import rules
+import scoring
+
+# Lightweight HTTP scoring service sharing the app's preprocessing, model and usage rules.
+#   GET  /health  model version currently served
+#   POST /score   JSON records (a list or {"records": [...]}) or a CSV body; ?profile= picks the rules
+#   GET  /jobs/<job_id>/export   results of a finished upload job, streamed as
+#                 ?format=csv|parquet|arrow&columns=a,b&compression=...
+
+
+def _missing_columns(e):
+    return jsonify(error="missing_columns", missing=sorted(e.missing)), 400
+
+
+def _invalid_input(e):
+    return jsonify(error="invalid_input", message=str(e)), 400
+
+
+def _score_json(artifact, profile):
+    payload = request.get_json(silent=True)
+    records = payload.get("records") if isinstance(payload, dict) else payload
+    if not isinstance(records, list):
+        return jsonify(error="expected a list of records or {\"records\": [...]}"), 400
+
+    if not records:
+        # An empty batch is a valid request with an empty result, not a missing-columns error
+        return Response(scoring.empty_result_frame().to_json(orient="records"), mimetype="application/json")
+    df = pd.DataFrame.from_records(records)
+    try:
+        scored = scoring.score_frame(artifact, df, profile=profile, keep_names=True)
+    except scoring.MissingColumnsError as e:
+        return _missing_columns(e)
+    except scoring.InvalidInputError as e:
+        return _invalid_input(e)
+    return Response(scored.to_json(orient="records"), mimetype="application/json")
+
+
+def _score_csv(artifact, profile):
+    # The body is parsed and scored chunk by chunk and the CSV response is streamed back. The
+    # first chunk is scored before the response starts, so a bad header or bad values in it are
+    # a 400; a bad value further down can only end the stream early.
+    scored = scoring.iter_scored(scoring.read_chunks(request.stream), artifact, profile=profile, keep_names=True)
+    try:
+        first = next(scored, None)
+    except scoring.MissingColumnsError as e:
+        return _missing_columns(e)
+    except scoring.InvalidInputError as e:
+        return _invalid_input(e)
+
+    def generate():
+        if first is None:
+            yield scoring.empty_result_frame().to_csv(index=False)
+            return
+        for i, frame in enumerate(itertools.chain([first], scored)):
+            yield frame.to_csv(index=False, header=(i == 0))
+
+    # The rest of the body is read while streaming, so the request context must stay open
+    return Response(stream_with_context(generate()), mimetype="text/csv")
+
+
+def create_app():
+    app = Flask(__name__)
+
+    @app.get("/health")
+    def health():
+        return jsonify(status="ok", model_version=model_registry.get_artifact()["version"])
+
+    @app.post("/score")
+    def score():
+        artifact = model_registry.get_artifact()
+        profile = request.args.get("profile")
+        if profile and profile not in rules.profiles():
+            return jsonify(error=f"unknown rules profile {profile!r}"), 400
+        if request.mimetype == "application/json":
+            return _score_json(artifact, profile)
+        if request.mimetype in ("text/csv", "application/csv"):
+            return _score_csv(artifact, profile)
+        return jsonify(error="send application/json or text/csv"), 415
+
+    @app.get("/jobs/<job_id>/export")
+    def export_job(job_id):
+        job = jobs.status(job_id)
+        if job is None or job["state"] != jobs.DONE:
+            return jsonify(error="no finished job with this id"), 404
+        fmt = request.args.get("format", "csv")
+        compression = request.args.get("compression")
+        columns = [c for c in request.args.get("columns", "").split(",") if c] or None
+        try:
+            chunks = export.iter_export(job["result_path"], fmt, columns, compression)
+            # The first chunk validates the options before any response headers are sent
+            first = next(chunks, b"")
+        except ValueError as e:
+            return jsonify(error=str(e)), 400
+        name = export.file_name(f"water_predictions_{job_id}", fmt, compression)
+        return Response(stream_with_context(itertools.chain([first], chunks)),
+                        mimetype=export.mime_type(fmt, compression),
+                        headers={"Content-Disposition": f"attachment; filename={name}"})
+
+    return app
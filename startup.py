@@ -0,0 +1,162 @@
+"""Cold-start instrumentation and pre-warming.
+
+    python startup.py report            # -X importtime breakdown of the app's modules
+    python startup.py prewarm           # publish the dataset, map the model, compile bytecode
+
+The login screen only needs Streamlit, SQLite and bcrypt; everything heavier (pandas plotting,
+sklearn, joblib, the model, chartmogul) is imported where it is first used. ``prewarm`` is meant
+for the deploy's pre-traffic step: it does the once-per-host work (publishing the shared dataset
+file, pulling the model into the page cache, writing .pyc files) so the first real session
+does not pay for it.
+"""
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# Imported by the first logged-in rerun, in the order a session needs them
+HEAVY_MODULES = ["pandas", "plotly.express", "plotly.graph_objects", "matplotlib.figure",
+                 "sklearn.pipeline", "sklearn.preprocessing", "joblib", "pyarrow.parquet"]
+APP_MODULES = ["auth", "user_store", "outbox", "profiler", "dataset", "stats", "charts", "rules", "schema",
+               "model_registry", "inference", "scoring", "jobs"]
+# What app.py imports before the login screen's st.stop(); none of them may pull in a heavy module
+LOGIN_MODULES = ["startup", "user_store", "outbox", "auth", "profiler"]
+HEAVY_ROOTS = ["numpy", "pandas", "pyarrow", "sklearn", "scipy", "joblib", "plotly", "matplotlib", "xgboost",
+               "chartmogul"]
+
+# Imported as early as possible by app.py, so this approximates when the script first ran
+FIRST_IMPORT = time.time()
+
+_lock = threading.Lock()
+_state = {"first_render": None, "prewarm": None}
+_prewarm_thread = None
+
+
+def mark_first_render(page):
+    # Seconds from this module's first import to the end of the process's first rerun
+    with _lock:
+        if _state["first_render"] is None:
+            _state["first_render"] = {"page": page, "seconds": time.time() - FIRST_IMPORT}
+
+
+def import_report(modules=None, top=25):
+    """Cumulative and self import times (ms) of ``modules`` in a fresh interpreter."""
+    modules = modules or APP_MODULES + HEAVY_MODULES
+    code = "; ".join(f"import {m}" for m in modules)
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=ROOT,
+                            capture_output=True, text=True)
+    total = time.perf_counter() - start
+    rows = []
+    for line in result.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        rows.append({"module": name.strip(), "self ms": int(self_us) / 1000, "cumulative ms": int(cumulative_us) / 1000})
+    rows.sort(key=lambda row: row["cumulative ms"], reverse=True)
+    return {"interpreter_seconds": total, "ok": result.returncode == 0, "modules": rows[:top],
+            "error": result.stderr.strip().splitlines()[-1] if result.returncode else None}
+
+
+def login_imports():
+    """Heavy modules the login path imports beyond what Streamlit itself loads (should be none)."""
+    code = ("import sys, json, streamlit; before = set(sys.modules); "
+            + "; ".join(f"import {m}" for m in LOGIN_MODULES)
+            + f"; print(json.dumps(sorted({{m.split('.')[0] for m in set(sys.modules) - before}} & {set(HEAVY_ROOTS)!r})))")
+    result = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True)
+    if result.returncode:
+        return {"ok": False, "heavy": None, "error": result.stderr.strip().splitlines()[-1]}
+    heavy = json.loads(result.stdout.strip().splitlines()[-1])
+    return {"ok": not heavy, "heavy": heavy, "error": None}
+
+
+def prewarm(imports=True, dataset=True, model=True, bytecode=False):
+    """Do startup work ahead of traffic; returns seconds per step."""
+    steps = {}
+
+    def step(name, func):
+        start = time.perf_counter()
+        try:
+            func()
+        except Exception as e:  # a missing optional file must not fail the deploy
+            steps[name] = {"error": str(e) or type(e).__name__}
+        else:
+            steps[name] = {"seconds": time.perf_counter() - start}
+
+    if bytecode:
+        import compileall
+
+        step("bytecode", lambda: compileall.compile_dir(ROOT, quiet=1, maxlevels=2))
+    if imports:
+        import importlib
+
+        step("imports", lambda: [importlib.import_module(m) for m in HEAVY_MODULES + APP_MODULES])
+    if dataset:
+        def load_dataset():
+            import dataset as dataset_module
+
+            dataset_module.load_dataset()
+
+        step("dataset", load_dataset)
+    if model:
+        def load_model():
+            import model_registry
+            import pipeline
+
+            artifact = model_registry.get_artifact()
+            # Compiles the fused transform and touches every model page once
+            pipeline.predict(artifact, _sample_frame(artifact))
+
+        step("model", load_model)
+    with _lock:
+        _state["prewarm"] = steps
+    return steps
+
+
+def _sample_frame(artifact):
+    import pandas as pd
+
+    from schema import canonical
+
+    return pd.DataFrame([[7.0] * len(artifact["features"])], columns=[canonical(f) for f in artifact["features"]])
+
+
+def prewarm_in_background():
+    # Called after login: heavy imports and the model load overlap with the user's first clicks
+    global _prewarm_thread
+    with _lock:
+        if _prewarm_thread is None:
+            _prewarm_thread = threading.Thread(target=prewarm, kwargs={"dataset": False}, name="prewarm",
+                                               daemon=True)
+            _prewarm_thread.start()
+    return _prewarm_thread
+
+
+def snapshot():
+    with _lock:
+        return {"first_render": _state["first_render"], "prewarm": _state["prewarm"]}
+
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else "report"
+    if command == "report":
+        report = import_report()
+        print(f"{'module':50s} {'cumulative ms':>14s} {'self ms':>10s}")
+        for row in report["modules"]:
+            print(f"{row['module']:50s} {row['cumulative ms']:14.1f} {row['self ms']:10.1f}")
+        print(f"interpreter start + imports: {report['interpreter_seconds'] * 1000:.0f} ms")
+        if not report["ok"]:
+            sys.exit(report["error"])
+        login = login_imports()
+        if not login["ok"]:
+            sys.exit(f"The login path imports heavy modules: {login['heavy'] or login['error']}")
+        print("login path: no heavy imports")
+    elif command == "prewarm":
+        print(json.dumps(prewarm(bytecode=True), indent=2))
+    else:
+        sys.exit("usage: python startup.py [report|prewarm]")
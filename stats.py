@@ -0,0 +1,76 @@
+import os
+import threading
+
+import numpy as np
+
+# Precomputed per-attribute statistics and fixed-bin histograms. They are built with NumPy once
+# per dataset version, and charts are drawn from the binned counts only, so neither rerun CPU nor
+# the payload sent to the browser grows with the number of rows.
+BINS = int(os.environ.get("WATER_HISTOGRAM_BINS", 40))
+
+_lock = threading.Lock()
+_cache = {}
+_value_counts = {}
+
+
+def _column_stats(values, bins):
+    values = np.asarray(values, dtype=np.float64)
+    finite = values[np.isfinite(values)]
+    if not len(finite):
+        return {"count": 0, "missing": int(len(values)), "mean": np.nan, "min": np.nan, "max": np.nan,
+                "counts": [], "edges": []}
+    counts, edges = np.histogram(finite, bins=bins)
+    return {
+        "count": int(len(finite)),
+        "missing": int(len(values) - len(finite)),
+        "mean": float(finite.mean()),
+        "min": float(finite.min()),
+        "max": float(finite.max()),
+        "counts": counts.tolist(),
+        "edges": edges.tolist(),
+    }
+
+
+def attribute_stats(df, version, columns, bins=BINS):
+    """{column: {count, missing, mean, min, max, counts, edges}} for ``df``, computed once per
+    ``version`` (e.g. dataset.dataset_version()). Only the latest version is kept."""
+    key = (tuple(columns), bins)
+    cached = _cache.get(key)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+    with _lock:
+        cached = _cache.get(key)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        result = {column: _column_stats(df[column].to_numpy(), bins) for column in columns}
+        _cache[key] = (version, result)
+        return result
+
+
+def value_counts(df, version, column):
+    """{value: rows} of ``column`` (zero counts dropped), computed once per ``version``."""
+    cached = _value_counts.get(column)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+    with _lock:
+        cached = _value_counts.get(column)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        counts = df[column].value_counts()
+        result = {key: int(count) for key, count in counts.items() if count > 0}
+        _value_counts[column] = (version, result)
+        return result
+
+
+def histogram_figure(column_stats, title, color, x_title=None):
+    import plotly.graph_objects as go
+
+    edges = np.asarray(column_stats["edges"])
+    fig = go.Figure(go.Bar(
+        x=(edges[:-1] + edges[1:]) / 2 if len(edges) else [],
+        y=column_stats["counts"],
+        width=np.diff(edges) if len(edges) else None,
+        marker_color=color,
+    ))
+    fig.update_layout(title=title, bargap=0, xaxis_title=x_title, yaxis_title="count")
+    return fig
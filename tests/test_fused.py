@@ -0,0 +1,53 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("sklearn")
+
+import fused
+import pipeline
+
+# Typical magnitudes of each measurement in water_potability.csv, in FEATURES order
+MEANS = [7.0, 196.0, 22000.0, 7.1, 333.0, 426.0, 14.3, 66.4, 4.0]
+SPREADS = [1.6, 33.0, 8800.0, 1.6, 41.0, 81.0, 3.3, 16.0, 0.8]
+
+
+def _measurements(rows, seed):
+    rng = np.random.default_rng(seed)
+    return np.asarray(MEANS) + np.asarray(SPREADS) * rng.standard_normal((rows, len(MEANS)))
+
+
+@pytest.fixture(scope="module")
+def preprocessor():
+    return pipeline.build_preprocessor().fit(_measurements(2000, seed=0))
+
+
+def test_compiles_the_shipped_pipeline(preprocessor):
+    params = fused.compile_preprocessor(preprocessor)
+    assert params is not None
+    assert params["n_features"] == len(pipeline.FEATURES)
+    assert params["n_output"] == preprocessor.transform(_measurements(1, seed=1)).shape[1]
+
+
+@pytest.mark.parametrize("block_rows", [fused.BLOCK_ROWS, 64, 1])
+def test_transform_matches_sklearn(preprocessor, block_rows):
+    # The fused path is given float32 input, so both sides see the same float32 values
+    X = _measurements(1000, seed=2).astype(np.float32)
+    expected = preprocessor.transform(X.astype(np.float64))
+    actual = fused.transform(X, fused.compile_preprocessor(preprocessor), block_rows=block_rows)
+    assert actual.dtype == np.float32
+    np.testing.assert_allclose(actual, expected, rtol=1e-4, atol=1e-4)
+
+
+def test_transform_into_slice(preprocessor):
+    params = fused.compile_preprocessor(preprocessor)
+    X = _measurements(300, seed=3).astype(np.float32)
+    out = np.full((500, params["n_output"]), np.nan, dtype=np.float32)
+    fused.transform(X, params, out=out[100:400])
+    np.testing.assert_allclose(out[100:400], preprocessor.transform(X.astype(np.float64)), rtol=1e-4, atol=1e-4)
+    assert np.isnan(out[:100]).all() and np.isnan(out[400:]).all()
+
+
+def test_other_preprocessors_fall_back():
+    from sklearn.preprocessing import StandardScaler
+
+    assert fused.compile_preprocessor(StandardScaler().fit(_measurements(10, seed=4))) is None
@@ -0,0 +1,35 @@
+import threading
+import time
+
+import pytest
+
+pytest.importorskip("numpy")
+
+import inference
+
+
+def test_a_lone_request_is_not_held_back():
+    batcher = inference.MicroBatcher(max_wait=5.0)
+    batcher._queue.put("a")
+    start = time.perf_counter()
+    assert batcher._collect() == ["a"]
+    assert time.perf_counter() - start < 1.0
+
+
+def test_queued_requests_wait_for_more_to_join():
+    batcher = inference.MicroBatcher(max_wait=5.0, max_batch=4)
+    batcher._queue.put("a")
+    batcher._queue.put("b")
+    threading.Timer(0.05, batcher._queue.put, args=("c",)).start()
+    threading.Timer(0.1, batcher._queue.put, args=("d",)).start()
+    start = time.perf_counter()
+    # Full at max_batch, long before max_wait
+    assert batcher._collect() == ["a", "b", "c", "d"]
+    assert time.perf_counter() - start < 1.0
+
+
+def test_a_batch_stops_waiting_after_max_wait():
+    batcher = inference.MicroBatcher(max_wait=0.05)
+    batcher._queue.put("a")
+    batcher._queue.put("b")
+    assert batcher._collect() == ["a", "b"]
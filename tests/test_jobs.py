@@ -0,0 +1,27 @@
+import sys
+import time
+import types
+
+import pytest
+
+pytest.importorskip("numpy")
+pytest.importorskip("pandas")
+
+import jobs
+
+
+def test_workers_do_not_rerun_the_page_script(tmp_path, monkeypatch):
+    # Streamlit runs each page script as __main__; a spawned worker must not execute it again
+    script = tmp_path / "page.py"
+    marker = tmp_path / "ran"
+    script.write_text(f"open({str(marker)!r}, 'w').close()\n")
+    page = types.ModuleType("__main__")
+    page.__file__ = str(script)
+    monkeypatch.setitem(sys.modules, "__main__", page)
+
+    process = jobs._SpawnContext().Process(target=time.sleep, args=(0,))
+    process.start()
+    process.join(60)
+    assert process.exitcode == 0
+    assert not marker.exists()
+    assert sys.modules["__main__"] is page
@@ -0,0 +1,83 @@
+import time
+
+import pytest
+
+import outbox
+import user_store
+
+
+class FailingClient:
+    def send(self, records):
+        return {record["external_id"]: "unavailable" for record in records}
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    monkeypatch.setattr(user_store, "_pool", user_store.ConnectionPool(str(tmp_path / "users.db")))
+    monkeypatch.setattr(user_store, "_migrated", False)
+    yield
+    user_store._pool.close()
+
+
+def add(username):
+    with user_store.transaction() as cursor:
+        outbox.enqueue(cursor, outbox.customer_record(username, username.title(), f"{username}@example.com"))
+
+
+def rows():
+    with user_store.transaction() as cursor:
+        return cursor.execute("SELECT external_id, status, attempts, next_attempt_at FROM customer_outbox "
+                              "ORDER BY id").fetchall()
+
+
+def make_due():
+    with user_store.transaction() as cursor:
+        cursor.execute("UPDATE customer_outbox SET next_attempt_at = 0")
+
+
+def test_backoff_doubles_up_to_the_cap(monkeypatch):
+    monkeypatch.setattr(outbox, "BACKOFF_BASE", 2.0)
+    monkeypatch.setattr(outbox, "BACKOFF_MAX", 10.0)
+    for attempts, full in [(1, 2.0), (2, 4.0), (3, 8.0), (4, 10.0), (20, 10.0)]:
+        for _ in range(20):
+            assert full * 0.5 <= outbox.backoff(attempts) <= full
+
+
+def test_claimed_rows_are_leased_until_the_lease_expires(store):
+    add("alice")
+    add("alice")  # enqueued twice, stored once
+    before = time.time()
+    assert [row[1] for row in outbox._claim(10)] == ["alice"]
+    [(_, status, attempts, next_attempt_at)] = rows()
+    assert (status, attempts) == (outbox.IN_FLIGHT, 0)
+    assert next_attempt_at >= before + outbox.LEASE_SECONDS
+    # Another dispatcher finds nothing while the lease holds
+    assert outbox._claim(10) == []
+    # A crashed dispatcher's lease runs out and the row is due again
+    make_due()
+    assert [row[1] for row in outbox._claim(10)] == ["alice"]
+
+
+def test_failed_sends_back_off_then_go_dead(store, monkeypatch):
+    monkeypatch.setattr(outbox, "MAX_ATTEMPTS", 3)
+    add("bob")
+    before = time.time()
+    assert outbox.dispatch_once(FailingClient()) == 1
+    [(_, status, attempts, next_attempt_at)] = rows()
+    assert (status, attempts) == (outbox.PENDING, 1)
+    assert before + outbox.BACKOFF_BASE * 0.5 <= next_attempt_at <= time.time() + outbox.BACKOFF_BASE
+    # Not due again until the backoff has passed
+    assert outbox.dispatch_once(FailingClient()) == 0
+
+    for _ in range(2):
+        make_due()
+        assert outbox.dispatch_once(FailingClient()) == 1
+    assert rows()[0][1:3] == (outbox.DEAD, 3)
+    make_due()
+    assert outbox.dispatch_once(FailingClient()) == 0
+
+    assert outbox.requeue_dead() == 1
+    client = outbox.LocalCustomerClient()
+    assert outbox.dispatch_once(client) == 1
+    assert rows()[0][1] == outbox.SENT
+    assert list(client.customers) == ["bob"]
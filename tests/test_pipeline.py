@@ -0,0 +1,75 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+pd = pytest.importorskip("pandas")
+pytest.importorskip("sklearn")
+
+import fused
+import pipeline
+import scoring
+from benchmarks.synthetic import generate
+
+
+@pytest.fixture(scope="module")
+def artifact():
+    # generate() leaves ph, Sulfate and Trihalomethanes missing at the real dataset's rates
+    from sklearn.linear_model import LogisticRegression
+
+    train_df = generate(2000, seed=0)
+    preprocessor = pipeline.fit_preprocessor(train_df)
+    model = LogisticRegression(max_iter=1000).fit(preprocessor.transform(pipeline.feature_matrix(train_df)),
+                                                  train_df['Potability'])
+    return pipeline.build_artifact(model, preprocessor, version="test")
+
+
+def test_fits_on_missing_values(artifact):
+    X = pipeline.feature_matrix(generate(500, seed=1))
+    assert np.isnan(X).any()
+    assert not np.isnan(artifact["preprocessor"].transform(X)).any()
+
+
+def test_fused_and_sklearn_agree_on_missing_values(artifact, monkeypatch):
+    df = generate(500, seed=2)
+    fused_labels, fused_probabilities = pipeline.predict(artifact, df)
+    monkeypatch.setattr(fused, "ENABLED", False)
+    sklearn_labels, sklearn_probabilities = pipeline.predict(artifact, df)
+    np.testing.assert_array_equal(fused_labels, sklearn_labels)
+    np.testing.assert_allclose(fused_probabilities, sklearn_probabilities, atol=fused.TOLERANCE)
+
+
+def test_verify_covers_missing_values(artifact):
+    assert fused.verify(artifact["preprocessor"], artifact["model"])["ok"]
+
+
+def test_score_frame_with_missing_values(artifact):
+    df = generate(500, seed=3)
+    scored = scoring.score_frame(artifact, df.drop(columns=['Potability']))
+    assert len(scored) == len(df)
+    assert not scored['Probability of Potable'].isna().any()
+    # Missing measurements stay missing in the output and never satisfy a usage rule
+    missing_ph = df['ph'].isna().to_numpy()
+    assert scored['ph'].isna().to_numpy().tolist() == missing_ph.tolist()
+    assert not scored['Drinking Safe'][missing_ph].any()
+
+
+def test_score_frame_keeps_the_callers_values(artifact):
+    df = generate(50, seed=6).drop(columns=['Potability']).round(2)
+    df.loc[0, 'ph'] = 7.1
+    before = df.copy()
+    scored = scoring.score_frame(artifact, df)
+    # The model gets a float32 copy; the output and the caller's frame keep the exact values
+    assert scored.loc[0, 'ph'] == 7.1
+    pd.testing.assert_frame_equal(scored[pipeline.FEATURES], before[pipeline.FEATURES], check_dtype=False)
+    pd.testing.assert_frame_equal(df, before)
+
+
+def test_missing_values_without_an_imputer_fail_on_both_paths():
+    from sklearn.pipeline import Pipeline
+
+    full = pipeline.build_preprocessor().fit(pipeline.feature_matrix(generate(200, seed=4)))
+    preprocessor = Pipeline(full.steps[1:])
+    X = pipeline.feature_matrix(generate(200, seed=5)).astype(np.float32)
+    with pytest.raises(ValueError):
+        fused.transform(X, fused.compile_preprocessor(preprocessor))
+    with pytest.raises(ValueError):
+        preprocessor.transform(X.astype(np.float64))
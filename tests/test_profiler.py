@@ -0,0 +1,19 @@
+import pytest
+
+import profiler
+
+
+class StopException(Exception):
+    # Stands in for Streamlit's st.stop()/st.rerun() exceptions
+    pass
+
+
+def test_rerun_ended_by_an_exception_is_recorded():
+    profiler.start_rerun("test login", profile=True)
+    with pytest.raises(StopException):
+        with profiler.finishing_rerun():
+            raise StopException()
+    assert profiler.snapshot()["test login"]["rerun"]["count"] == 1
+    assert "test login" in profiler._last_profile
+    # Nothing is left running for the next rerun on this thread
+    assert profiler._local.current is None
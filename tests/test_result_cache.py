@@ -0,0 +1,83 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("pandas")
+pytest.importorskip("sklearn")
+
+import pipeline
+import result_cache
+from benchmarks.synthetic import generate
+from parallel import predict_parallel
+
+
+@pytest.fixture(scope="module")
+def artifact():
+    from sklearn.linear_model import LogisticRegression
+
+    train_df = generate(1000, seed=0)
+    preprocessor = pipeline.fit_preprocessor(train_df)
+    model = LogisticRegression(max_iter=1000).fit(preprocessor.transform(pipeline.feature_matrix(train_df)),
+                                                  train_df['Potability'])
+    return pipeline.build_artifact(model, preprocessor, version="test")
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(result_cache, "CACHE_DIR", str(tmp_path / "cache"))
+    model_path = tmp_path / "model.pkl"
+    model_path.write_bytes(b"model")
+    return str(model_path)
+
+
+def test_row_hashes_follow_values_not_position():
+    df = generate(100, seed=1)
+    hashes = result_cache.row_hashes(df)
+    assert len(np.unique(hashes)) == len(df)
+    # Same rows under another index (and with extra columns) hash the same
+    shuffled = df.sample(frac=1, random_state=0).assign(Extra=1)
+    np.testing.assert_array_equal(np.sort(result_cache.row_hashes(shuffled)), np.sort(hashes))
+    edited = df.copy()
+    edited.loc[0, 'Hardness'] += 1
+    assert (result_cache.row_hashes(edited) != hashes).tolist() == [True] + [False] * (len(df) - 1)
+
+
+def test_edited_upload_reuses_scored_rows(artifact, cache, tmp_path):
+    df = generate(500, seed=2).drop(columns=['Potability'])
+    first = result_cache.RowPredictor(cache, str(tmp_path))
+    labels, probabilities, stats = first(artifact, df)
+    assert stats["reused_rows"] == 0
+    result_path = tmp_path / "result.parquet"
+    result_path.write_bytes(b"result")
+    result_cache.put("first", str(result_path), {}, cache, "test", rows=first.rows())
+
+    edited = df.copy()
+    edited.loc[:9, 'Solids'] += 1.0
+    second = result_cache.RowPredictor(cache, str(tmp_path))
+    labels, probabilities, stats = second(artifact, edited)
+    assert stats["reused_rows"] == len(df) - 10
+    expected_labels, expected_probabilities, _ = predict_parallel(artifact, edited)
+    np.testing.assert_array_equal(labels, expected_labels)
+    np.testing.assert_allclose(probabilities, expected_probabilities)
+    # Every row of the new upload is recorded for the next one
+    assert len(second.rows()["hashes"]) == len(df)
+
+
+def test_rows_from_another_model_are_not_reused(artifact, cache, tmp_path):
+    df = generate(200, seed=3).drop(columns=['Potability'])
+    first = result_cache.RowPredictor(cache, str(tmp_path))
+    first(artifact, df)
+    result_path = tmp_path / "result.parquet"
+    result_path.write_bytes(b"result")
+    result_cache.put("first", str(result_path), {}, cache, "test", rows=first.rows())
+
+    with open(cache, "ab") as f:
+        f.write(b" retrained")
+    assert result_cache.RowPredictor(cache, str(tmp_path))(artifact, df)[2]["reused_rows"] == 0
+
+
+def test_uploads_over_the_limit_are_scored_but_not_recorded(artifact, cache, tmp_path):
+    df = generate(200, seed=4).drop(columns=['Potability'])
+    predictor = result_cache.RowPredictor(cache, str(tmp_path), limit=100)
+    labels, _, _ = predictor(artifact, df)
+    assert len(labels) == len(df)
+    assert predictor.rows() is None
@@ -0,0 +1,67 @@
+import itertools
+import math
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+import rules
+
+
+# The thresholds as app.py and the Upload File page hard-coded them before rules.json, one row at
+# a time; the other profiles are the default with the overrides their descriptions document.
+def _baseline(ph_high=8.5, sulfate=400, conductivity=3000):
+    return {
+        "drinking": lambda r: r['Potability'] == 1,
+        "agriculture": lambda r: 6.5 <= r['ph'] <= 8.5 and r['Hardness'] <= 300,
+        "drinking_safe": lambda r: (6.5 <= r['ph'] <= ph_high) and r['Potability'] == 1,
+        "agriculture_safe": lambda r: r['ph'] >= 6.0 and r['Sulfate'] <= sulfate and r['Conductivity'] <= conductivity,
+        "industry_safe": lambda r: r['Hardness'] <= 500 and r['Conductivity'] <= 5000,
+    }
+
+
+BASELINE = {
+    "default": _baseline(),
+    "eu": _baseline(ph_high=9.5),
+    "arid": _baseline(sulfate=250, conductivity=2000),
+}
+
+# Values on, just inside and just outside every threshold, plus missing values
+GRID = {
+    "ph": [math.nan, 5.9, 6.0, 6.4, 6.5, 7.0, 8.5, 8.6, 9.5, 9.6],
+    "Hardness": [math.nan, 299, 300, 301, 500, 501],
+    "Sulfate": [math.nan, 249, 250, 251, 400, 401],
+    "Conductivity": [math.nan, 1999, 2000, 2001, 3000, 3001, 5000, 5001],
+    "Potability": [math.nan, 0, 1],
+}
+
+
+def _rows():
+    return [dict(zip(GRID, values)) for values in itertools.product(*GRID.values())]
+
+
+def test_profiles_are_covered():
+    assert set(rules.profiles()) == set(BASELINE)
+
+
+@pytest.mark.parametrize("profile", sorted(BASELINE))
+def test_evaluate_matches_baseline(profile):
+    rows = _rows()
+    data = {column: np.array([row[column] for row in rows]) for column in GRID}
+    masks = rules.evaluate(data, list(BASELINE[profile]), profile=profile)
+    for name, baseline in BASELINE[profile].items():
+        expected = np.array([bool(baseline(row)) for row in rows])
+        mismatches = np.flatnonzero(masks[name] != expected)
+        assert not len(mismatches), f"{profile}/{name} differs on {rows[mismatches[0]]}"
+
+
+@pytest.mark.parametrize("profile", sorted(BASELINE))
+def test_evaluate_one_sample(profile):
+    # One sample as dataset.py's helpers pass it, with a scored upload's column names
+    # (scoring.RULE_COLUMNS) mapped back to the rules' names
+    columns = {"Potability": "Potability Prediction"}
+    for row in _rows()[::37]:
+        sample = {columns.get(column, column): value for column, value in row.items()}
+        masks = rules.evaluate(sample, list(BASELINE[profile]), profile=profile, columns=columns)
+        for name, baseline in BASELINE[profile].items():
+            assert bool(masks[name]) == bool(baseline(row)), f"{profile}/{name} differs on {row}"
@@ -0,0 +1,50 @@
+import io
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("pandas")
+pytest.importorskip("pyarrow")
+
+import schema
+
+HEADER = "PH,hardness,TDS,Chloramines,sulfate,Conductivity,Total organic carbon,THMs,Turbidity,Potability\n"
+ROWS = "7.1,200,20000,7,330,420,14,66,4,1\n,180,21000,6.5,,400,12,,3.5,0\n"
+
+
+def test_canonical_matches_spelling_variants_and_aliases():
+    assert {schema.canonical(name) for name in ["ph", "pH", "P H", "p_h"]} == {"ph"}
+    assert schema.canonical("Organic carbon") == schema.canonical("TOC") == "Organic_carbon"
+    assert schema.canonical("Total Dissolved Solids") == "Solids"
+    assert schema.canonical("Notes") == "Notes"
+
+
+def test_read_csv_uses_canonical_names_and_dtypes():
+    df = schema.read_csv(io.BytesIO((HEADER + ROWS).encode()))
+    assert list(df.columns) == schema.MEASUREMENTS + [schema.TARGET]
+    assert df.dtypes.to_dict() == {c: np.dtype(t) for c, t in schema.DTYPES.items()}
+    assert np.isnan(df.loc[1, 'ph'])
+    # The caller's spellings, for writing output back under their headers
+    assert df.attrs["source_names"]["ph"] == "PH"
+    assert df.attrs["source_names"]["Organic_carbon"] == "Total organic carbon"
+
+
+def test_iter_csv_chunks_match_read_csv():
+    data = (HEADER + ROWS * 5).encode()
+    chunks = list(schema.iter_csv(io.BytesIO(data), chunk_rows=3))
+    assert [len(chunk) for chunk in chunks] == [3, 3, 3, 1]
+    whole = schema.read_csv(io.BytesIO(data))
+    assert np.array_equal(np.concatenate([c.to_numpy() for c in chunks]), whole.to_numpy(), equal_nan=True)
+
+
+def test_missing_and_duplicate_columns_are_rejected():
+    with pytest.raises(schema.MissingColumnsError) as excinfo:
+        schema.read_csv(io.BytesIO(b"ph,Hardness\n7,200\n"))
+    assert "Solids" in excinfo.value.missing
+    with pytest.raises(schema.InvalidInputError, match="tds"):
+        schema.read_csv(io.BytesIO((HEADER.rstrip("\n") + ",tds\n").encode()))
+
+
+def test_bad_values_are_invalid_input():
+    with pytest.raises(schema.InvalidInputError):
+        schema.read_csv(io.BytesIO((HEADER + "seven" + ROWS[3:]).encode()))
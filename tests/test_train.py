@@ -0,0 +1,24 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("pandas")
+pytest.importorskip("sklearn")
+
+import pipeline
+import train
+from benchmarks.synthetic import generate
+
+
+def test_trains_on_missing_values(tmp_path):
+    # generate() leaves measurements missing at water_potability.csv's rates
+    data_path = tmp_path / "water_potability.csv"
+    generate(600, seed=0).to_csv(data_path, index=False)
+    artifact = train.train(str(data_path), "test", folds=2, jobs=1, families=["hist_gradient_boosting"],
+                           cache_dir=str(tmp_path / "cache"))
+    assert artifact["metrics"]["model"] == "hist_gradient_boosting"
+    assert 0.0 <= artifact["metrics"]["test"]["roc_auc"] <= 1.0
+
+    df = generate(50, seed=1)
+    assert df[pipeline.FEATURES].isna().any().any()
+    labels, probabilities = pipeline.predict(artifact, df)
+    assert len(labels) == len(df) and not np.isnan(probabilities).any()
@@ -0,0 +1,312 @@
+"""Train a versioned scoring artifact from labelled samples.
+
+    python train.py                                         # water_potability.csv -> models/<version>.pkl
+    python train.py history.csv --folds 5 --jobs 8 -o models/2026-10.pkl
+    python train.py --families xgboost --version 2026-10-18
+
+Features come from pipeline.build_preprocessor (median imputation, pairwise interactions +
+RobustScaler), the chain the app scores with. Every candidate in CANDIDATES is cross-validated on
+the training split, with all (candidate, fold) fits run in parallel across cores. Each fold's
+preprocessor, missing-value medians included, is fitted on that fold's training rows only; its
+transformed float32 matrices are cached as .npy files that every worker memory-maps, so they are
+built once and reused by all candidates and later runs.
+Boosted candidates (XGBoost and HistGradientBoosting alike) stop early on a stratified
+early-stopping split carved out of the fold's training rows; the fold's validation rows are only
+used for scoring, so every family is compared on rows it never saw. The best candidate by mean ROC AUC
+is refitted on the whole training split with the median number of boosting rounds its folds
+needed, scored on the held-out test split through the serving path, and saved with its metrics,
+search results and timing.
+"""
+import argparse
+import datetime
+import hashlib
+import json
+import os
+import statistics
+import sys
+import time
+
+import numpy as np
+
+import pipeline
+import schema
+
+CACHE_DIR = os.environ.get("WATER_TRAIN_CACHE_DIR", "train_cache")
+MAX_ROUNDS = 2000
+EARLY_STOPPING_ROUNDS = 50
+# Share of each fold's training rows held back to decide when boosting stops
+EARLY_STOPPING_FRACTION = 0.1
+# HistGradientBoosting grows this many rounds between early-stopping checks
+HGB_STEP = 10
+
+# (family, params); families are built by _model()
+CANDIDATES = (
+    [("xgboost", {"max_depth": depth, "learning_rate": rate, "subsample": 0.8, "colsample_bytree": 0.8})
+     for depth in (3, 5, 7) for rate in (0.03, 0.1)]
+    + [("hist_gradient_boosting", {"max_leaf_nodes": leaves, "learning_rate": rate, "l2_regularization": 1.0})
+       for leaves in (15, 31, 63) for rate in (0.05, 0.1)]
+    + [("random_forest", {"n_estimators": 300, "max_features": features, "min_samples_leaf": leaf})
+       for features in ("sqrt", 0.5) for leaf in (1, 5)]
+)
+FOLD_ARRAYS = ("X_train", "y_train", "X_valid", "y_valid")
+
+
+def _model(family, params, seed, rounds=None):
+    # rounds=None: set up for early stopping in _fit_fold; otherwise a fixed number of boosting rounds
+    if family == "xgboost":
+        from xgboost import XGBClassifier
+
+        return XGBClassifier(n_estimators=rounds or MAX_ROUNDS,
+                             early_stopping_rounds=None if rounds else EARLY_STOPPING_ROUNDS,
+                             eval_metric="logloss", tree_method="hist", n_jobs=1, random_state=seed, **params)
+    if family == "hist_gradient_boosting":
+        from sklearn.ensemble import HistGradientBoostingClassifier
+
+        # Its built-in early stopping splits off its own validation rows, so rounds are grown with
+        # warm_start instead and checked against the fold's early-stopping split
+        return HistGradientBoostingClassifier(max_iter=rounds or HGB_STEP, early_stopping=False,
+                                              warm_start=rounds is None, random_state=seed, **params)
+    if family == "random_forest":
+        from sklearn.ensemble import RandomForestClassifier
+
+        return RandomForestClassifier(n_jobs=1, random_state=seed, **params)
+    raise ValueError(f"Unknown model family {family!r}")
+
+
+def _scores(y, probabilities):
+    from sklearn.metrics import accuracy_score, log_loss, roc_auc_score
+
+    return {"roc_auc": float(roc_auc_score(y, probabilities)),
+            "accuracy": float(accuracy_score(y, probabilities >= 0.5)),
+            "log_loss": float(log_loss(y, probabilities, labels=[0, 1]))}
+
+
+def _stop_rows(train_rows):
+    return max(1, int(np.ceil(train_rows * EARLY_STOPPING_FRACTION)))
+
+
+def _fit_hgb(model, X_fit, y_fit, X_stop, y_stop, X_valid):
+    # Grows HGB_STEP rounds at a time; returns (best rounds, validation probabilities at that point)
+    from sklearn.metrics import log_loss
+
+    best_loss, best_rounds, best_probabilities = np.inf, 0, None
+    rounds = 0
+    while rounds < MAX_ROUNDS:
+        rounds += HGB_STEP
+        model.set_params(max_iter=rounds)
+        model.fit(X_fit, y_fit)
+        loss = log_loss(y_stop, model.predict_proba(X_stop)[:, 1], labels=[0, 1])
+        if loss < best_loss:
+            best_loss, best_rounds = loss, rounds
+            best_probabilities = model.predict_proba(X_valid)[:, 1]
+        elif rounds - best_rounds >= EARLY_STOPPING_ROUNDS:
+            break
+    return best_rounds, best_probabilities
+
+
+def _fit_fold(family, params, fold, seed):
+    # One (candidate, fold) fit; runs in a worker process with the fold's arrays memory-mapped.
+    # X_train is stored fit rows first and early-stopping rows last, so both are views of the map.
+    start = time.perf_counter()
+    model = _model(family, params, seed)
+    X_train, y_train = fold["X_train"], fold["y_train"]
+    fit = len(y_train) - _stop_rows(len(y_train))
+    if family == "xgboost":
+        model.fit(X_train[:fit], y_train[:fit], eval_set=[(X_train[fit:], y_train[fit:])], verbose=False)
+        rounds = int(model.best_iteration) + 1
+        # predict_proba stops at best_iteration after early stopping
+        probabilities = model.predict_proba(fold["X_valid"])[:, 1]
+    elif family == "hist_gradient_boosting":
+        rounds, probabilities = _fit_hgb(model, X_train[:fit], y_train[:fit], X_train[fit:], y_train[fit:],
+                                         fold["X_valid"])
+    else:
+        model.fit(X_train, y_train)
+        rounds = None
+        probabilities = model.predict_proba(fold["X_valid"])[:, 1]
+    result = _scores(fold["y_valid"], probabilities)
+    result.update(rounds=rounds, seconds=time.perf_counter() - start)
+    return result
+
+
+def _save(path, array):
+    tmp_path = f"{path}.{os.getpid()}.tmp.npy"
+    np.save(tmp_path, array)
+    os.replace(tmp_path, path)
+
+
+def fold_matrices(X, y, folds, seed, cache_dir=CACHE_DIR):
+    """Per-fold transformed matrices as read-only memory maps, and how many came from the cache.
+
+    A fold is keyed by the training data, the split and the preprocessor's parameters. Training
+    rows are ordered fit rows first, then a stratified early-stopping split of _stop_rows() rows.
+    """
+    from sklearn.model_selection import StratifiedKFold, train_test_split
+
+    data_digest = hashlib.sha256(np.ascontiguousarray(X).tobytes() + np.ascontiguousarray(y).tobytes()).hexdigest()
+    preprocessor_params = repr(sorted(pipeline.build_preprocessor().get_params(deep=True).items(), key=str))
+    os.makedirs(cache_dir, exist_ok=True)
+    matrices, hits = [], 0
+    splits = StratifiedKFold(n_splits=folds, shuffle=True, random_state=seed).split(X, y)
+    for index, (train_rows, valid_rows) in enumerate(splits):
+        key = hashlib.sha256(f"{data_digest}|{folds}|{seed}|{index}|{EARLY_STOPPING_FRACTION}|{preprocessor_params}|{schema.VERSION}"
+                             .encode()).hexdigest()[:32]
+        paths = {name: os.path.join(cache_dir, f"{key}.{name}.npy") for name in FOLD_ARRAYS}
+        if all(os.path.exists(path) for path in paths.values()):
+            hits += 1
+        else:
+            fit_rows, stop_rows = train_test_split(train_rows, test_size=_stop_rows(len(train_rows)),
+                                                   stratify=y[train_rows], random_state=seed)
+            train_rows = np.concatenate([fit_rows, stop_rows])
+            preprocessor = pipeline.build_preprocessor().fit(X[train_rows])
+            dtype = pipeline.input_dtype(preprocessor)
+            arrays = {
+                "X_train": pipeline.transform_matrix(preprocessor, X[train_rows].astype(dtype, copy=False)),
+                "y_train": y[train_rows],
+                "X_valid": pipeline.transform_matrix(preprocessor, X[valid_rows].astype(dtype, copy=False)),
+                "y_valid": y[valid_rows],
+            }
+            for name, array in arrays.items():
+                _save(paths[name], np.asarray(array, dtype=np.float32 if name.startswith("X") else np.int8))
+        matrices.append({name: np.load(path, mmap_mode="r") for name, path in paths.items()})
+    return matrices, hits
+
+
+def search(X, y, candidates=CANDIDATES, folds=5, jobs=-1, seed=0, cache_dir=CACHE_DIR):
+    """Cross-validate every candidate; returns per-candidate results (best first) and timing."""
+    from joblib import Parallel, delayed
+
+    start = time.perf_counter()
+    matrices, hits = fold_matrices(X, y, folds, seed, cache_dir)
+    folds_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    # Memory-mapped folds are passed to the workers by file reference, not copied
+    fits = Parallel(n_jobs=jobs)(delayed(_fit_fold)(family, params, fold, seed)
+                                 for family, params in candidates for fold in matrices)
+    search_seconds = time.perf_counter() - start
+
+    results = []
+    for number, (family, params) in enumerate(candidates):
+        fold_results = fits[number * folds:(number + 1) * folds]
+        rounds = [r["rounds"] for r in fold_results if r["rounds"] is not None]
+        results.append({
+            "family": family,
+            "params": params,
+            "roc_auc": statistics.mean(r["roc_auc"] for r in fold_results),
+            "roc_auc_std": statistics.pstdev(r["roc_auc"] for r in fold_results),
+            "accuracy": statistics.mean(r["accuracy"] for r in fold_results),
+            "log_loss": statistics.mean(r["log_loss"] for r in fold_results),
+            "rounds": int(statistics.median(rounds)) if rounds else None,
+            "fit_seconds": sum(r["seconds"] for r in fold_results),
+        })
+    results.sort(key=lambda r: r["roc_auc"], reverse=True)
+    timing = {"folds_seconds": folds_seconds, "fold_cache_hits": hits, "search_seconds": search_seconds,
+              "fits": len(fits)}
+    return results, timing
+
+
+def _versions():
+    versions = {}
+    for name in ("numpy", "sklearn", "xgboost"):
+        try:
+            versions[name] = __import__(name).__version__
+        except ImportError:
+            pass
+    return versions
+
+
+def _file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def train(data_path, version, folds=5, jobs=-1, seed=0, test_fraction=0.2, families=None, cache_dir=CACHE_DIR):
+    """Search, refit and evaluate; returns the artifact (not yet saved)."""
+    from sklearn.model_selection import train_test_split
+
+    total_start = time.perf_counter()
+    df = schema.read_csv(data_path, required=list(schema.DTYPES))
+    df = df[df[schema.TARGET].notna()].reset_index(drop=True)
+    train_df, test_df = train_test_split(df, test_size=test_fraction, stratify=df[schema.TARGET], random_state=seed)
+    X = pipeline.feature_matrix(train_df)
+    y = train_df[schema.TARGET].to_numpy(dtype=np.int8)
+
+    candidates = [c for c in CANDIDATES if families is None or c[0] in families]
+    if not candidates:
+        raise ValueError(f"No candidates in families {sorted(families)}")
+    results, timing = search(X, y, candidates, folds, jobs, seed, cache_dir)
+    best = results[0]
+
+    start = time.perf_counter()
+    preprocessor = pipeline.fit_preprocessor(train_df)
+    X_train = pipeline.transform_matrix(preprocessor, X.astype(pipeline.input_dtype(preprocessor), copy=False))
+    model = _model(best["family"], best["params"], seed, rounds=best["rounds"])
+    model.fit(X_train, y)
+    timing["refit_seconds"] = time.perf_counter() - start
+
+    artifact = pipeline.build_artifact(model, preprocessor, version)
+    # Scored exactly as the app scores: artifact -> fused transform -> predict_proba
+    _, probabilities = pipeline.predict(artifact, test_df)
+    timing["total_seconds"] = time.perf_counter() - total_start
+    artifact["metrics"] = {
+        "model": best["family"],
+        "params": best["params"],
+        "rounds": best["rounds"],
+        "cv": {name: best[name] for name in ("roc_auc", "roc_auc_std", "accuracy", "log_loss")},
+        "test": _scores(test_df[schema.TARGET].to_numpy(), probabilities[:, 1]),
+        "search": results,
+        "timing": timing,
+        "data": {"path": os.path.abspath(data_path), "sha256": _file_sha256(data_path), "rows": len(df),
+                 "train_rows": len(train_df), "test_rows": len(test_df),
+                 "potable_rate": float(df[schema.TARGET].mean())},
+        "folds": folds,
+        "seed": seed,
+        "jobs": jobs,
+        "versions": _versions(),
+    }
+    return artifact
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("data", nargs="?", default="water_potability.csv", help="labelled samples (CSV)")
+    parser.add_argument("-o", "--output", help="artifact path (default: models/water-potability-<version>.pkl)")
+    parser.add_argument("--version", help="artifact version (default: UTC timestamp)")
+    parser.add_argument("--folds", type=int, default=5)
+    parser.add_argument("--jobs", type=int, default=-1, help="parallel fits (-1: all cores)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--test-fraction", type=float, default=0.2, help="held-out rows for the final metrics")
+    parser.add_argument("--families", help="comma-separated: xgboost,hist_gradient_boosting,random_forest")
+    parser.add_argument("--cache-dir", default=CACHE_DIR, help="fold feature matrix cache")
+    args = parser.parse_args(argv)
+
+    version = args.version or datetime.datetime.now(datetime.timezone.utc).strftime("%Y%m%d-%H%M%S")
+    output = args.output or os.path.join("models", f"water-potability-{version}.pkl")
+    families = set(args.families.split(",")) if args.families else None
+    artifact = train(args.data, version, args.folds, args.jobs, args.seed, args.test_fraction, families,
+                     args.cache_dir)
+
+    if os.path.dirname(output):
+        os.makedirs(os.path.dirname(output), exist_ok=True)
+    pipeline.save_artifact(artifact, output)
+    metrics_path = os.path.splitext(output)[0] + ".json"
+    with open(metrics_path, "w") as f:
+        json.dump({"version": version, "created_at": artifact["created_at"], **artifact["metrics"]}, f, indent=2)
+
+    metrics = artifact["metrics"]
+    for result in metrics["search"]:
+        print(f"{result['family']:24s} {json.dumps(result['params']):80s} auc {result['roc_auc']:.4f} "
+              f"± {result['roc_auc_std']:.4f}  rounds {result['rounds'] or '-'}", file=sys.stderr)
+    timing = metrics["timing"]
+    print(f"Best: {metrics['model']} cv auc {metrics['cv']['roc_auc']:.4f}, test auc {metrics['test']['roc_auc']:.4f}, "
+          f"accuracy {metrics['test']['accuracy']:.4f}", file=sys.stderr)
+    print(f"{timing['fits']} fits in {timing['search_seconds']:.1f} s, folds {timing['folds_seconds']:.1f} s "
+          f"({timing['fold_cache_hits']} cached), total {timing['total_seconds']:.1f} s", file=sys.stderr)
+    print(f"Wrote {output} (version {version}) and {metrics_path}")
+
+
+if __name__ == "__main__":
+    main()
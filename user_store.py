@@ -0,0 +1,209 @@
+import os
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+import auth
+
+# User store backed by SQLite in WAL mode. Connections come from a thread-safe pool and keep
+# sqlite3's per-connection prepared-statement cache warm; the schema is migrated once per process.
+DB_PATH = os.environ.get("WATER_USERS_DB", "users.db")
+POOL_SIZE = int(os.environ.get("WATER_USERS_DB_POOL_SIZE", 8))
+BUSY_TIMEOUT = float(os.environ.get("WATER_USERS_DB_BUSY_TIMEOUT", 5.0))
+PAGE_SIZE = 500
+
+# Applied in order; PRAGMA user_version records how many have run
+MIGRATIONS = [
+    '''CREATE TABLE IF NOT EXISTS users (
+           id INTEGER PRIMARY KEY AUTOINCREMENT,
+           username TEXT UNIQUE,
+           password TEXT,
+           full_name TEXT,
+           email TEXT,
+           phone TEXT
+       )''',
+    # ChartMogul customer outbox (see outbox.py)
+    '''CREATE TABLE IF NOT EXISTS customer_outbox (
+           id INTEGER PRIMARY KEY AUTOINCREMENT,
+           external_id TEXT NOT NULL UNIQUE,
+           payload TEXT NOT NULL,
+           status TEXT NOT NULL DEFAULT 'pending',
+           attempts INTEGER NOT NULL DEFAULT 0,
+           next_attempt_at REAL NOT NULL,
+           last_error TEXT,
+           created_at REAL NOT NULL,
+           sent_at REAL
+       )''',
+    "CREATE INDEX IF NOT EXISTS customer_outbox_due ON customer_outbox (status, next_attempt_at)",
+]
+
+INSERT_USER = "INSERT INTO users (username, password, full_name, email, phone) VALUES (?, ?, ?, ?, ?)"
+SELECT_USER = "SELECT * FROM users WHERE username = ?"
+UPDATE_USER = "UPDATE users SET full_name = ?, email = ?, phone = ? WHERE username = ?"
+UPDATE_PASSWORD = "UPDATE users SET password = ? WHERE username = ?"
+IMPORT_USER = "INSERT OR IGNORE INTO users (username, password, full_name, email, phone) VALUES (?, ?, ?, ?, ?)"
+SELECT_USERS_PAGE = "SELECT id, username, full_name, email, phone FROM users WHERE id > ? ORDER BY id LIMIT ?"
+
+
+class ConnectionPool:
+    def __init__(self, path, size=POOL_SIZE, timeout=BUSY_TIMEOUT):
+        self.path = path
+        self.size = size
+        self.timeout = timeout
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=self.timeout, check_same_thread=False, cached_statements=128)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(f"PRAGMA busy_timeout={int(self.timeout * 1000)}")
+        return conn
+
+    def _acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if self._created < self.size:
+                self._created += 1
+                try:
+                    return self._connect()
+                except Exception:
+                    self._created -= 1
+                    raise
+        # Pool exhausted: wait for another thread to hand a connection back
+        return self._idle.get(timeout=self.timeout)
+
+    @contextmanager
+    def connection(self):
+        conn = self._acquire()
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+            self._idle.put(conn)
+
+    def close(self):
+        with self._lock:
+            while True:
+                try:
+                    self._idle.get_nowait().close()
+                except queue.Empty:
+                    break
+            self._created = 0
+
+
+_pool = None
+_pool_lock = threading.Lock()
+_migrate_lock = threading.Lock()
+_migrated = False
+
+
+def get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(DB_PATH)
+    return _pool
+
+
+@contextmanager
+def transaction():
+    # Commits on success, rolls back on error
+    migrate()
+    with get_pool().connection() as conn:
+        with conn:
+            yield conn.cursor()
+
+
+def migrate():
+    global _migrated
+    if _migrated:
+        return
+    with _migrate_lock:
+        if _migrated:
+            return
+        with get_pool().connection() as conn:
+            with conn:
+                conn.execute("BEGIN IMMEDIATE")
+                version = conn.execute("PRAGMA user_version").fetchone()[0]
+                for statement in MIGRATIONS[version:]:
+                    conn.execute(statement)
+                conn.execute(f"PRAGMA user_version={len(MIGRATIONS)}")
+
+                # Insert admin user if not exists
+                if conn.execute(SELECT_USER, ("admin",)).fetchone() is None:
+                    admin_password = auth.hash_password("admin123")
+                    conn.execute(INSERT_USER, ("admin", admin_password, "Administrator", "admin@example.com", "1234567890"))
+        _migrated = True
+
+
+def insert_user(cursor, username, password_hash, full_name, email, phone):
+    # For callers composing a user insert with other writes in one transaction()
+    cursor.execute(INSERT_USER, (username, password_hash, full_name, email, phone))
+
+
+def add_user(username, password_hash, full_name, email, phone):
+    with transaction() as cursor:
+        insert_user(cursor, username, password_hash, full_name, email, phone)
+
+
+def get_user(username):
+    migrate()
+    with get_pool().connection() as conn:
+        return conn.execute(SELECT_USER, (username,)).fetchone()
+
+
+def update_user(username, full_name, email, phone):
+    with transaction() as cursor:
+        cursor.execute(UPDATE_USER, (full_name, email, phone, username))
+
+
+def update_password(username, password_hash):
+    with transaction() as cursor:
+        cursor.execute(UPDATE_PASSWORD, (password_hash, username))
+
+
+def get_users_page(after_id=0, limit=PAGE_SIZE):
+    # Keyset pagination: pass the last id of the previous page as after_id
+    migrate()
+    with get_pool().connection() as conn:
+        return conn.execute(SELECT_USERS_PAGE, (after_id, limit)).fetchall()
+
+
+def get_all_users(page_size=PAGE_SIZE):
+    # Yields (username, full_name, email, phone) one page at a time instead of fetchall()
+    after_id = 0
+    while True:
+        page = get_users_page(after_id, page_size)
+        for row in page:
+            yield row[1:]
+        if len(page) < page_size:
+            return
+        after_id = page[-1][0]
+
+
+def bulk_import(users, batch_size=PAGE_SIZE):
+    # users: iterable of (username, password_hash, full_name, email, phone); existing usernames are skipped
+    imported = 0
+    batch = []
+    for user in users:
+        batch.append(tuple(user))
+        if len(batch) >= batch_size:
+            imported += _import_batch(batch)
+            batch = []
+    if batch:
+        imported += _import_batch(batch)
+    return imported
+
+
+def _import_batch(batch):
+    with transaction() as cursor:
+        cursor.executemany(IMPORT_USER, batch)
+        return cursor.rowcount